@@ -1,74 +1,188 @@
+import os
+import json
+import time
+import asyncio
 from uuid import uuid4
+from typing import AsyncIterator
 
 from curby.core import (
     FrameMetadata, 
     Song, 
-    SongCompilationThread, 
-    SongCompilationTask, 
+    TaskScheduler,
+    FINAL_STATUSES,
     TaskStatus,
+    SongCompilationTask,
+    EncodingProfile,
+    get_cache_stats,
+    OUTPUT_FOLDER,
+    TASK_REUSE_TTL,
+    STATUS_STREAM_INTERVAL,
+    STATUS_STREAM_KEEPALIVE
 )
-from curby.gather.binder import get_song
-from curby.gather.service import billboardservice
-from curby.generate import generate_compilation
+from curby.gather.binder import get_songs_async
+from curby.gather.service import billboardservice, musicbrainzservice, freemidiservice
+from curby.gather.service.freemidicatalog import FREEMIDI_CATALOG
+from curby.gather.service.sponsorblockcache import SPONSORBLOCK_CACHE
+from curby.gather.service.youtubecache import YOUTUBE_CACHE
+from curby.generate import generate_compilation, get_compilation_fingerprint, remove_compilation, warm_up
+from curby.generate.compilationsonggenerator import AUDIO_STORE, SEGMENT_STORE
 from curby.error import (
     BillboardError,
-    SongBinderError
+    SongBinderError,
+    TaskQueueFullError
 )
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
-tasks : dict[str, SongCompilationTask] = {}
+from curby.api.fileresponse import get_file_response
 
-async def create_songcompilation(theme: FrameMetadata):    
+scheduler = TaskScheduler(initializer=warm_up, cleanup=remove_compilation)
+background_jobs : list = []
+
+def on_startup():
+    scheduler.start()
+    background_jobs.append(freemidiservice.start_catalog_refresher())
+
+def on_shutdown():
+    for stop_event in background_jobs:
+        stop_event.set()
+    background_jobs.clear()
+    scheduler.shutdown(wait=False)
+
+async def create_songcompilation(theme: FrameMetadata, priority: int = 0):    
     try:
-        songs: list[tuple[str, str]] = billboardservice.get_popular()
-        all_songs: list[Song] = [get_song(author, title) for author, title in songs]
+        if await asyncio.to_thread(scheduler.get_queue_size) >= scheduler.max_queued:
+            raise TaskQueueFullError()
+        songs: list[tuple[str, str]] = await billboardservice.get_popular_async()
+        resolutions: list[Song | SongBinderError] = await get_songs_async(songs)
+        all_songs: list[Song] = [song for song in resolutions if isinstance(song, Song)]
+        failed_songs: list[dict] = [
+            { "author" : author, "title" : title }
+            for (author, title), song in zip(songs, resolutions) if isinstance(song, SongBinderError)
+        ]
+        if len(all_songs) == 0:
+            raise SongBinderError()
 
         task_id: str = str(uuid4())
+        profile: EncodingProfile = theme.encoding or EncodingProfile()
+        output_filepath: str = f"{OUTPUT_FOLDER}/{task_id}.{profile.container}"
+        fingerprint: str = get_compilation_fingerprint(theme, all_songs)
+        job: tuple = (theme, all_songs, output_filepath, )
 
-        thread = SongCompilationThread(
-            lambda : on_songcompilation_ended(task_id), 
-            target=generate_compilation, 
-            args=(theme, all_songs, )
+        task: SongCompilationTask = await asyncio.to_thread(
+            scheduler.submit, task_id, generate_compilation, job, priority, progress=True, fingerprint=fingerprint, reuse_for=TASK_REUSE_TTL
         )
+        if task.status == TaskStatus.FINISHED and not os.path.exists(task.result):
+            task = await asyncio.to_thread(scheduler.submit, task_id, generate_compilation, job, priority, progress=True, fingerprint=fingerprint)
 
-        task = SongCompilationTask(task_id, TaskStatus.QUEUED, thread)
-        
-        tasks[task_id] = task
-        tasks[task_id].thread.start()
-        tasks[task_id].status = TaskStatus.PROCESSING
-
-        return { "task_id" : task_id }
+        response: dict = { "task_id" : task.task_id, "failed_songs" : failed_songs, "deduplicated" : task.task_id != task_id }
+        if task.status == TaskStatus.FINISHED:
+            response["task_status"] = task.status
+            response["result"] = f"/result/songcompilation/{task.task_id}"
+        return response
     except BillboardError as error:
         print(error)
         raise HTTPException(status_code=400, detail= "scrapping error occured")
     except SongBinderError as error:
         print(error)
         raise HTTPException(status_code=400, detail= "song creationg error occured")
+    except TaskQueueFullError as error:
+        print(error)
+        raise HTTPException(status_code=429, detail= "too many queued tasks, retry later")
     except Exception as error:
         print(error)
         raise HTTPException(status_code=400, detail= "couldnt create task")
 
 async def songcompilation_status(task_id: str):
+    status: dict | None = await asyncio.to_thread(scheduler.get_status, task_id)
+    if status is None:
+        raise HTTPException(status_code=400, detail=f"couldnt find task {task_id}")
+    return status
+
+async def songcompilation_updates(task_id: str) -> AsyncIterator[dict | None]:
+    """
+    Follow the status of a task, a status is yielded when it changed and None when it did
+    not change for STATUS_STREAM_KEEPALIVE seconds, the updates end with the task
+    """
+    last_status: dict | None = None
+    last_update: float = time.monotonic()
+    while True:
+        status: dict | None = await asyncio.to_thread(scheduler.get_status, task_id)
+        if status is None:
+            return
+        if status != last_status:
+            last_status, last_update = status, time.monotonic()
+            yield jsonable_encoder(status)
+        elif time.monotonic() - last_update >= STATUS_STREAM_KEEPALIVE:
+            last_update = time.monotonic()
+            yield None
+        if status["task_status"] in FINAL_STATUSES:
+            return
+        await asyncio.sleep(STATUS_STREAM_INTERVAL)
+
+async def stream_songcompilation_status(task_id: str):
+    if await asyncio.to_thread(scheduler.get_task, task_id) is None:
+        raise HTTPException(status_code=400, detail=f"couldnt find task {task_id}")
+
+    async def events() -> AsyncIterator[str]:
+        async for status in songcompilation_updates(task_id):
+            yield f"data: {json.dumps(status)}\n\n" if status is not None else ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={ "Cache-Control" : "no-cache" })
+
+async def websocket_songcompilation_status(websocket: WebSocket, task_id: str):
+    await websocket.accept()
+    if await asyncio.to_thread(scheduler.get_task, task_id) is None:
+        await websocket.close(code=1008, reason=f"couldnt find task {task_id}")
+        return
     try:
-        task: SongCompilationTask = tasks.get(task_id)
-        return { "task_status" : task.status }
-    except Exception as error:
-        print(error)
+        async for status in songcompilation_updates(task_id):
+            if status is not None:
+                await websocket.send_json(status)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+async def songcompilation_result(task_id: str, request: Request):
+    task: SongCompilationTask | None = await asyncio.to_thread(scheduler.get_task, task_id)
+    if task is None:
+        raise HTTPException(status_code=400, detail=f"couldnt find task {task_id}")
+    if task.status != TaskStatus.FINISHED:
+        raise HTTPException(status_code=409, detail=f"task {task_id} is not finished")
+    if task.result is None or not os.path.isfile(task.result):
+        raise HTTPException(status_code=404, detail=f"result of task {task_id} is no longer available")
+    return get_file_response(request.headers, task.result, filename=f"{task_id}{os.path.splitext(task.result)[1]}")
+
+async def cancel_songcompilation(task_id: str):
+    if await asyncio.to_thread(scheduler.get_task, task_id) is None:
         raise HTTPException(status_code=400, detail=f"couldnt find task {task_id}")
+    if not await asyncio.to_thread(scheduler.cancel, task_id):
+        raise HTTPException(status_code=409, detail=f"task {task_id} is not queued")
+    task: SongCompilationTask = await asyncio.to_thread(scheduler.get_task, task_id)
+    return { "task_status" : task.status }
 
 async def songcompilation_status_global():
     try:
-        statuses = {}
-        for uuid, task in tasks.items():
-            if task.status in statuses:
-                statuses[task.status] += 1
-            else:
-                statuses[task.status] = 1
-        return statuses
+        return {
+            "statuses" : await asyncio.to_thread(scheduler.get_status_counts),
+            "throughput" : await asyncio.to_thread(scheduler.get_throughput)
+        }
     except Exception as error:
         print(error)
         raise HTTPException(status_code=418, detail=f"coffee time !")
 
-def on_songcompilation_ended(task_id: str):
-    tasks[task_id].status = TaskStatus.FINISHED
\ No newline at end of file
+def get_cache_status() -> dict:
+    return {
+        "responses" : get_cache_stats(),
+        "artist_pages" : musicbrainzservice.get_artist_pages_memory(),
+        "freemidi_catalog" : FREEMIDI_CATALOG.get_stats(),
+        "youtube_searches" : YOUTUBE_CACHE.get_stats(),
+        "sponsorblock" : SPONSORBLOCK_CACHE.get_stats(),
+        "audio" : AUDIO_STORE.get_stats(),
+        "segments" : SEGMENT_STORE.get_stats()
+    }
+
+async def cache_status():
+    return await asyncio.to_thread(get_cache_status)
@@ -0,0 +1,128 @@
+import os
+import typing
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from curby.error import (
+    RangeNotSatisfiableError
+)
+
+def parse_range(range_header: str, size: int) -> tuple[int, int] | None:
+    """
+    Get the inclusive (start, end) bytes of a single range Range header
+
+    Parameter
+    ---------
+    range_header : str
+        the Range header, "bytes=<start>-<end>", "bytes=<start>-" or "bytes=-<suffix length>"
+    size : int
+        the size of the file
+
+    Return
+    ------
+    the (start, end) bytes clamped to the file, None when the header is malformed or asks for
+    several ranges (the whole file is sent then)
+
+    Example
+    -------
+    >>> parse_range("bytes=-500", 10000)
+    >>> (9500, 9999)
+
+    Note
+    ----
+    A range starting after the end of the file raises RangeNotSatisfiableError
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, separator, last = ranges.partition("-")
+    first, last = first.strip(), last.strip()
+    if separator != "-" or (first == "" and last == "") or not all(value.isdigit() for value in (first, last) if value != ""):
+        return None
+    if first == "":
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiableError()
+        return max(0, size - int(last)), size - 1
+    start: int = int(first)
+    end: int = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        if start >= size:
+            raise RangeNotSatisfiableError()
+        return None
+    return start, end
+
+def _matches(etag_header: str, etag: str) -> bool:
+    etags: list[str] = [value.strip().removeprefix("W/") for value in etag_header.split(",")]
+    return "*" in etags or etag in etags
+
+class FileRangeResponse(FileResponse):
+    """
+    Sends the bytes <start> to <end> (inclusive) of a file with a 206 Partial Content,
+    with the zero copy extension of the server when it has one
+    """
+    def __init__(self, path: str | os.PathLike[str], start: int, end: int, stat_result: os.stat_result, **kwargs):
+        super().__init__(path, status_code=206, stat_result=stat_result, **kwargs)
+        self.start: int = start
+        self.end: int = end
+        self.headers["content-length"] = str(end - start + 1)
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({ "type" : "http.response.start", "status" : self.status_code, "headers" : self.raw_headers })
+        count: int = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD":
+            await send({ "type" : "http.response.body", "body" : b"", "more_body" : False })
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({ "type" : "http.response.zerocopysend", "file" : file, "offset" : self.start, "count" : count, "more_body" : False })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                while count > 0:
+                    chunk: bytes = await file.read(min(self.chunk_size, count))
+                    count -= len(chunk)
+                    await send({ "type" : "http.response.body", "body" : chunk, "more_body" : count > 0 and len(chunk) > 0 })
+                    if len(chunk) == 0:
+                        break
+        if self.background is not None:
+            await self.background()
+
+def get_file_response(request_headers: Headers | typing.Mapping[str, str], filepath: str, filename: str | None = None, media_type: str | None = None) -> Response:
+    """
+    Answer a file download, honoring the conditional and range headers of the request
+
+    The whole file is sent by a FileResponse (sent by the server itself when it supports
+    the pathsend extension), a single range with a FileRangeResponse. The ETag is the one
+    of FileResponse, so a client resuming a download with If-Range gets the rest of the
+    file only if it did not change.
+
+    Return
+    ------
+    - 304 when If-None-Match matches the ETag
+    - 206 with the range when a satisfiable Range is asked (and If-Range matches, if given)
+    - 416 when the range starts after the end of the file
+    - 200 with the whole file otherwise
+    """
+    stat_result: os.stat_result = os.stat(filepath)
+    headers: dict[str, str] = { "accept-ranges" : "bytes" }
+    response = FileResponse(filepath, headers=headers, media_type=media_type, filename=filename, stat_result=stat_result)
+    etag: str = response.headers["etag"]
+
+    if_none_match: str | None = request_headers.get("if-none-match")
+    if if_none_match is not None and _matches(if_none_match, etag):
+        return Response(status_code=304, headers={ **headers, "etag" : etag })
+
+    range_header: str | None = request_headers.get("range")
+    if_range: str | None = request_headers.get("if-range")
+    if range_header is None or (if_range is not None and if_range.strip() != etag):
+        return response
+    try:
+        byte_range: tuple[int, int] | None = parse_range(range_header, stat_result.st_size)
+    except RangeNotSatisfiableError:
+        return Response(status_code=416, headers={ **headers, "content-range" : f"bytes */{stat_result.st_size}" })
+    if byte_range is None:
+        return response
+    return FileRangeResponse(filepath, *byte_range, stat_result, headers=headers, media_type=media_type, filename=filename)
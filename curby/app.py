@@ -1,22 +1,50 @@
-from fastapi import FastAPI, Response
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response, WebSocket
 
 from curby.core import FrameMetadata
 import curby.api as api
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    api.on_startup()
+    yield
+    api.on_shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 def get_root():
     return {"test": "root"}
 
 @app.post("/create/songcompilation/")
-async def create_compilation(theme: FrameMetadata):        
-    return await api.create_songcompilation(theme)
+async def create_compilation(theme: FrameMetadata, priority: int = 0):        
+    return await api.create_songcompilation(theme, priority)
 
 @app.get("/status/songcompilation/{task_id}")
 async def songcompilation_status(task_id: str):
     return await api.songcompilation_status(task_id)
 
+@app.get("/events/songcompilation/{task_id}")
+async def songcompilation_events(task_id: str):
+    return await api.stream_songcompilation_status(task_id)
+
+@app.websocket("/ws/songcompilation/{task_id}")
+async def songcompilation_websocket(websocket: WebSocket, task_id: str):
+    await api.websocket_songcompilation_status(websocket, task_id)
+
+@app.api_route("/result/songcompilation/{task_id}", methods=["GET", "HEAD"])
+async def songcompilation_result(task_id: str, request: Request):
+    return await api.songcompilation_result(task_id, request)
+
+@app.post("/cancel/songcompilation/{task_id}")
+async def cancel_songcompilation(task_id: str):
+    return await api.cancel_songcompilation(task_id)
+
 @app.get("/status/global/songcompilation/")
 async def songcompilation_status_global():
-    return await api.songcompilation_status_global()
\ No newline at end of file
+    return await api.songcompilation_status_global()
+
+@app.get("/status/cache/")
+async def cache_status():
+    return await api.cache_status()
\ No newline at end of file
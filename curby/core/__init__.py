@@ -2,4 +2,12 @@ from .requester import *
 from .utils import *
 from .models import *
 from .stack import *
-from .common import *
\ No newline at end of file
+from .common import *
+from .session import *
+from .storage import *
+from .responsecache import *
+from .index import *
+from .assetstore import *
+from .intervals import *
+from .taskstore import *
+from .scheduler import *
\ No newline at end of file
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from contextlib import contextmanager
+from typing import Callable
+
+from .storage import SqliteDatabase
+
+ASSET_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    metadata TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_accessed_at ON assets (accessed_at);
+CREATE TABLE IF NOT EXISTS pins (
+    key TEXT NOT NULL,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (key, holder)
+);
+"""
+
+@dataclass
+class Asset:
+    key: str
+    filepath: str
+    size: int
+    metadata: dict
+
+class AssetStore:
+    """
+    Keyed store of files shared by threads and processes
+
+    Files are written in a private temporary folder and moved in place with an atomic
+    rename, so a partially written file is never served. Each file is recorded with its
+    size and metadata, checked on every read, and the least recently used files are
+    evicted once the store exceeds <max_bytes>.
+
+    A file read or created for a <holder> (a unique name of its user, a compilation) is
+    pinned until the holder releases it: pinned files are never evicted, the store can
+    exceed <max_bytes> while they are in use.
+
+    Parameter
+    ---------
+    folder : str
+        the folder of the stored files
+    max_bytes : int
+        the byte budget of the stored files
+    lock_timeout : float
+        the seconds after which the lock of a crashed writer is considered stale
+    pin_timeout : float
+        the seconds after which the pins of a crashed holder are dropped
+    """
+    def __init__(self, folder: str, max_bytes: int, lock_timeout: float = 600, pin_timeout: float = 6 * 3600):
+        self.folder: str = folder
+        self.max_bytes: int = max_bytes
+        self.lock_timeout: float = lock_timeout
+        self.pin_timeout: float = pin_timeout
+        self.database = SqliteDatabase(os.path.join(folder, "index.sqlite"), ASSET_STORE_SCHEMA)
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def get(self, key: str, holder: str | None = None) -> Asset | None:
+        if holder is not None:
+            self.pin(key, holder)
+        row = self.database.execute("SELECT filename, size, metadata FROM assets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        filename, size, metadata = row
+        filepath: str = os.path.join(self.folder, filename)
+        if not os.path.exists(filepath) or os.path.getsize(filepath) != size:
+            self.remove(key)
+            return None
+        self.database.execute("UPDATE assets SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return Asset(key, filepath, size, json.loads(metadata))
+
+    def put(self, key: str, source_filepath: str, metadata: dict = {}, holder: str | None = None) -> Asset:
+        if holder is not None:
+            self.pin(key, holder)
+        filename: str = key + os.path.splitext(source_filepath)[1]
+        filepath: str = os.path.join(self.folder, filename)
+        os.replace(source_filepath, filepath)
+        size: int = os.path.getsize(filepath)
+        now: float = time.time()
+        self.database.execute(
+            "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?)",
+            (key, filename, size, json.dumps(metadata), now, now)
+        )
+        self.evict(keep=key)
+        return Asset(key, filepath, size, metadata)
+
+    def remove(self, key: str):
+        row = self.database.execute("SELECT filename FROM assets WHERE key = ?", (key,)).fetchone()
+        self.database.execute("DELETE FROM assets WHERE key = ?", (key,))
+        if row is not None and os.path.exists(os.path.join(self.folder, row[0])):
+            os.remove(os.path.join(self.folder, row[0]))
+
+    def pin(self, key: str, holder: str):
+        self.database.execute(
+            "INSERT OR REPLACE INTO pins VALUES (?, ?, ?)", (key, holder, time.time() + self.pin_timeout)
+        )
+
+    def release(self, holder: str):
+        """
+        Unpin the files of <holder> and evict what exceeds the store
+        """
+        self.database.execute("DELETE FROM pins WHERE holder = ?", (holder,))
+        self.evict()
+
+    def _remove_unpinned(self, key: str) -> bool:
+        row = self.database.execute("SELECT filename FROM assets WHERE key = ?", (key,)).fetchone()
+        cursor = self.database.execute(
+            "DELETE FROM assets WHERE key = ? AND NOT EXISTS (SELECT 1 FROM pins WHERE pins.key = assets.key)", (key,)
+        )
+        if cursor.rowcount == 0:
+            return False
+        if row is not None and os.path.exists(os.path.join(self.folder, row[0])):
+            os.remove(os.path.join(self.folder, row[0]))
+        return True
+
+    def evict(self, keep: str | None = None):
+        self.database.execute("DELETE FROM pins WHERE expires_at < ?", (time.time(),))
+        total_size: int = self.database.execute("SELECT COALESCE(SUM(size), 0) FROM assets").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        for key, size in self.database.execute(
+            "SELECT key, size FROM assets WHERE key NOT IN (SELECT key FROM pins) ORDER BY accessed_at"
+        ).fetchall():
+            if total_size <= self.max_bytes:
+                break
+            if key != keep and self._remove_unpinned(key):
+                total_size -= size
+
+    def get_stats(self) -> dict[str, int]:
+        entries, size = self.database.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM assets").fetchone()
+        return {"ENTRIES" : entries, "BYTES" : size}
+
+    @contextmanager
+    def lock(self, key: str):
+        with self._locks_lock:
+            thread_lock: threading.Lock = self._locks.setdefault(key, threading.Lock())
+        with thread_lock:
+            os.makedirs(self.folder, exist_ok=True)
+            lock_filepath: str = os.path.join(self.folder, f".{key}.lock")
+            while True:
+                try:
+                    os.close(os.open(lock_filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - os.path.getmtime(lock_filepath) > self.lock_timeout:
+                            os.remove(lock_filepath)
+                    except FileNotFoundError:
+                        pass
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                os.remove(lock_filepath)
+
+    def get_or_create(self, key: str, create: Callable[[str], tuple[str, dict]], holder: str | None = None) -> Asset:
+        """
+        Get the asset of <key> or create it with <create> while holding the lock of <key>
+
+        Parameter
+        ---------
+        key : str
+            the asset key
+        create : Callable[[str], tuple[str, dict]]
+            writes the asset in the given temporary folder and returns its filepath and metadata
+        holder : str | None
+            pins the asset for <holder> until release(<holder>)
+
+        Return
+        ------
+        the stored asset
+        """
+        asset: Asset | None = self.get(key, holder)
+        if asset is not None:
+            return asset
+        with self.lock(key):
+            asset = self.get(key, holder)
+            if asset is not None:
+                return asset
+            temp_folder: str = tempfile.mkdtemp(prefix=".", dir=self.folder)
+            try:
+                filepath, metadata = create(temp_folder)
+                return self.put(key, filepath, metadata, holder)
+            finally:
+                shutil.rmtree(temp_folder, ignore_errors=True)
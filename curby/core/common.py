@@ -1,6 +1,18 @@
 TEMP_FOLDER = "temp"
 REFRESH_TTL = 3600
 MAX_TASKS = 16
+SCHEDULER_MAX_WORKERS = 2
+SCHEDULER_MODE = "thread"
+STATUS_STREAM_INTERVAL = 0.5
+STATUS_STREAM_KEEPALIVE = 15
+TASK_STORE_BACKEND = "sqlite"
+TASK_STORE_FILE = f"{TEMP_FOLDER}/tasks.sqlite"
+TASK_RETENTION_TTL = 24 * 3600
+TASK_LEASE_TTL = 60
+TASK_MAX_ATTEMPTS = 3
+TASK_POLL_INTERVAL = 1
+THROUGHPUT_WINDOW = 15 * 60
+TASK_REUSE_TTL = REFRESH_TTL
 
 SPONSOR_CATEGORIES = [
     "sponsor",
@@ -13,11 +25,57 @@ SPONSOR_CATEGORIES = [
     "filler",
 ]
 
-CACHE_DATA = {
-    "MISS" : 0,
-    "HIT" : 0
+RESPONSE_CACHE_FILE = f"{TEMP_FOLDER}/responses.sqlite"
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESPONSE_CACHE_FLUSH_INTERVAL = 30
+RESPONSE_CACHE_TTLS = {
+    "www.billboard.com" : REFRESH_TTL,
+    "musicbrainz.org" : 24 * REFRESH_TTL,
+    "freemidi.org" : 24 * REFRESH_TTL,
 }
 
+REQUEST_TIMEOUT = (5, 30)
+REQUEST_RETRIES = 3
+REQUEST_BACKOFF = 0.5
+POOL_MAX_CONNECTIONS = 8
+HOST_MAX_INFLIGHT = {
+    "www.billboard.com" : 2,
+    "musicbrainz.org" : 1,
+    "freemidi.org" : 4,
+}
+HOST_MIN_INTERVAL = {
+    "musicbrainz.org" : 1.0,
+}
+BINDER_MAX_CONCURRENCY = 8
+ARTIST_PAGE_CACHE_BYTES = 32 * 1024 * 1024
+
+FREEMIDI_CATALOG_FILE = f"{TEMP_FOLDER}/freemidi.sqlite"
+FREEMIDI_CATALOG_REFRESH_INTERVAL = 24 * REFRESH_TTL
+MIDI_FOLDER = f"{TEMP_FOLDER}/midi"
+DOWNLOAD_MAX_WORKERS = 4
+YOUTUBE_SEARCH_CACHE_FILE = f"{TEMP_FOLDER}/youtube.sqlite"
+YOUTUBE_SEARCH_TTL = 7 * 24 * REFRESH_TTL
+YOUTUBE_SEARCH_NEGATIVE_TTL = REFRESH_TTL
+YOUTUBE_SEARCH_MAX_WORKERS = 8
+SPONSORBLOCK_CACHE_FILE = f"{TEMP_FOLDER}/sponsorblock.sqlite"
+SPONSORBLOCK_CACHE_TTL = 24 * REFRESH_TTL
+SPONSORBLOCK_TIMEOUT = 3
+SPONSORBLOCK_MAX_WORKERS = 8
+AUDIO_FOLDER = f"{TEMP_FOLDER}/audio"
+AUDIO_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+ASSET_MAX_WORKERS = 8
+RENDER_MAX_WORKERS = 4
+RENDER_BACKEND = "ffmpeg"
+SEGMENT_FOLDER = f"{TEMP_FOLDER}/segments"
+SEGMENT_STORE_MAX_BYTES = 1024 * 1024 * 1024
+OUTPUT_FOLDER = f"{TEMP_FOLDER}/output"
+ENCODING_PRESET = "veryfast"
+ENCODING_TUNE = "stillimage"
+ENCODING_CRF = 23
+ENCODING_FPS = 1
+ENCODING_AUDIO_BITRATE = "192k"
+ENCODING_CONTAINER = "mp4"
+
 CLIENT_SECRETS = "client_secrets.json"
 YOUTUBE_SCOPES = [
     "https://www.googleapis.com/auth/youtube.upload"
@@ -0,0 +1,47 @@
+import re
+import difflib
+from typing import Iterable
+
+def normalize_name(name: str) -> str:
+    return ' '.join(re.findall(r'\w+', name.lower()))
+
+class NameIndex:
+    """
+    Hash index of name to value pairs with exact, normalized and fuzzy lookups
+
+    Parameter
+    ---------
+    entries : Iterable[tuple[str, str]]
+        the name, value pairs, the first value of a duplicated name is kept
+
+    Example
+    -------
+    >>> index = NameIndex([("a flock of seagulls", "artist-1886-a-flock-of-seagulls")])
+    >>> index.find("A Flock Of Seagulls!")
+    >>> 'artist-1886-a-flock-of-seagulls'
+    >>> index.find("a flock of seagull", fuzzy_cutoff=0.9)
+    >>> 'artist-1886-a-flock-of-seagulls'
+    >>> index.find("unknown")
+    >>> None
+    """
+    def __init__(self, entries: Iterable[tuple[str, str]]):
+        self.exact: dict[str, str] = {}
+        self.normalized: dict[str, str] = {}
+        for name, value in entries:
+            self.exact.setdefault(name, value)
+            self.normalized.setdefault(normalize_name(name), value)
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def find(self, name: str, fuzzy_cutoff: float | None = None) -> str | None:
+        if name in self.exact:
+            return self.exact[name]
+        normalized_name: str = normalize_name(name)
+        if normalized_name in self.normalized:
+            return self.normalized[normalized_name]
+        if fuzzy_cutoff is not None:
+            matches: list[str] = difflib.get_close_matches(normalized_name, self.normalized.keys(), n=1, cutoff=fuzzy_cutoff)
+            if len(matches) > 0:
+                return self.normalized[matches[0]]
+        return None
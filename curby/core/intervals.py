@@ -0,0 +1,108 @@
+from typing import Iterable
+
+import numpy as np
+
+def to_intervals(segments: Iterable) -> np.ndarray:
+    """
+    Convert (start, end) pairs or objects with start and end attributes (sponsorblock
+    segments) into a (n, 2) float array
+    """
+    pairs: list = [(segment.start, segment.end) if hasattr(segment, "start") else segment for segment in segments]
+    return np.asarray(pairs, dtype=np.float64).reshape(-1, 2)
+
+def merge_intervals(intervals: np.ndarray) -> np.ndarray:
+    """
+    Sort and merge overlapping (or touching) intervals in a single vectorized pass
+
+    Parameter
+    ---------
+    intervals : np.ndarray
+        the (n, 2) start, end intervals, in any order
+
+    Return
+    ------
+    the (m, 2) sorted and disjoint intervals
+
+    Example
+    -------
+    >>> merge_intervals(np.array([[10, 12], [1, 5], [2, 6]]))
+    >>> array([[ 1.,  6.], [10., 12.]])
+    """
+    intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+    intervals = intervals[intervals[:, 1] > intervals[:, 0]]
+    if len(intervals) == 0:
+        return intervals
+    intervals = intervals[np.argsort(intervals[:, 0], kind="stable")]
+    ends: np.ndarray = np.maximum.accumulate(intervals[:, 1])
+    is_first: np.ndarray = np.empty(len(intervals), dtype=bool)
+    is_first[0] = True
+    is_first[1:] = intervals[1:, 0] > ends[:-1]
+    is_last: np.ndarray = np.append(is_first[1:], True)
+    return np.column_stack((intervals[is_first, 0], ends[is_last]))
+
+def invert_intervals(intervals: np.ndarray, duration: float) -> np.ndarray:
+    """
+    Get the ranges of [0, <duration>] not covered by <intervals>, the skip segments
+    of a clip become its keep ranges
+
+    Parameter
+    ---------
+    intervals : np.ndarray
+        the (n, 2) intervals to remove, in any order
+    duration : float
+        the end of the covered range
+
+    Return
+    ------
+    the (m, 2) sorted keep ranges, empty ranges are dropped
+
+    Example
+    -------
+    >>> invert_intervals(np.array([[2, 6], [1, 5], [10, 12]]), 20)
+    >>> array([[ 0.,  1.], [ 6., 10.], [12., 20.]])
+    """
+    merged: np.ndarray = np.clip(merge_intervals(intervals), 0, duration)
+    bounds: np.ndarray = np.concatenate(([0.0], merged.ravel(), [duration])).reshape(-1, 2)
+    return bounds[bounds[:, 1] > bounds[:, 0]]
+
+def get_intervals_duration(intervals: np.ndarray) -> float:
+    intervals = np.asarray(intervals, dtype=np.float64).reshape(-1, 2)
+    return float(np.sum(intervals[:, 1] - intervals[:, 0]))
+
+def cut_array(samples: np.ndarray, keep_ranges: np.ndarray, rate: float) -> np.ndarray:
+    """
+    Keep the samples of <keep_ranges> (in seconds), the ranges are converted to sample
+    bounds at once and the kept views are copied with a single concatenation
+
+    Parameter
+    ---------
+    samples : np.ndarray
+        the (n, ...) samples, the first axis is time
+    keep_ranges : np.ndarray
+        the (m, 2) sorted and disjoint keep ranges
+    rate : float
+        the samples per second
+
+    Return
+    ------
+    the kept samples, in order
+    """
+    keep_ranges = np.asarray(keep_ranges, dtype=np.float64).reshape(-1, 2)
+    bounds: np.ndarray = np.clip(np.round(keep_ranges * rate).astype(np.int64), 0, len(samples))
+    if len(bounds) == 0:
+        return samples[:0]
+    return np.concatenate([samples[start:end] for start, end in bounds.tolist()])
+
+def get_aselect_filter(keep_ranges: np.ndarray) -> str:
+    """
+    Get the ffmpeg audio filter keeping only <keep_ranges> (in seconds), the kept
+    samples are retimed so the output has no gaps
+
+    Example
+    -------
+    >>> get_aselect_filter(np.array([[0, 1], [6, 10]]))
+    >>> "aselect='between(t,0.000000,1.000000)+between(t,6.000000,10.000000)',asetpts=N/SR/TB"
+    """
+    keep_ranges = np.asarray(keep_ranges, dtype=np.float64).reshape(-1, 2)
+    selection: str = "+".join(f"between(t,{start:.6f},{end:.6f})" for start, end in keep_ranges)
+    return f"aselect='{selection or 0}',asetpts=N/SR/TB"
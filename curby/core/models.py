@@ -1,9 +1,19 @@
+import os
+import sys
 from dataclasses import dataclass, field
-from threading import Thread
 from enum import Enum
-from typing import Callable
+from typing import Any, Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from .common import (
+    ENCODING_PRESET,
+    ENCODING_TUNE,
+    ENCODING_CRF,
+    ENCODING_FPS,
+    ENCODING_AUDIO_BITRATE,
+    ENCODING_CONTAINER
+)
 
 @dataclass
 class Artist:
@@ -19,6 +29,39 @@ class Song:
     def get_display_name(self, format: str):
         return f"{self.title} by {self.author}"
 
+@dataclass(frozen=True, slots=True)
+class ArtistPage:
+    genres: tuple[str, ...]
+    release_groups: tuple[tuple[str, str], ...]
+
+    def get_memory_size(self) -> int:
+        size: int = sys.getsizeof(self) + sys.getsizeof(self.genres) + sys.getsizeof(self.release_groups)
+        size += sum(sys.getsizeof(genre) for genre in self.genres)
+        for release_group in self.release_groups:
+            size += sys.getsizeof(release_group) + sum(sys.getsizeof(value) for value in release_group)
+        return size
+
+@dataclass
+class ChartEntry:
+    rank: int
+    title: str
+    author: str
+    weeks_on_chart: int | None = None
+
+def get_available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class EncodingProfile(BaseModel):
+    threads: int = Field(default_factory=get_available_cores, ge=1)
+    preset: Literal["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"] = ENCODING_PRESET
+    tune: Literal["stillimage", "animation", "film"] | None = ENCODING_TUNE
+    crf: int = Field(default=ENCODING_CRF, ge=0, le=51)
+    fps: int = Field(default=ENCODING_FPS, ge=1, le=60)
+    audio_bitrate: str = Field(default=ENCODING_AUDIO_BITRATE, pattern=r"^\d+k$")
+    container: Literal["mp4", "mov", "mkv"] = ENCODING_CONTAINER
+
 @dataclass
 class FrameMetadata(BaseModel): 
     width: int
@@ -30,23 +73,63 @@ class FrameMetadata(BaseModel):
     song_color: tuple
     format_model: str
     higligth_key: str
+    encoding: EncodingProfile | None = None
 
 class TaskStatus(Enum):
     QUEUED = 0
     PROCESSING = 2
     FINISHED = 3
+    FAILED = 4
+    CANCELLED = 5
+
+TELEMETRY_DETAILS = ("songs_total", "songs_completed", "bytes_downloaded", "encode_fps")
+
+@dataclass
+class TaskTelemetry:
+    """
+    The progress of a running task, <progress> is the ratio of the current <stage> done
+    and <eta> the estimated seconds left in it, <stage_durations> holds the seconds spent
+    in each finished stage
+    """
+    stage: str | None = None
+    progress: float = 0.0
+    songs_total: int = 0
+    songs_completed: int = 0
+    bytes_downloaded: int = 0
+    encode_fps: float | None = None
+    eta: float | None = None
+    stage_durations: dict[str, float] = field(default_factory=dict)
+    _stage_started_at: float | None = field(default=None, repr=False)
+
+    def _close_stage(self, now: float):
+        if self.stage is not None and self._stage_started_at is not None:
+            self.stage_durations[self.stage] = self.stage_durations.get(self.stage, 0) + (now - self._stage_started_at)
+
+    def update(self, stage: str, progress: float, details: dict, now: float):
+        if stage != self.stage:
+            self._close_stage(now)
+            self.stage, self._stage_started_at, self.eta = stage, now, None
+        self.progress = progress
+        for name, value in details.items():
+            if name in TELEMETRY_DETAILS:
+                setattr(self, name, value)
+        if progress > 0:
+            self.eta = (now - self._stage_started_at) * (1 - progress) / progress
+
+    def finish(self, now: float):
+        self._close_stage(now)
+        self.stage, self.progress, self.eta, self._stage_started_at = None, 1.0, 0.0, None
 
-class SongCompilationThread(Thread):
-    def __init__(self, callback, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.callback: Callable = callback
-    
-    def run(self):
-        super().run()
-        self.callback()
+    def to_dict(self) -> dict:
+        return {
+            name : dict(value) if isinstance(value, dict) else value
+            for name, value in vars(self).items() if not name.startswith("_")
+        }
 
 @dataclass
 class SongCompilationTask:
     task_id: str
     status: TaskStatus
-    thread: SongCompilationThread
\ No newline at end of file
+    priority: int = 0
+    result: Any = None
+    telemetry: TaskTelemetry = field(default_factory=TaskTelemetry)
\ No newline at end of file
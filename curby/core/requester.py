@@ -1,10 +1,124 @@
-import requests
-from cachetools.func import ttl_cache
+import atexit
+import asyncio
+from contextlib import contextmanager
 
-from .common import REFRESH_TTL
-from .utils import hash_dict
+import httpx
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
 
-@hash_dict
-@ttl_cache(ttl=REFRESH_TTL)
-def request(url: str, header={}, params={}):
-    return requests.get(url, headers=header, params=params)
\ No newline at end of file
+from .common import (
+    REFRESH_TTL,
+    REQUEST_TIMEOUT,
+    REQUEST_RETRIES,
+    REQUEST_BACKOFF,
+    RESPONSE_CACHE_FILE,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTLS,
+    RESPONSE_CACHE_FLUSH_INTERVAL
+)
+from .responsecache import ResponseCache, CachedResponse
+from .session import get_session, host_slot, get_async_client, async_host_slot
+
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_FILE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTLS, REFRESH_TTL, RESPONSE_CACHE_FLUSH_INTERVAL)
+atexit.register(RESPONSE_CACHE.flush)
+
+def _build_response(cached: CachedResponse) -> Response:
+    response = Response()
+    response.url = cached.url
+    response.status_code = cached.status_code
+    response.headers = CaseInsensitiveDict(cached.headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = cached.content
+    return response
+
+def request(url: str, header={}, params={}, cached: bool = True) -> Response:
+    if not cached:
+        with host_slot(url):
+            return get_session().get(url, headers=header, params=params, timeout=REQUEST_TIMEOUT)
+
+    key: str = RESPONSE_CACHE.get_key(url, params)
+    cached_response: CachedResponse | None = RESPONSE_CACHE.get(key)
+    if cached_response is not None and RESPONSE_CACHE.is_fresh(cached_response):
+        RESPONSE_CACHE.count("HIT")
+        return _build_response(cached_response)
+
+    headers: dict = dict(header)
+    if cached_response is not None:
+        headers.update(cached_response.get_validators())
+    with host_slot(url):
+        response: Response = get_session().get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+
+    if cached_response is not None and response.status_code == 304:
+        RESPONSE_CACHE.refresh(key)
+        RESPONSE_CACHE.count("REVALIDATED")
+        return _build_response(cached_response)
+
+    RESPONSE_CACHE.count("MISS")
+    if response.status_code == 200:
+        RESPONSE_CACHE.put(key, response.url, response.status_code, response.headers, response.content)
+    return response
+
+@contextmanager
+def request_stream(url: str, header={}, params={}):
+    with host_slot(url):
+        response: Response = get_session().get(url, headers=header, params=params, timeout=REQUEST_TIMEOUT, stream=True)
+        try:
+            yield response
+        finally:
+            response.close()
+
+def _build_async_response(cached: CachedResponse) -> httpx.Response:
+    return httpx.Response(
+        cached.status_code,
+        headers=cached.headers,
+        content=cached.content,
+        request=httpx.Request("GET", cached.url)
+    )
+
+def _get_retry_after(response: httpx.Response) -> float:
+    retry_after: str = response.headers.get("Retry-After", "")
+    return float(retry_after) if retry_after.isdigit() else 0
+
+async def _get_async(url: str, headers: dict, params: dict) -> httpx.Response:
+    client: httpx.AsyncClient = get_async_client()
+    for attempt in range(REQUEST_RETRIES + 1):
+        retry_after: float = 0
+        try:
+            async with async_host_slot(url):
+                response: httpx.Response = await client.get(url, headers=headers, params=params)
+            if response.status_code not in (429, 500, 502, 503, 504) or attempt == REQUEST_RETRIES:
+                return response
+            retry_after = _get_retry_after(response)
+        except httpx.TransportError:
+            if attempt == REQUEST_RETRIES:
+                raise
+        await asyncio.sleep(max(retry_after, REQUEST_BACKOFF * (2 ** attempt)))
+
+async def request_async(url: str, header={}, params={}, cached: bool = True) -> httpx.Response:
+    if not cached:
+        return await _get_async(url, dict(header), params)
+
+    key: str = RESPONSE_CACHE.get_key(url, params)
+    cached_response: CachedResponse | None = await asyncio.to_thread(RESPONSE_CACHE.get, key)
+    if cached_response is not None and RESPONSE_CACHE.is_fresh(cached_response):
+        await asyncio.to_thread(RESPONSE_CACHE.count, "HIT")
+        return _build_async_response(cached_response)
+
+    headers: dict = dict(header)
+    if cached_response is not None:
+        headers.update(cached_response.get_validators())
+    response: httpx.Response = await _get_async(url, headers, params)
+
+    if cached_response is not None and response.status_code == 304:
+        await asyncio.to_thread(RESPONSE_CACHE.refresh, key)
+        await asyncio.to_thread(RESPONSE_CACHE.count, "REVALIDATED")
+        return _build_async_response(cached_response)
+
+    await asyncio.to_thread(RESPONSE_CACHE.count, "MISS")
+    if response.status_code == 200:
+        await asyncio.to_thread(RESPONSE_CACHE.put, key, str(response.url), response.status_code, dict(response.headers), response.content)
+    return response
+
+def get_cache_stats() -> dict[str, int]:
+    return RESPONSE_CACHE.get_stats()
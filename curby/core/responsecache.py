@@ -0,0 +1,181 @@
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass
+from urllib.parse import urlencode, urlsplit
+
+from .storage import SqliteDatabase
+
+RESPONSE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+DECODED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+def get_stored_headers(headers: dict[str, str]) -> dict[str, str]:
+    """
+    Get the headers of a response to store with its decoded content: the content encoding,
+    length and transfer encoding describe the body as sent and would decode it twice
+    """
+    return { key : value for key, value in dict(headers).items() if key.lower() not in DECODED_HEADERS }
+
+@dataclass
+class CachedResponse:
+    url: str
+    status_code: int
+    headers: dict[str, str]
+    content: bytes
+    stored_at: float
+
+    def get_age(self) -> float:
+        return time.time() - self.stored_at
+
+    def get_validators(self) -> dict[str, str]:
+        headers = {key.lower(): value for key, value in self.headers.items()}
+        validators = {}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        return validators
+
+class ResponseCache:
+    """
+    Disk backed http response cache, shared by every process using the same file
+
+    Entries are kept for a per host ttl and then revalidated with their ETag and
+    Last-Modified headers, the least recently used ones are evicted once the
+    stored content exceeds <max_bytes>.
+
+    A cache hit does not write to the database: the access times and the counters
+    are kept in memory and written together every <flush_interval> seconds.
+
+    Parameter
+    ---------
+    filepath : str
+        the sqlite file of the cache
+    max_bytes : int
+        the byte budget of the stored contents
+    ttls : dict[str, int]
+        the time to live in seconds of the responses of each host
+    default_ttl : int
+        the time to live of the hosts not in <ttls>
+    flush_interval : float
+        the seconds the access times and the counters are kept in memory, 0 writes them at once
+    """
+    def __init__(self, filepath: str, max_bytes: int, ttls: dict[str, int], default_ttl: int, flush_interval: float = 0):
+        self.database = SqliteDatabase(filepath, RESPONSE_CACHE_SCHEMA)
+        self.max_bytes: int = max_bytes
+        self.ttls: dict[str, int] = ttls
+        self.default_ttl: int = default_ttl
+        self.flush_interval: float = flush_interval
+        self._accessed_at: dict[str, float] = {}
+        self._counters: dict[str, int] = {}
+        self._flushed_at: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(url: str, params: dict = {}) -> str:
+        full_url: str = url
+        if params:
+            full_url += "?" + urlencode(sorted(params.items()), doseq=True)
+        return hashlib.sha256(full_url.encode()).hexdigest()
+
+    def get_ttl(self, url: str) -> int:
+        return self.ttls.get(urlsplit(url).hostname, self.default_ttl)
+
+    def is_fresh(self, cached: CachedResponse) -> bool:
+        return cached.get_age() < self.get_ttl(cached.url)
+
+    def get(self, key: str) -> CachedResponse | None:
+        row = self.database.execute(
+            "SELECT url, status_code, headers, content, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self._accessed_at[key] = time.time()
+        self._flush_if_due()
+        url, status_code, headers, content, stored_at = row
+        return CachedResponse(url, status_code, get_stored_headers(json.loads(headers)), content, stored_at)
+
+    def put(self, key: str, url: str, status_code: int, headers: dict[str, str], content: bytes):
+        now: float = time.time()
+        self.database.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, urlsplit(url).hostname or "", status_code, json.dumps(get_stored_headers(headers)), content, len(content), now, now)
+        )
+        self.evict()
+
+    def refresh(self, key: str):
+        now: float = time.time()
+        self.database.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def evict(self):
+        self.flush()
+        total_size: int = self.database.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        evicted_keys: list[str] = []
+        for key, size in self.database.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total_size <= self.max_bytes:
+                break
+            evicted_keys.append(key)
+            total_size -= size
+        self.database.execute(
+            f"DELETE FROM responses WHERE key IN ({', '.join('?' * len(evicted_keys))})", evicted_keys
+        )
+
+    def count(self, name: str):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+        self._flush_if_due()
+
+    def flush(self):
+        """
+        Write the access times and the counters kept in memory
+        """
+        with self._lock:
+            accessed_at, self._accessed_at = self._accessed_at, {}
+            counters, self._counters = self._counters, {}
+            self._flushed_at = time.monotonic()
+        if len(accessed_at) == 0 and len(counters) == 0:
+            return
+        with self.database.transaction() as connection:
+            connection.executemany(
+                "UPDATE responses SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(accessed, key) for key, accessed in accessed_at.items()]
+            )
+            connection.executemany(
+                "INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                list(counters.items())
+            )
+
+    def _flush_if_due(self):
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def get_stats(self) -> dict[str, int]:
+        self.flush()
+        stats: dict[str, int] = {"HIT": 0, "MISS": 0, "REVALIDATED": 0}
+        stats.update(self.database.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = self.database.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        stats["ENTRIES"] = entries
+        stats["BYTES"] = size
+        return stats
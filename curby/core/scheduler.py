@@ -0,0 +1,378 @@
+import os
+import time
+import uuid
+import queue
+import socket
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Literal
+
+from .models import (
+    SongCompilationTask,
+    TaskStatus,
+    TaskTelemetry
+)
+from .taskstore import (
+    TaskStore,
+    TaskJob,
+    create_task_store
+)
+from .common import (
+    MAX_TASKS,
+    SCHEDULER_MAX_WORKERS,
+    SCHEDULER_MODE,
+    TASK_LEASE_TTL,
+    TASK_MAX_ATTEMPTS,
+    TASK_POLL_INTERVAL,
+    TASK_RETENTION_TTL,
+    THROUGHPUT_WINDOW
+)
+from curby.error import (
+    TaskQueueFullError
+)
+
+_worker_progress_queue = None
+
+def _init_worker(progress_queue, initializer: Callable | None):
+    global _worker_progress_queue
+    _worker_progress_queue = progress_queue
+    if initializer is not None:
+        initializer()
+
+class TaskProgress:
+    """
+    Reports the progress of a task to its scheduler, from a worker thread or a worker process
+
+    The reporter is passed by value to worker processes: the queue is not pickled, the
+    process uses the queue it was started with
+
+    Example
+    -------
+    >>> progress = TaskProgress("task-1")
+    >>> progress("encode", 0.5, songs_completed=4, encode_fps=120.0)
+    """
+    def __init__(self, task_id: str, progress_queue = None):
+        self.task_id: str = task_id
+        self.progress_queue = progress_queue
+
+    def __getstate__(self) -> dict:
+        return { "task_id" : self.task_id, "progress_queue" : None }
+
+    def __call__(self, stage: str, progress: float = 0.0, **details):
+        progress_queue = self.progress_queue if self.progress_queue is not None else _worker_progress_queue
+        if progress_queue is not None:
+            progress_queue.put((self.task_id, stage, progress, details))
+
+class TaskScheduler:
+    """
+    Runs the tasks of a task store on a fixed pool of workers, in priority then submission order
+
+    Submitted tasks stay QUEUED until a worker claims them. The queue is bounded by
+    <max_queued>, a submission to a full queue raises TaskQueueFullError so callers
+    can push back instead of piling up encodes.
+
+    With a shared store (SqliteTaskStore) every API worker runs a scheduler claiming
+    from the same queue. A scheduler renews the leases of its running tasks, the tasks
+    of a scheduler that died are requeued once their lease expired, and done tasks
+    are deleted after <retention> seconds, with what they left (see <cleanup>).
+
+    Parameter
+    ---------
+    max_workers : int
+        the number of tasks run at the same time
+    max_queued : int
+        the maximum number of queued tasks
+    mode : Literal["thread", "process"]
+        run the tasks in the worker threads or in a pool of <max_workers> processes
+    initializer : Callable | None
+        called once in each worker process when it starts, to import and warm up what the tasks use
+    store : TaskStore | None
+        where the tasks are kept, the TASK_STORE_BACKEND store by default
+    retention : int
+        the seconds done tasks are kept
+    cleanup : Callable[[Any], None] | None
+        called with the result of each deleted task, to delete the files it left
+
+    Example
+    -------
+    >>> scheduler = TaskScheduler(max_workers=2)
+    >>> scheduler.start()
+    >>> scheduler.submit("task-1", generate_compilation, (theme, songs), priority=1)
+    >>> scheduler.get_task("task-1").status
+    >>> <TaskStatus.QUEUED: 0>
+
+    Note
+    ----
+    In "process" mode the workers are spawned (not forked from the API process and its
+    threads), the arguments and the result of a task are pickled, so they are passed by
+    value. The progress reported by a task comes back through a queue read by the scheduler.
+    When a worker process dies the pool is replaced, the tasks it was running are retried
+    once on the new pool.
+    """
+    def __init__(self, max_workers: int = SCHEDULER_MAX_WORKERS, max_queued: int = MAX_TASKS, mode: Literal["thread", "process"] = SCHEDULER_MODE, initializer: Callable | None = None, store: TaskStore | None = None, retention: int = TASK_RETENTION_TTL, cleanup: Callable[[Any], None] | None = None):
+        self.max_workers: int = max_workers
+        self.max_queued: int = max_queued
+        self.mode: str = mode
+        self.initializer: Callable | None = initializer
+        self.store: TaskStore = store if store is not None else create_task_store()
+        self.retention: int = retention
+        self.cleanup: Callable[[Any], None] | None = cleanup
+        self.owner: str = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: dict[str, TaskTelemetry] = {}
+        self._started_at: dict[str, float] = {}
+        self._unfinished: dict[str, tuple[TaskTelemetry, float]] = {}
+        self._condition = threading.Condition()
+        self._notifications: int = 0
+        self._workers: list[threading.Thread] = []
+        self._listener: threading.Thread | None = None
+        self._progress_queue = None
+        self._executor: ProcessPoolExecutor | None = None
+        self._stopped: bool = False
+        self._stop_event = threading.Event()
+
+    def start(self):
+        with self._condition:
+            if len(self._workers) > 0:
+                return
+            self._stopped = False
+            self._stop_event.clear()
+            if self.mode == "process":
+                self._progress_queue = multiprocessing.get_context("spawn").Queue()
+                self._executor = self._create_executor()
+            else:
+                self._progress_queue = queue.Queue()
+            self.maintain()
+            self._listener = threading.Thread(target=self._listen, args=(self._progress_queue, ), name="task-progress", daemon=True)
+            self._listener.start()
+            maintainer = threading.Thread(target=self._maintain, name="task-maintenance", daemon=True)
+            maintainer.start()
+            self._workers.append(maintainer)
+            for index in range(self.max_workers):
+                worker = threading.Thread(target=self._work, name=f"task-worker-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the workers once their running task is done, queued tasks are left QUEUED
+        """
+        with self._condition:
+            self._stopped = True
+            self._stop_event.set()
+            self._condition.notify_all()
+            workers, self._workers = self._workers, []
+            listener, self._listener = self._listener, None
+        if wait:
+            for worker in workers:
+                worker.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        if listener is not None:
+            self._progress_queue.put(None)
+            if wait:
+                listener.join()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._progress_queue, self.initializer)
+        )
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        """
+        Replace the pool after one of its processes died, once for all the workers that saw it broken
+        """
+        with self._condition:
+            if self._executor is broken and not self._stopped:
+                self._executor = self._create_executor()
+        broken.shutdown(wait=False)
+
+    def _run(self, task: SongCompilationTask, function: Callable, args: tuple, progress: bool):
+        if self.mode != "process":
+            kwargs: dict = { "progress" : TaskProgress(task.task_id, self._progress_queue) } if progress else {}
+            return function(*args, **kwargs)
+        kwargs: dict = { "progress" : TaskProgress(task.task_id) } if progress else {}
+        for attempt in range(2):
+            executor: ProcessPoolExecutor = self._executor
+            try:
+                return executor.submit(function, *args, **kwargs).result()
+            except BrokenProcessPool:
+                self._replace_executor(executor)
+                if attempt == 1:
+                    raise
+
+    def maintain(self):
+        """
+        Renew the leases of the running tasks, requeue the interrupted tasks and delete the expired
+        ones, their results are given to <cleanup>. The tasks that could not be marked done are
+        marked FAILED again first, so their leases are not renewed forever.
+        """
+        with self._condition:
+            unfinished, self._unfinished = self._unfinished, {}
+        for task_id, (telemetry, duration) in unfinished.items():
+            self._finish(task_id, TaskStatus.FAILED, None, telemetry, duration)
+        now: float = time.time()
+        self.store.renew(self.owner, now + TASK_LEASE_TTL)
+        if self.store.recover(now, TASK_MAX_ATTEMPTS) > 0:
+            self._notify(all_workers=True)
+        for result in self.store.purge(now - self.retention):
+            if self.cleanup is not None and result is not None:
+                try:
+                    self.cleanup(result)
+                except Exception as error:
+                    print(error)
+
+    def get_queue_size(self) -> int:
+        return self.store.get_queue_size()
+
+    def get_task(self, task_id: str) -> SongCompilationTask | None:
+        return self.store.get(task_id)
+
+    def get_status_counts(self) -> dict[TaskStatus, int]:
+        return self.store.get_status_counts()
+
+    def get_throughput(self, window: float = THROUGHPUT_WINDOW) -> dict[str, float | int | None]:
+        """
+        Get the tasks finished and failed in the last <window> seconds, the finished tasks per
+        minute and their mean and 95th percentile run time
+        """
+        return self.store.get_throughput(time.time(), window)
+
+    def get_status(self, task_id: str) -> dict | None:
+        """
+        Get a consistent snapshot of the status and the telemetry of a task
+
+        Example
+        -------
+        >>> scheduler.get_status("task-1")
+        >>> {'task_status': <TaskStatus.PROCESSING: 2>, 'stage': 'encode', 'progress': 0.5, 'songs_total': 8, ...}
+        """
+        task: SongCompilationTask | None = self.store.get(task_id)
+        if task is None:
+            return None
+        return { "task_status" : task.status, **task.telemetry.to_dict() }
+
+    def submit(self, task_id: str, function: Callable, args: tuple = (), priority: int = 0, progress: bool = False, fingerprint: str | None = None, reuse_for: float = 0) -> SongCompilationTask:
+        """
+        Queue <function>(*<args>) as the task <task_id>, higher <priority> tasks run first
+
+        When <progress> is set, <function> is also given a TaskProgress as its progress
+        keyword argument, what it reports is kept in the telemetry of the task
+
+        When a task with the same <fingerprint> is queued, running or finished less than
+        <reuse_for> seconds ago, nothing is queued and that task is returned instead
+
+        Example
+        -------
+        >>> scheduler.submit("task-2", generate_compilation, (theme, songs), fingerprint="4f1c...", reuse_for=3600).task_id
+        >>> 'task-1'
+        """
+        now: float = time.time()
+        if fingerprint is not None:
+            existing: SongCompilationTask | None = self.store.find(fingerprint, now - reuse_for)
+            if existing is not None:
+                return existing
+        if self.store.get_queue_size() >= self.max_queued:
+            raise TaskQueueFullError()
+        task: SongCompilationTask = self.store.add(
+            SongCompilationTask(task_id, TaskStatus.QUEUED, priority), (function, args, progress), now, fingerprint, now - reuse_for
+        )
+        self._notify()
+        return task
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Cancel a queued task, a task already taken by a worker is not cancelled
+
+        Return
+        ------
+        whether the task was cancelled
+        """
+        return self.store.cancel(task_id, time.time())
+
+    def _take(self) -> tuple[SongCompilationTask, TaskJob] | None:
+        while not self._stopped:
+            notifications: int = self._notifications
+            try:
+                claimed: tuple[SongCompilationTask, TaskJob] | None = self.store.claim(self.owner, time.time() + TASK_LEASE_TTL)
+            except Exception as error:
+                print(error)
+                claimed = None
+            with self._condition:
+                if claimed is not None:
+                    self._running[claimed[0].task_id] = TaskTelemetry()
+                    self._started_at[claimed[0].task_id] = time.monotonic()
+                    return claimed
+                if not self._stopped and notifications == self._notifications:
+                    self._condition.wait(TASK_POLL_INTERVAL)
+        return None
+
+    def _notify(self, all_workers: bool = False):
+        with self._condition:
+            self._notifications += 1
+            if all_workers:
+                self._condition.notify_all()
+            else:
+                self._condition.notify()
+
+    def _work(self):
+        while True:
+            claimed = self._take()
+            if claimed is None:
+                return
+            task, (function, args, progress) = claimed
+            status: TaskStatus = TaskStatus.FAILED
+            result = None
+            try:
+                result = self._run(task, function, args, progress)
+                status = TaskStatus.FINISHED
+            except Exception as error:
+                print(error)
+            with self._condition:
+                telemetry: TaskTelemetry = self._running.pop(task.task_id)
+                duration: float = time.monotonic() - self._started_at.pop(task.task_id)
+            if status == TaskStatus.FINISHED:
+                telemetry.finish(time.monotonic())
+            self._finish(task.task_id, status, result, telemetry, duration)
+
+    def _finish(self, task_id: str, status: TaskStatus, result, telemetry: TaskTelemetry, duration: float):
+        """
+        Mark a task done, FAILED when its result cannot be stored, or retry in maintain() when the store fails
+        """
+        try:
+            self.store.finish(task_id, status, result, telemetry, time.time(), duration)
+            return
+        except Exception as error:
+            print(error)
+        try:
+            self.store.finish(task_id, TaskStatus.FAILED, None, telemetry, time.time(), duration)
+        except Exception as error:
+            print(error)
+            with self._condition:
+                self._unfinished[task_id] = (telemetry, duration)
+
+    def _listen(self, progress_queue):
+        while True:
+            update = progress_queue.get()
+            if update is None:
+                return
+            task_id, stage, progress, details = update
+            with self._condition:
+                telemetry: TaskTelemetry | None = self._running.get(task_id)
+                if telemetry is None:
+                    continue
+                telemetry.update(stage, progress, details, time.monotonic())
+                snapshot = TaskTelemetry(**telemetry.to_dict())
+            self.store.update_telemetry(task_id, snapshot)
+
+    def _maintain(self):
+        while not self._stop_event.wait(TASK_LEASE_TTL / 3):
+            try:
+                self.maintain()
+            except Exception as error:
+                print(error)
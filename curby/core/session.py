@@ -0,0 +1,126 @@
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .common import (
+    REQUEST_TIMEOUT,
+    REQUEST_RETRIES,
+    REQUEST_BACKOFF,
+    POOL_MAX_CONNECTIONS,
+    HOST_MAX_INFLIGHT,
+    HOST_MIN_INTERVAL
+)
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+_host_next_times: dict[str, float] = {}
+_host_next_times_lock = threading.Lock()
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_async_host_slots: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def _create_session() -> requests.Session:
+    retry = Retry(
+        total=REQUEST_RETRIES,
+        backoff_factor=REQUEST_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=len(HOST_MAX_INFLIGHT) + 1, pool_maxsize=POOL_MAX_CONNECTIONS, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session() -> requests.Session:
+    """
+    Get the process wide keep-alive session, its connection pools are shared by all threads
+
+    Return
+    ------
+    the shared requests session (with retries and backoff on failures)
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+def get_max_inflight(host: str) -> int:
+    return HOST_MAX_INFLIGHT.get(host, POOL_MAX_CONNECTIONS)
+
+def _reserve_host_delay(host: str) -> float:
+    interval: float = HOST_MIN_INTERVAL.get(host, 0)
+    if interval <= 0:
+        return 0
+    with _host_next_times_lock:
+        now: float = time.monotonic()
+        start: float = max(now, _host_next_times.get(host, now))
+        _host_next_times[host] = start + interval
+    return start - now
+
+@contextmanager
+def host_slot(url: str):
+    """
+    Hold one of the in-flight request slots of the host of <url> for the duration of the block,
+    waiting first for the host rate limit (HOST_MIN_INTERVAL) if it has one
+
+    Parameter
+    ---------
+    url : str
+        the requested url
+
+    Example
+    -------
+    >>> with host_slot("https://musicbrainz.org/artist/..."):
+    >>>     get_session().get("https://musicbrainz.org/artist/...")
+    """
+    host: str = urlsplit(url).hostname or ""
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(get_max_inflight(host))
+        slot = _host_slots[host]
+    with slot:
+        time.sleep(_reserve_host_delay(host))
+        yield
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the keep-alive httpx client of the running event loop, its connection pools are shared by all coroutines
+
+    Return
+    ------
+    the shared httpx async client
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT[1], connect=REQUEST_TIMEOUT[0]),
+            limits=httpx.Limits(max_keepalive_connections=POOL_MAX_CONNECTIONS * (len(HOST_MAX_INFLIGHT) + 1)),
+            follow_redirects=True
+        )
+    return _async_clients[loop]
+
+@asynccontextmanager
+async def async_host_slot(url: str):
+    """
+    Async counterpart of host_slot(...), the slots are per event loop
+    """
+    host: str = urlsplit(url).hostname or ""
+    slots: dict[str, asyncio.Semaphore] = _async_host_slots.setdefault(asyncio.get_running_loop(), {})
+    if host not in slots:
+        slots[host] = asyncio.Semaphore(get_max_inflight(host))
+    async with slots[host]:
+        await asyncio.sleep(_reserve_host_delay(host))
+        yield
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class SqliteDatabase:
+    """
+    A sqlite database file that can be shared between threads and processes
+
+    Each thread (and each forked process) gets its own connection, opened lazily
+    in WAL mode so that readers never block the writer.
+
+    Parameter
+    ---------
+    filepath : str
+        the database file, its folder is created if needed
+    schema : str
+        the sql script run on every new connection (use "IF NOT EXISTS")
+    """
+    def __init__(self, filepath: str, schema: str):
+        self.filepath: str = filepath
+        self.schema: str = schema
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        pid: int = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            folder: str = os.path.dirname(self.filepath)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder, exist_ok=True)
+            connection = sqlite3.connect(self.filepath, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(self.schema)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, parameters)
+
+    @contextmanager
+    def transaction(self):
+        connection: sqlite3.Connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def close(self):
+        if getattr(self._local, "pid", None) == os.getpid():
+            self._local.connection.close()
+        self._local = threading.local()
@@ -0,0 +1,460 @@
+import json
+import math
+import time
+import heapq
+import pickle
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable
+
+from .models import (
+    SongCompilationTask,
+    TaskStatus,
+    TaskTelemetry
+)
+from .storage import SqliteDatabase
+from .common import (
+    TASK_STORE_BACKEND,
+    TASK_STORE_FILE,
+    THROUGHPUT_WINDOW
+)
+
+TaskJob = tuple[Callable, tuple, bool]
+
+FINAL_STATUSES = (TaskStatus.FINISHED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+TASK_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    job BLOB,
+    result TEXT,
+    telemetry TEXT NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS tasks_finished_at ON tasks (finished_at);
+CREATE TABLE IF NOT EXISTS task_counts (
+    status INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO task_counts SELECT status, COUNT(*) FROM tasks WHERE NOT EXISTS (SELECT 1 FROM task_counts) GROUP BY status;
+CREATE TRIGGER IF NOT EXISTS tasks_count_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO task_counts VALUES (NEW.status, 1) ON CONFLICT (status) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_count_update AFTER UPDATE OF status ON tasks WHEN OLD.status != NEW.status BEGIN
+    UPDATE task_counts SET count = count - 1 WHERE status = OLD.status;
+    INSERT INTO task_counts VALUES (NEW.status, 1) ON CONFLICT (status) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_count_delete AFTER DELETE ON tasks BEGIN
+    UPDATE task_counts SET count = count - 1 WHERE status = OLD.status;
+END;
+CREATE TABLE IF NOT EXISTS task_completions (
+    finished_at REAL NOT NULL,
+    status INTEGER NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_completions_finished_at ON task_completions (finished_at);
+CREATE TABLE IF NOT EXISTS task_fingerprints (
+    fingerprint TEXT PRIMARY KEY,
+    task_id TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS tasks_fingerprint_delete AFTER DELETE ON tasks BEGIN
+    DELETE FROM task_fingerprints WHERE task_id = OLD.task_id;
+END;
+"""
+
+def is_reusable(status: TaskStatus, finished_at: float | None, reuse_since: float | None) -> bool:
+    """
+    Whether a task can stand for an identical one: it is queued or running, or it finished after <reuse_since>
+    """
+    if status in (TaskStatus.QUEUED, TaskStatus.PROCESSING):
+        return True
+    return status == TaskStatus.FINISHED and reuse_since is not None and finished_at is not None and finished_at >= reuse_since
+
+def get_throughput(completions: list[tuple[TaskStatus, float]], window: float) -> dict[str, float | int | None]:
+    """
+    Get the throughput of the tasks done in the last <window> seconds from their status and duration
+
+    Example
+    -------
+    >>> get_throughput([(TaskStatus.FINISHED, 30.0), (TaskStatus.FAILED, 2.0)], 60)
+    >>> {'finished': 1, 'failed': 1, 'finished_per_minute': 1.0, 'mean_duration': 30.0, 'p95_duration': 30.0}
+    """
+    durations: list[float] = sorted(duration for status, duration in completions if status == TaskStatus.FINISHED)
+    return {
+        "finished" : len(durations),
+        "failed" : sum(1 for status, duration in completions if status == TaskStatus.FAILED),
+        "finished_per_minute" : len(durations) * 60 / window,
+        "mean_duration" : sum(durations) / len(durations) if len(durations) > 0 else None,
+        "p95_duration" : durations[math.ceil(0.95 * len(durations)) - 1] if len(durations) > 0 else None
+    }
+
+class TaskStore(ABC):
+    """
+    Where the scheduler keeps its tasks, the queued jobs and the running leases
+
+    A worker claims a queued task atomically and holds a lease on it, renewed while it
+    runs. The task of a worker that died stops being renewed, recover puts it back in
+    the queue once its lease expired. Finished tasks are purged after their retention.
+    """
+    @abstractmethod
+    def add(self, task: SongCompilationTask, job: TaskJob, now: float, fingerprint: str | None = None, reuse_since: float | None = None) -> SongCompilationTask:
+        """
+        Queue <task>, unless a reusable task (see is_reusable) has the same <fingerprint>
+
+        Return
+        ------
+        the queued task or the task with the same fingerprint
+        """
+        pass
+
+    @abstractmethod
+    def find(self, fingerprint: str, reuse_since: float | None = None) -> SongCompilationTask | None:
+        """
+        Get the last task added with <fingerprint> if it is reusable
+        """
+        pass
+
+    @abstractmethod
+    def claim(self, owner: str, lease_until: float) -> tuple[SongCompilationTask, TaskJob] | None:
+        """
+        Take the first queued task (by priority then submission) and mark it PROCESSING for <owner>,
+        a task whose job cannot be read back is marked FAILED instead
+        """
+        pass
+
+    @abstractmethod
+    def cancel(self, task_id: str, now: float) -> bool:
+        pass
+
+    @abstractmethod
+    def update_telemetry(self, task_id: str, telemetry: TaskTelemetry):
+        """
+        Keep the telemetry of a running task, a late update of a task already done is ignored
+        """
+        pass
+
+    @abstractmethod
+    def finish(self, task_id: str, status: TaskStatus, result: Any, telemetry: TaskTelemetry, now: float, duration: float = 0.0):
+        """
+        Mark a claimed task done, <duration> is the seconds it ran, counted in the throughput
+        """
+        pass
+
+    @abstractmethod
+    def renew(self, owner: str, lease_until: float):
+        pass
+
+    @abstractmethod
+    def recover(self, now: float, max_attempts: int) -> int:
+        """
+        Requeue the PROCESSING tasks whose lease expired, a task interrupted <max_attempts> times is FAILED
+
+        Return
+        ------
+        the number of requeued tasks
+        """
+        pass
+
+    @abstractmethod
+    def purge(self, before: float) -> list[Any]:
+        """
+        Delete the tasks done before <before>
+
+        Return
+        ------
+        the results of the deleted tasks, so what they left (the rendered files) can be deleted too
+        """
+        pass
+
+    @abstractmethod
+    def get(self, task_id: str) -> SongCompilationTask | None:
+        pass
+
+    @abstractmethod
+    def get_status_counts(self) -> dict[TaskStatus, int]:
+        """
+        Get the number of tasks of each status, the counts are kept up to date on every status change
+        """
+        pass
+
+    @abstractmethod
+    def get_throughput(self, now: float, window: float = THROUGHPUT_WINDOW) -> dict[str, float | int | None]:
+        pass
+
+    @abstractmethod
+    def get_queue_size(self) -> int:
+        pass
+
+class MemoryTaskStore(TaskStore):
+    """
+    Keeps the tasks in this process, they are lost on restart and not shared between
+    API workers, leases are not needed as the tasks die with their workers
+    """
+    def __init__(self):
+        self.tasks: dict[str, SongCompilationTask] = {}
+        self._queue: list[tuple[int, int, str]] = []
+        self._jobs: dict[str, TaskJob] = {}
+        self._finished_at: dict[str, float] = {}
+        self._counts: dict[TaskStatus, int] = {}
+        self._fingerprints: dict[str, str] = {}
+        self._completions: deque[tuple[float, TaskStatus, float]] = deque()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _set_status(self, task: SongCompilationTask, status: TaskStatus | None):
+        if task.status in self._counts:
+            self._counts[task.status] -= 1
+        if status is not None:
+            self._counts[status] = self._counts.get(status, 0) + 1
+            task.status = status
+
+    def add(self, task: SongCompilationTask, job: TaskJob, now: float, fingerprint: str | None = None, reuse_since: float | None = None) -> SongCompilationTask:
+        with self._lock:
+            if fingerprint is not None:
+                existing: SongCompilationTask | None = self._find(fingerprint, reuse_since)
+                if existing is not None:
+                    return existing
+                self._fingerprints[fingerprint] = task.task_id
+            self._counts[task.status] = self._counts.get(task.status, 0) + 1
+            self.tasks[task.task_id] = task
+            self._jobs[task.task_id] = job
+            heapq.heappush(self._queue, (-task.priority, next(self._sequence), task.task_id))
+            return task
+
+    def _find(self, fingerprint: str, reuse_since: float | None) -> SongCompilationTask | None:
+        task: SongCompilationTask | None = self.tasks.get(self._fingerprints.get(fingerprint))
+        if task is None or not is_reusable(task.status, self._finished_at.get(task.task_id), reuse_since):
+            return None
+        return task
+
+    def find(self, fingerprint: str, reuse_since: float | None = None) -> SongCompilationTask | None:
+        with self._lock:
+            return self._find(fingerprint, reuse_since)
+
+    def claim(self, owner: str, lease_until: float) -> tuple[SongCompilationTask, TaskJob] | None:
+        with self._lock:
+            while len(self._queue) > 0:
+                priority, sequence, task_id = heapq.heappop(self._queue)
+                if task_id in self._jobs:
+                    task: SongCompilationTask = self.tasks[task_id]
+                    self._set_status(task, TaskStatus.PROCESSING)
+                    return task, self._jobs.pop(task_id)
+            return None
+
+    def cancel(self, task_id: str, now: float) -> bool:
+        with self._lock:
+            if task_id not in self._jobs:
+                return False
+            del self._jobs[task_id]
+            self._set_status(self.tasks[task_id], TaskStatus.CANCELLED)
+            self._finished_at[task_id] = now
+            return True
+
+    def update_telemetry(self, task_id: str, telemetry: TaskTelemetry):
+        with self._lock:
+            task: SongCompilationTask | None = self.tasks.get(task_id)
+            if task is not None and task.status == TaskStatus.PROCESSING:
+                task.telemetry = telemetry
+
+    def finish(self, task_id: str, status: TaskStatus, result: Any, telemetry: TaskTelemetry, now: float, duration: float = 0.0):
+        with self._lock:
+            task: SongCompilationTask = self.tasks[task_id]
+            self._set_status(task, status)
+            task.result, task.telemetry = result, telemetry
+            self._finished_at[task_id] = now
+            self._completions.append((now, status, duration))
+
+    def renew(self, owner: str, lease_until: float):
+        pass
+
+    def recover(self, now: float, max_attempts: int) -> int:
+        return 0
+
+    def purge(self, before: float) -> list[Any]:
+        with self._lock:
+            task_ids: list[str] = [task_id for task_id, finished_at in self._finished_at.items() if finished_at < before]
+            results: list[Any] = []
+            for task_id in task_ids:
+                del self._finished_at[task_id]
+                task: SongCompilationTask = self.tasks.pop(task_id)
+                self._set_status(task, None)
+                results.append(task.result)
+            while len(self._completions) > 0 and self._completions[0][0] < before:
+                self._completions.popleft()
+            for fingerprint, task_id in list(self._fingerprints.items()):
+                if task_id not in self.tasks:
+                    del self._fingerprints[fingerprint]
+            return results
+
+    def get(self, task_id: str) -> SongCompilationTask | None:
+        with self._lock:
+            return self.tasks.get(task_id)
+
+    def get_status_counts(self) -> dict[TaskStatus, int]:
+        with self._lock:
+            return { status : count for status, count in self._counts.items() if count > 0 }
+
+    def get_throughput(self, now: float, window: float = THROUGHPUT_WINDOW) -> dict[str, float | int | None]:
+        with self._lock:
+            return get_throughput([
+                (status, duration) for finished_at, status, duration in reversed(self._completions) if finished_at >= now - window
+            ], window)
+
+    def get_queue_size(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+class SqliteTaskStore(TaskStore):
+    """
+    Keeps the tasks in a sqlite database shared by the API workers of the host, the
+    tasks survive restarts and any worker can answer for any task
+
+    The jobs are pickled, so their function and arguments must be picklable
+
+    Parameter
+    ---------
+    filepath : str
+        the database file
+    """
+    def __init__(self, filepath: str = TASK_STORE_FILE):
+        self.database = SqliteDatabase(filepath, TASK_STORE_SCHEMA)
+
+    def add(self, task: SongCompilationTask, job: TaskJob, now: float, fingerprint: str | None = None, reuse_since: float | None = None) -> SongCompilationTask:
+        with self.database.transaction() as connection:
+            existing_task_id: str | None = self._find(connection, fingerprint, reuse_since) if fingerprint is not None else None
+            if existing_task_id is None:
+                connection.execute(
+                    "INSERT INTO tasks (task_id, status, priority, job, telemetry, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (task.task_id, task.status.value, task.priority, pickle.dumps(job), json.dumps(task.telemetry.to_dict()), now)
+                )
+                if fingerprint is not None:
+                    connection.execute("INSERT OR REPLACE INTO task_fingerprints VALUES (?, ?)", (fingerprint, task.task_id))
+        return self.get(existing_task_id) if existing_task_id is not None else task
+
+    def _find(self, connection, fingerprint: str, reuse_since: float | None) -> str | None:
+        row = connection.execute(
+            "SELECT tasks.task_id, tasks.status, tasks.finished_at FROM task_fingerprints JOIN tasks ON tasks.task_id = task_fingerprints.task_id WHERE fingerprint = ?",
+            (fingerprint,)
+        ).fetchone()
+        if row is None or not is_reusable(TaskStatus(row[1]), row[2], reuse_since):
+            return None
+        return row[0]
+
+    def find(self, fingerprint: str, reuse_since: float | None = None) -> SongCompilationTask | None:
+        task_id: str | None = self._find(self.database.connection(), fingerprint, reuse_since)
+        return self.get(task_id) if task_id is not None else None
+
+    def claim(self, owner: str, lease_until: float) -> tuple[SongCompilationTask, TaskJob] | None:
+        while True:
+            with self.database.transaction() as connection:
+                row = connection.execute(
+                    "SELECT task_id, priority, job, telemetry FROM tasks WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                    (TaskStatus.QUEUED.value,)
+                ).fetchone()
+                if row is None:
+                    return None
+                task_id, priority, job, telemetry = row
+                try:
+                    task_job: TaskJob = pickle.loads(job)
+                except Exception as error:
+                    print(error)
+                    connection.execute(
+                        "UPDATE tasks SET status = ?, job = NULL, finished_at = ? WHERE task_id = ?",
+                        (TaskStatus.FAILED.value, time.time(), task_id)
+                    )
+                    continue
+                connection.execute(
+                    "UPDATE tasks SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1 WHERE task_id = ?",
+                    (TaskStatus.PROCESSING.value, owner, lease_until, task_id)
+                )
+            task = SongCompilationTask(task_id, TaskStatus.PROCESSING, priority, telemetry=TaskTelemetry(**json.loads(telemetry)))
+            return task, task_job
+
+    def cancel(self, task_id: str, now: float) -> bool:
+        cursor = self.database.execute(
+            "UPDATE tasks SET status = ?, job = NULL, finished_at = ? WHERE task_id = ? AND status = ?",
+            (TaskStatus.CANCELLED.value, now, task_id, TaskStatus.QUEUED.value)
+        )
+        return cursor.rowcount > 0
+
+    def update_telemetry(self, task_id: str, telemetry: TaskTelemetry):
+        self.database.execute(
+            "UPDATE tasks SET telemetry = ? WHERE task_id = ? AND status = ?",
+            (json.dumps(telemetry.to_dict()), task_id, TaskStatus.PROCESSING.value)
+        )
+
+    def finish(self, task_id: str, status: TaskStatus, result: Any, telemetry: TaskTelemetry, now: float, duration: float = 0.0):
+        with self.database.transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, result = ?, telemetry = ?, job = NULL, owner = NULL, lease_until = NULL, finished_at = ? WHERE task_id = ?",
+                (status.value, json.dumps(result), json.dumps(telemetry.to_dict()), now, task_id)
+            )
+            connection.execute("INSERT INTO task_completions VALUES (?, ?, ?)", (now, status.value, duration))
+
+    def renew(self, owner: str, lease_until: float):
+        self.database.execute(
+            "UPDATE tasks SET lease_until = ? WHERE owner = ? AND status = ?", (lease_until, owner, TaskStatus.PROCESSING.value)
+        )
+
+    def recover(self, now: float, max_attempts: int) -> int:
+        with self.database.transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, job = NULL, owner = NULL, lease_until = NULL, finished_at = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (TaskStatus.FAILED.value, now, TaskStatus.PROCESSING.value, now, max_attempts)
+            )
+            cursor = connection.execute(
+                "UPDATE tasks SET status = ?, owner = NULL, lease_until = NULL, telemetry = ? WHERE status = ? AND lease_until < ?",
+                (TaskStatus.QUEUED.value, json.dumps(TaskTelemetry().to_dict()), TaskStatus.PROCESSING.value, now)
+            )
+            return cursor.rowcount
+
+    def purge(self, before: float) -> list[Any]:
+        with self.database.transaction() as connection:
+            connection.execute("DELETE FROM task_completions WHERE finished_at < ?", (before,))
+            rows = connection.execute("DELETE FROM tasks WHERE finished_at < ? RETURNING result", (before,)).fetchall()
+        return [json.loads(result) if result is not None else None for result, in rows]
+
+    def get(self, task_id: str) -> SongCompilationTask | None:
+        row = self.database.execute(
+            "SELECT status, priority, result, telemetry FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, priority, result, telemetry = row
+        return SongCompilationTask(
+            task_id, TaskStatus(status), priority,
+            json.loads(result) if result is not None else None,
+            TaskTelemetry(**json.loads(telemetry))
+        )
+
+    def get_status_counts(self) -> dict[TaskStatus, int]:
+        rows = self.database.execute("SELECT status, count FROM task_counts WHERE count > 0").fetchall()
+        return { TaskStatus(status) : count for status, count in rows }
+
+    def get_throughput(self, now: float, window: float = THROUGHPUT_WINDOW) -> dict[str, float | int | None]:
+        rows = self.database.execute(
+            "SELECT status, duration FROM task_completions WHERE finished_at >= ?", (now - window,)
+        ).fetchall()
+        return get_throughput([(TaskStatus(status), duration) for status, duration in rows], window)
+
+    def get_queue_size(self) -> int:
+        return self.database.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status = ?", (TaskStatus.QUEUED.value,)
+        ).fetchone()[0]
+
+def create_task_store(backend: str = TASK_STORE_BACKEND) -> TaskStore:
+    """
+    Get a task store from its backend name, "memory" or "sqlite"
+    """
+    if backend == "sqlite":
+        return SqliteTaskStore()
+    return MemoryTaskStore()
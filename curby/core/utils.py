@@ -1,6 +1,9 @@
+import asyncio
 import functools
 from typing import TypeVar, Callable
 
+from cachetools import TTLCache
+from cachetools.keys import hashkey
 from frozendict import frozendict
 
 ElementType = TypeVar("ElementType")
@@ -24,4 +27,37 @@ def generic_search(elements: list[ElementType], lamdba: Callable) -> int:
     elements_index = 0
     while (elements_index < len(elements) and not lamdba(elements[elements_index])):
         elements_index += 1
-    return elements_index
\ No newline at end of file
+    return elements_index
+
+def async_ttl_cache(maxsize: int = 128, ttl: float = 600):
+    """
+    Async counterpart of cachetools.func.ttl_cache
+
+    The running task is cached rather than its result, so concurrent callers with
+    the same arguments share a single call. Failed calls are not cached.
+
+    Parameter
+    ---------
+    maxsize : int
+        the maximum number of cached calls
+    ttl : float
+        the time to live of a cached call in seconds
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapped(*args, **kwargs):
+            key = hashkey(*args, **kwargs)
+            task: asyncio.Future | None = wrapped.cache.get(key)
+            if task is None or (not task.done() and task.get_loop() is not asyncio.get_running_loop()):
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                wrapped.cache[key] = task
+            try:
+                return await asyncio.shield(task)
+            except Exception:
+                if wrapped.cache.get(key) is task:
+                    del wrapped.cache[key]
+                raise
+        wrapped.cache = TTLCache(maxsize, ttl)
+        wrapped.cache_clear = wrapped.cache.clear
+        return wrapped
+    return decorator
\ No newline at end of file
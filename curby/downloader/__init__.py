@@ -0,0 +1 @@
+from .mididownloader import *
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+import uuid
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from curby.core import (
+    SqliteDatabase,
+    request_stream,
+    normalize_name,
+    MIDI_FOLDER,
+    DOWNLOAD_MAX_WORKERS
+)
+from curby.gather.service import freemidiservice
+from curby.gather.service.freemidiservice import FREEMIDI_HEADER
+from curby.error import (
+    FreeMidiError
+)
+
+MIDI_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS midis (
+    artist_name TEXT NOT NULL,
+    song_title TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (artist_name, song_title)
+);
+"""
+MIDI_HEADER = b"MThd"
+MIDI_CHUNK_SIZE = 64 * 1024
+
+class MidiStore:
+    """
+    Content addressed store of .mid files, a file is saved once per distinct content under
+    <folder>/<digest[:2]>/<digest>.mid and songs are indexed to the digest of their file
+
+    Parameter
+    ---------
+    folder : str
+        the root folder of the store
+    """
+    def __init__(self, folder: str):
+        self.folder: str = folder
+        self.database = SqliteDatabase(os.path.join(folder, "index.sqlite"), MIDI_STORE_SCHEMA)
+
+    def get_filepath(self, digest: str) -> str:
+        return os.path.join(self.folder, digest[:2], f"{digest}.mid")
+
+    def find(self, artist_name: str, song_title: str) -> str | None:
+        row = self.database.execute(
+            "SELECT digest FROM midis WHERE artist_name = ? AND song_title = ?",
+            (normalize_name(artist_name), normalize_name(song_title))
+        ).fetchone()
+        if row is None or not os.path.exists(self.get_filepath(row[0])):
+            return None
+        return self.get_filepath(row[0])
+
+    def add(self, artist_name: str, song_title: str, chunks) -> str:
+        temp_filepath: str = os.path.join(self.folder, f".{uuid.uuid4().hex}.part")
+        os.makedirs(self.folder, exist_ok=True)
+        hasher = hashlib.sha256()
+        try:
+            with open(temp_filepath, "wb") as file:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    file.write(chunk)
+            filepath: str = self.get_filepath(hasher.hexdigest())
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            os.replace(temp_filepath, filepath)
+        finally:
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
+        self.database.execute(
+            "INSERT OR REPLACE INTO midis VALUES (?, ?, ?)",
+            (normalize_name(artist_name), normalize_name(song_title), hasher.hexdigest())
+        )
+        return filepath
+
+MIDI_STORE = MidiStore(MIDI_FOLDER)
+
+_downloads: dict[tuple[str, str], Future] = {}
+_downloads_lock = threading.Lock()
+
+def _iter_midi_chunks(response):
+    chunks = response.iter_content(MIDI_CHUNK_SIZE)
+    first_chunk: bytes = next(chunks, b"")
+    if response.status_code != 200 or not first_chunk.startswith(MIDI_HEADER):
+        raise FreeMidiError()
+    yield first_chunk
+    yield from chunks
+
+def _download_midi(artist_name: str, song_title: str) -> str:
+    download_route, cookie = freemidiservice.get_download_source(artist_name, song_title)
+    header: dict[str, str] = dict(FREEMIDI_HEADER)
+    if cookie is not None:
+        header["Cookie"] = cookie.split(";")[0]
+    header["Referer"] = f"https://freemidi.org/{freemidiservice.get_song_route(artist_name, song_title)}"
+    with request_stream(f"https://freemidi.org/{download_route}", header=header) as response:
+        return MIDI_STORE.add(artist_name, song_title, _iter_midi_chunks(response))
+
+def download_midi(artist_name: str, song_title: str) -> str:
+    """
+    Download the .mid file of a song from freemidi.org into the midi store
+
+    Parameter
+    ---------
+    artist_name : str
+        the artist name
+    song_title : str
+        the song title
+
+    Return
+    ------
+    the filepath of the .mid file
+
+    Example
+    -------
+    >>> download_midi("ariana grande", "pov")
+    >>> 'temp/midi/3f/3f9c...e1.mid'
+
+    Note
+    ----
+    Already stored songs are not downloaded again and concurrent calls for the same song share one download
+    """
+    filepath: str | None = MIDI_STORE.find(artist_name, song_title)
+    if filepath is not None:
+        return filepath
+
+    key: tuple[str, str] = (normalize_name(artist_name), normalize_name(song_title))
+    with _downloads_lock:
+        future: Future | None = _downloads.get(key)
+        is_owner: bool = future is None
+        if is_owner:
+            future = _downloads[key] = Future()
+    if not is_owner:
+        return future.result()
+
+    try:
+        future.set_result(_download_midi(artist_name, song_title))
+    except FreeMidiError as error:
+        future.set_exception(error)
+    except Exception as error:
+        print(error)
+        future.set_exception(FreeMidiError())
+    finally:
+        with _downloads_lock:
+            del _downloads[key]
+    return future.result()
+
+def _try_download_midi(artist_name: str, song_title: str) -> str | FreeMidiError:
+    try:
+        return download_midi(artist_name, song_title)
+    except FreeMidiError as error:
+        return error
+
+def download_midis(songs: list[tuple[str, str]], max_workers: int = DOWNLOAD_MAX_WORKERS) -> list[str | FreeMidiError]:
+    """
+    Download the .mid files of a list of artist name, song title pairs in parallel
+
+    Parameter
+    ---------
+    songs : list[tuple[str, str]]
+        the artist name, song title pairs
+    max_workers : int
+        the maximum number of parallel downloads
+
+    Return
+    ------
+    a list in the same order as <songs> holding either the filepath or the FreeMidiError of its download
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda song: _try_download_midi(*song), songs))
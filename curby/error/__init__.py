@@ -18,4 +18,20 @@ class ArtistBinderError(Exception):
 
 @dataclass
 class SongBinderError(Exception):
+    pass
+
+@dataclass
+class YoutubeError(Exception):
+    pass
+
+@dataclass
+class TaskQueueFullError(Exception):
+    pass
+
+@dataclass
+class RenderError(Exception):
+    pass
+
+@dataclass
+class RangeNotSatisfiableError(Exception):
     pass
\ No newline at end of file
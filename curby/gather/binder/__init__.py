@@ -1,6 +1,10 @@
 from .artistbinder import (
     get_artist,
+    get_artist_async,
 )
 from .songbinder import (
-    get_song
+    get_song,
+    get_song_async,
+    get_songs,
+    get_songs_async
 )
\ No newline at end of file
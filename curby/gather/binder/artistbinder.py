@@ -5,7 +5,8 @@ from curby.gather.service import (
 )
 from curby.core import (
     Artist,
-    REFRESH_TTL
+    REFRESH_TTL,
+    async_ttl_cache
 )
 from curby.error import (
     ArtistBinderError
@@ -37,6 +38,22 @@ def get_artist(artist_name: str) -> Artist:
     try:
         genres: list[str] = musicbrainzservice.get_artist_genres(artist_name)
         return Artist(artist_name, genres)
+    except Exception as error:
+        print(error)
+        raise ArtistBinderError()
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_artist_async(artist_name: str) -> Artist:
+    """
+    Async counterpart of get_artist(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    try:
+        genres: list[str] = await musicbrainzservice.get_artist_genres_async(artist_name)
+        return Artist(artist_name, genres)
     except Exception as error:
         print(error)
         raise ArtistBinderError()
\ No newline at end of file
@@ -1,3 +1,6 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from cachetools.func import ttl_cache 
 
 from curby.gather.service import (
@@ -9,7 +12,9 @@ from curby.gather.service import (
 from curby.core import (
     Song,
     REFRESH_TTL,
-    generic_search
+    BINDER_MAX_CONCURRENCY,
+    generic_search,
+    async_ttl_cache
 )
 from curby.error import (
     SongBinderError
@@ -45,9 +50,72 @@ def get_song(artist_name: str, song_title: str) -> Song:
         songs: list[tuple[str, str]] = musicbrainzservice.get_all_songs(artist_name)
         index: int = generic_search(songs, lambda element: element[0] == song_title)
         if index < len(songs):
-            title, route = songs[index]
-            song.genres = musicbrainzservice.get_song_genres(route)
+            song.genres = musicbrainzservice.get_song_genres(artist_name, song_title)
         return song
     except Exception as error:
         print(error)
-        raise SongBinderError()
\ No newline at end of file
+        raise SongBinderError()
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_song_async(artist_name: str, song_title: str) -> Song:
+    """
+    Async counterpart of get_song(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    try:
+        song = Song(song_title, artist_name)
+        songs: list[tuple[str, str]] = await musicbrainzservice.get_all_songs_async(artist_name)
+        index: int = generic_search(songs, lambda element: element[0] == song_title)
+        if index < len(songs):
+            song.genres = await musicbrainzservice.get_song_genres_async(artist_name, song_title)
+        return song
+    except Exception as error:
+        print(error)
+        raise SongBinderError()
+
+def _try_get_song(artist_name: str, song_title: str) -> Song | SongBinderError:
+    try:
+        return get_song(artist_name, song_title)
+    except SongBinderError as error:
+        return error
+
+def get_songs(songs: list[tuple[str, str]], max_concurrency: int = BINDER_MAX_CONCURRENCY) -> list[Song | SongBinderError]:
+    """
+    Resolve a list of artist name, song title pairs concurrently with get_song(...)
+
+    Parameter
+    ---------
+    songs : list[tuple[str, str]]
+        the artist name, song title pairs (as returned by billboardservice.get_popular(...))
+    max_concurrency : int
+        the maximum number of songs resolved at the same time
+
+    Return
+    ------
+    a list in the same order as <songs> holding either the song or the SongBinderError of its resolution
+
+    Example
+    -------
+    >>> .get_songs([("ariana grande", "my everything"), ("unknown", "unknown")])
+    >>> [Song(title='my everything', author='ariana grande', genres=[...]), SongBinderError()]
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return list(executor.map(lambda song: _try_get_song(*song), songs))
+
+async def get_songs_async(songs: list[tuple[str, str]], max_concurrency: int = BINDER_MAX_CONCURRENCY) -> list[Song | SongBinderError]:
+    """
+    Async counterpart of get_songs(...)
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def try_get_song(artist_name: str, song_title: str) -> Song | SongBinderError:
+        async with semaphore:
+            try:
+                return await get_song_async(artist_name, song_title)
+            except SongBinderError as error:
+                return error
+
+    return list(await asyncio.gather(*[try_get_song(author, title) for author, title in songs]))
\ No newline at end of file
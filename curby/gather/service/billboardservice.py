@@ -1,91 +1,79 @@
 import re
+import asyncio
 
-from bs4 import BeautifulSoup, Tag
+from lxml import html
+from lxml.html import HtmlElement
 from cachetools.func import ttl_cache
 
 from curby.core import (
     request,
+    request_async,
+    async_ttl_cache,
+    ChartEntry,
     REFRESH_TTL
 )
 from curby.error import (
     BillboardError
-) 
+)
 
 BILLBOARD_HEADER = {
     "User-Agent": "Chrome/120.0.0.0"
 }
+BILLBOARD_URL = "https://www.billboard.com/charts/hot-100/"
+BILLBOARD_ENTRIES = slice(6, 403, 4) #sometimes 5 or 6
 
-def _extract_title(element: Tag):
-    return ' '.join(re.findall(r'\w+', element.text)).lower()
+def _extract_words(text: str):
+    return ' '.join(re.findall(r'\w+', text)).lower()
 
-def _extract_author(element: Tag):
-    return ' '.join(re.findall(r'\w+', element.find_next_sibling('span').text)).lower()
+def _extract_title(element: HtmlElement):
+    return _extract_words(element.text_content())
 
+def _extract_author(element: HtmlElement):
+    return _extract_words(element.xpath("following-sibling::span[1]")[0].text_content())
 
-def _extract_titles(soup: BeautifulSoup, max_songs: int):
-    elements = soup.find_all(id="title-of-a-story")
-    elements = elements[6:403:4][:max_songs] #sometimes 5 or 6
-    return list(map(lambda element : _extract_title(element), elements))
+def _extract_weeks_on_chart(element: HtmlElement):
+    rows = element.xpath("ancestor::ul[contains(@class, 'o-chart-results-list-row')][1]")
+    if len(rows) == 0:
+        return None
+    numbers = [text.strip() for text in rows[0].xpath(".//span/text()") if text.strip().isdigit()]
+    return int(numbers[-1]) if len(numbers) > 0 else None
 
-def _extract_authors(soup: BeautifulSoup, max_songs: int):
-    elements = soup.find_all(id="title-of-a-story")
-    elements = elements[6:403:4][:max_songs] #sometimes 5 or 6
-    return list(map(lambda element : _extract_author(element), elements))
+def _extract_chart(document: HtmlElement):
+    elements = document.xpath("//*[@id='title-of-a-story']")[BILLBOARD_ENTRIES]
+    return [
+        ChartEntry(rank, _extract_title(element), _extract_author(element), _extract_weeks_on_chart(element))
+        for rank, element in enumerate(elements, start=1)
+    ]
 
+def _parse_chart(text: str) -> list[ChartEntry]:
+    return _extract_chart(html.fromstring(text))
 
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_songs_titles(max_titles: int) -> list[str]:
-    """
-    Scrap the song titles of the first <max_titles> on the billboard of billboard.com
 
-    Parameter
-    ---------
-    max_titles : int
-        song titles number to return
-    
-    Return
-    ------
-    a list of lenght <max_titles> of the songs' titles
-
-    Example
-    -------
-    >>> get_songs_authors(3)
-    >>> ['please please please', 'i had some help', 'a bar song tipsy']
-
-    Note
-    ----
-    This function is cached
-    """    
-    response = request("https://www.billboard.com/charts/hot-100/", header=BILLBOARD_HEADER)
-    return _extract_titles(BeautifulSoup(response.text, 'html.parser'), max_titles)
-
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_songs_authors(max_authors: int) -> list[str]:
+@ttl_cache(maxsize=1, ttl=REFRESH_TTL)
+def get_chart() -> list[ChartEntry]:
     """
-    Scrap the song authors of the first <max_authors> on the billboard of billboard.com
+    Scrap the hot 100 billboard of billboard.com, the page is fetched and parsed once per refresh
 
-    Parameter
-    ---------
-    max_authors : int
-        song authors number to return
-    
     Return
     ------
-    a list of length <max_authors> of the song authors
+    the list of chart entries ordered by rank
 
     Example
     -------
-    >>> get_songs_authors(3)
-    >>> ['sabrina carpenter', 'post malone featuring morgan wallen', 'shaboozey']
+    >>> get_chart()[:2]
+    >>> [ChartEntry(rank=1, title='please please please', author='sabrina carpenter', weeks_on_chart=2), ChartEntry(rank=2, title='i had some help', author='post malone featuring morgan wallen', weeks_on_chart=6)]
 
     Note
     ----
     This function is cached
-    """ 
-    response = request("https://www.billboard.com/charts/hot-100/", header=BILLBOARD_HEADER)
-    return _extract_authors(BeautifulSoup(response.text, 'html.parser'), max_authors)
+    """
+    try:
+        response = request(BILLBOARD_URL, header=BILLBOARD_HEADER)
+        return _parse_chart(response.text)
+    except Exception as error:
+        print(error)
+        raise BillboardError()
 
-@ttl_cache(ttl=REFRESH_TTL)
 def get_popular(max_songs: int = 1) -> list[tuple[str, str]]:
     """
     Get <max_songs> number of song titles and authors pairs on the billboard on billboard.com
@@ -94,7 +82,7 @@ def get_popular(max_songs: int = 1) -> list[tuple[str, str]]:
     ---------
     <max_songs> : int
         the number of songs to scrap on the billboard
-    
+
     Return
     ------
     a list of lenght <max_songs> of pair of a song title and author
@@ -103,11 +91,31 @@ def get_popular(max_songs: int = 1) -> list[tuple[str, str]]:
     --------------
     >>> [('sabrina carpenter', 'please please please'), ('post malone featuring morgan wallen', 'i had some help'), ('shaboozey', 'a bar song tipsy')]
 
+    Note
+    ----
+    Every <max_songs> is served from the cached chart of get_chart()
+    """
+    return [(entry.author, entry.title) for entry in get_chart()[:max_songs]]
+
+
+@async_ttl_cache(maxsize=1, ttl=REFRESH_TTL)
+async def get_chart_async() -> list[ChartEntry]:
+    """
+    Async counterpart of get_chart()
+
+    Note
+    ----
+    This function is cached
     """
     try:
-        song_authors = _get_songs_authors(max_songs)
-        song_titles = _get_songs_titles(max_songs)
-        return list(zip(song_authors, song_titles))
+        response = await request_async(BILLBOARD_URL, header=BILLBOARD_HEADER)
+        return await asyncio.to_thread(_parse_chart, response.text)
     except Exception as error:
         print(error)
-        raise BillboardError()
\ No newline at end of file
+        raise BillboardError()
+
+async def get_popular_async(max_songs: int = 1) -> list[tuple[str, str]]:
+    """
+    Async counterpart of get_popular(...)
+    """
+    return [(entry.author, entry.title) for entry in (await get_chart_async())[:max_songs]]
@@ -0,0 +1,119 @@
+import re
+import time
+
+from curby.core import (
+    SqliteDatabase,
+    normalize_name,
+    FREEMIDI_CATALOG_FILE
+)
+
+FREEMIDI_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    route TEXT PRIMARY KEY,
+    letter TEXT NOT NULL,
+    name TEXT NOT NULL,
+    normalized_name TEXT NOT NULL,
+    crawled_at REAL
+);
+CREATE INDEX IF NOT EXISTS artists_letter ON artists (letter);
+CREATE INDEX IF NOT EXISTS artists_normalized_name ON artists (normalized_name);
+CREATE TABLE IF NOT EXISTS songs (
+    route TEXT PRIMARY KEY,
+    artist_route TEXT NOT NULL,
+    title TEXT NOT NULL,
+    normalized_title TEXT NOT NULL,
+    download_route TEXT
+);
+CREATE INDEX IF NOT EXISTS songs_artist_title ON songs (artist_route, normalized_title);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+def _extract_download_route(song_route: str) -> str | None:
+    match = re.match(r'download\d*-(\d+)-', song_route)
+    return f"getter-{match.group(1)}" if match is not None else None
+
+class FreeMidiCatalog:
+    """
+    Local snapshot of the freemidi.org artists and songs listings
+
+    The listings are diffed on every update so only added and removed rows are
+    written, lookups are local reads on indexed columns.
+
+    Parameter
+    ---------
+    filepath : str
+        the sqlite file of the catalog
+    """
+    def __init__(self, filepath: str):
+        self.database = SqliteDatabase(filepath, FREEMIDI_CATALOG_SCHEMA)
+
+    def update_artists(self, letter: str, artists: list[tuple[str, str]]) -> tuple[list[str], list[str]]:
+        stored_routes: set[str] = {row[0] for row in self.database.execute("SELECT route FROM artists WHERE letter = ?", (letter,))}
+        listed_artists: dict[str, str] = {route: name for name, route in artists}
+        added_routes: list[str] = [route for route in listed_artists if route not in stored_routes]
+        removed_routes: list[str] = [route for route in stored_routes if route not in listed_artists]
+        with self.database.transaction() as connection:
+            connection.executemany(
+                "INSERT INTO artists (route, letter, name, normalized_name) VALUES (?, ?, ?, ?)",
+                [(route, letter, listed_artists[route], normalize_name(listed_artists[route])) for route in added_routes]
+            )
+            connection.executemany("DELETE FROM artists WHERE route = ?", [(route,) for route in removed_routes])
+            connection.executemany("DELETE FROM songs WHERE artist_route = ?", [(route,) for route in removed_routes])
+        return added_routes, removed_routes
+
+    def update_songs(self, artist_route: str, songs: list[tuple[str, str]]) -> tuple[list[str], list[str]]:
+        stored_routes: set[str] = {row[0] for row in self.database.execute("SELECT route FROM songs WHERE artist_route = ?", (artist_route,))}
+        listed_songs: dict[str, str] = {route: title for title, route in songs}
+        added_routes: list[str] = [route for route in listed_songs if route not in stored_routes]
+        removed_routes: list[str] = [route for route in stored_routes if route not in listed_songs]
+        with self.database.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO songs VALUES (?, ?, ?, ?, ?)",
+                [(route, artist_route, listed_songs[route], normalize_name(listed_songs[route]), _extract_download_route(route)) for route in added_routes]
+            )
+            connection.executemany("DELETE FROM songs WHERE route = ?", [(route,) for route in removed_routes])
+            connection.execute("UPDATE artists SET crawled_at = ? WHERE route = ?", (time.time(), artist_route))
+        return added_routes, removed_routes
+
+    def get_stale_artists(self, max_age: float) -> list[str]:
+        rows = self.database.execute(
+            "SELECT route FROM artists WHERE crawled_at IS NULL OR crawled_at < ?", (time.time() - max_age,)
+        )
+        return [row[0] for row in rows]
+
+    def find_artist(self, artist_name: str) -> str | None:
+        row = self.database.execute(
+            "SELECT route FROM artists WHERE normalized_name = ? ORDER BY name = ? DESC LIMIT 1",
+            (normalize_name(artist_name), artist_name)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def find_song(self, artist_name: str, song_title: str) -> tuple[str, str | None] | None:
+        artist_route: str | None = self.find_artist(artist_name)
+        if artist_route is None:
+            return None
+        row = self.database.execute(
+            "SELECT route, download_route FROM songs WHERE artist_route = ? AND normalized_title = ? ORDER BY title = ? DESC LIMIT 1",
+            (artist_route, normalize_name(song_title), song_title)
+        ).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    def acquire_lease(self, name: str, owner: str, duration: float) -> bool:
+        now: float = time.time()
+        cursor = self.database.execute(
+            "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (name, owner, now + duration, now)
+        )
+        return cursor.rowcount == 1
+
+    def get_stats(self) -> dict[str, int]:
+        artists, crawled = self.database.execute("SELECT COUNT(*), COUNT(crawled_at) FROM artists").fetchone()
+        songs: int = self.database.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+        return {"ARTISTS" : artists, "CRAWLED_ARTISTS" : crawled, "SONGS" : songs}
+
+FREEMIDI_CATALOG = FreeMidiCatalog(FREEMIDI_CATALOG_FILE)
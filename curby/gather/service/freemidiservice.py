@@ -1,21 +1,36 @@
 import re
+import os
+import time
+import string
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from bs4 import BeautifulSoup, Tag
 from requests import Response
 from cachetools.func import ttl_cache
 
 from curby.core import (
-    request, 
+    request,
+    request_async,
+    async_ttl_cache,
+    NameIndex,
+    get_max_inflight,
     REFRESH_TTL,
-    generic_search
+    FREEMIDI_CATALOG_REFRESH_INTERVAL
 )
 from curby.error import (
     FreeMidiError
 )
+from curby.gather.service.freemidicatalog import (
+    FREEMIDI_CATALOG
+)
 
 FREEMIDI_HEADER = {
     "User-Agent": "Chrome/121.0.0.0"
 }
+FREEMIDI_FUZZY_CUTOFF = 0.85
+FREEMIDI_LETTERS = string.ascii_lowercase + string.digits
 
 def _extract_name(element: Tag):
     return element.text.lower()
@@ -32,177 +47,115 @@ def _extract_song_route(element: Tag):
 
 def _extract_download_route(soup: BeautifulSoup):
     return soup.find('a', id='downloadmidi')['href']
-    
+
 def _extract_cookie(response: Response):
     return response.headers.get("Set-Cookie")
 
-def _extract_names(soup: BeautifulSoup):
-    return list(map(lambda element : _extract_name(element), soup.select(".genre-link-text")))
-
-def _extract_routes(soup: BeautifulSoup):
-    return list(map(lambda element : _extract_route(element), soup.select(".genre-link-text")))
+def _extract_artists(soup: BeautifulSoup):
+    return list(map(lambda element : (_extract_name(element), _extract_route(element)), soup.select(".genre-link-text")))
 
-def _extract_song_titles(soup: BeautifulSoup):
-    return list(map(lambda element : _extract_song_title(element), soup.select(".artist-song-cell")))
+def _extract_songs(soup: BeautifulSoup):
+    return list(map(lambda element : (_extract_song_title(element), _extract_song_route(element)), soup.select(".artist-song-cell")))
 
-def _extract_song_routes(soup: BeautifulSoup):
-    return list(map(lambda element : _extract_song_route(element), soup.select(".artist-song-cell")))
+def _parse_artists(text: str) -> list[tuple[str, str]]:
+    return _extract_artists(BeautifulSoup(text, 'lxml'))
 
+def _parse_songs(text: str) -> list[tuple[str, str]]:
+    return _extract_songs(BeautifulSoup(text, 'lxml'))
 
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_names(letter: str) -> list[str]:
-    """
-    Scrap freemidi.org to get list the all artists' names that begins by the letter <letter>
+def _parse_artist_index(text: str) -> NameIndex:
+    return NameIndex(_parse_artists(text))
 
-    Parameter
-    ---------
-    letter : str
-        the begining letter of the artist
-
-    Return
-    ------
-    a list the all artists' names that begins by the letter <letter>
-    
-    Example
-    -------
-    >>> get_names("a")
-    >>> ['a dub', 'a f i', 'a flock of seagulls', 'a perfect circle', 'a taste of honey', ... ]
+def _parse_song_index(text: str) -> NameIndex:
+    return NameIndex(_parse_songs(text))
 
-    Note
-    ----
-    This function is cached
-    """
-    response = request(f"https://freemidi.org/artists-{letter.lower()}", header=FREEMIDI_HEADER)
-    return _extract_names(BeautifulSoup(response.text, 'html.parser'))
 
 @ttl_cache(ttl=REFRESH_TTL)
-def _get_routes(letter: str) -> list[str]:
+def _get_artist_index(letter: str) -> NameIndex:
     """
-    Scrap the all routes of the artirts that beginings with the letter <letter>
+    Scrap freemidi.org once to index all the artists' names that begins by the letter <letter> to their routes
 
     Parameter
     ---------
     letter : str
-        the first letter of the artist
-
-    Return
-    ------
-    a list of all the letter <letter> of artists'routes
-    
-    Example
-    -------
-    >>> get_routes("a")
-    >>> ['artist-1191-a-dub', 'artist-140-a-f-i', 'artist-1886-a-flock-of-seagulls', ... ]
-    
-    Note
-    ----
-    This function is cached
-    """
-    response = request(f"https://freemidi.org/artists-{letter.lower()}", header=FREEMIDI_HEADER)
-    return _extract_routes(BeautifulSoup(response.text, 'html.parser'))
-
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_download_route(song_route: str) -> list[str]:
-    """
-    Scrap freemidi.org to get the download route from the song route
-
-    Parameter
-    ---------
-    song_route : str
-        the song route to start from (gotten from .get_routes(...))
-
-    Return
-    ------
-    a list of downlaod routes
-
-    Example
-    -------
-    >>> get_download_route("artist-1886-a-flock-of-seagulls")
-    >>> ['download3-18484-i-ran-so-far-away-a-flock-of-seagulls', 'download3-18483-the-more-you-live-more-you-love-a-flock-of-seagulls']
-    
-    Note
-    ----
-    This function is cached
-    """
-    response = request(f"https://freemidi.org/{song_route}", header=FREEMIDI_HEADER)
-    return _extract_download_route(BeautifulSoup(response.text, 'html.parser'))
+        the begining letter of the artist
 
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_cookie(song_route: str) -> str:
-    """
-    Scrap freemidi.org to get the cookie from the song route 
-    
-    Parameter
-    ---------
-    song_route : str
-        the song route to start from (gotten from .get_routes(...))
-    
     Return
     ------
-    the cookie 
+    the index of the artists' names to the artists' routes
 
     Example
     -------
-    >>> get_cookie('artist-1886-a-flock-of-seagulls')
-    >>> PHPSESSID=a87rdmj2h87lf4qth51rqlc0e0; path=/
+    >>> get_artist_index("a").find("a flock of seagulls")
+    >>> 'artist-1886-a-flock-of-seagulls'
 
     Note
     ----
     This function is cached
     """
-    response = request(f"https://freemidi.org/{song_route}", header=FREEMIDI_HEADER)
-    return _extract_cookie(response)
+    response = request(f"https://freemidi.org/artists-{letter.lower()}", header=FREEMIDI_HEADER)
+    return _parse_artist_index(response.text)
 
 @ttl_cache(ttl=REFRESH_TTL)
-def _get_song_titles(artist_route: str) -> list[str]:
+def _get_song_index(artist_route: str) -> NameIndex:
     """
-    Scrap freemidi.org to get a the songs list from the artist_route
+    Scrap freemidi.org once to index the songs titles of the artist route to their routes
 
     Parameter
     ---------
     artist_route : str
-        the artirst route (gotten from .get_routes(...))
+        the artirst route (gotten from .get_artist_route(...))
 
     Return
     ------
+    the index of the songs titles to the songs routes
 
     Example
     -------
-    >>> get_song_titles('artist-1191-a-dub')
-    >>> ['who i be']
+    >>> get_song_index('artist-1886-a-flock-of-seagulls').find('i ran so far away')
+    >>> 'download3-18484-i-ran-so-far-away-a-flock-of-seagulls'
 
     Note
     ----
     This function is cached
     """
     response = request(f"https://freemidi.org/{artist_route}", header=FREEMIDI_HEADER)
-    return _extract_song_titles(BeautifulSoup(response.text, 'html.parser'))
+    return _parse_song_index(response.text)
+
+def _fetch_song_page(song_route: str) -> tuple[str, str]:
+    response = request(f"https://freemidi.org/{song_route}", header=FREEMIDI_HEADER, cached=False)
+    return _extract_download_route(BeautifulSoup(response.text, 'lxml')), _extract_cookie(response)
 
 @ttl_cache(ttl=REFRESH_TTL)
-def _get_song_routes(artist_route: str) -> list[str]:
+def _get_song_page(song_route: str) -> tuple[str, str]:
     """
-    Scrap a list songs routes from the artist route
+    Scrap freemidi.org once to get both the download route and the cookie from the song route
 
     Parameter
     ---------
-    artist_route : str
-        the artist route
+    song_route : str
+        the song route to start from (gotten from .get_song_route(...))
 
     Return
     ------
-    list of songs routes
+    a pair of download route, cookie
 
     Example
     -------
-    >>> get_song_routes('artist-1886-a-flock-of-seagulls')
-    >>> ['download3-18484-i-ran-so-far-away-a-flock-of-seagulls', 'download3-18483-the-more-you-live-more-you-love-a-flock-of-seagulls']
+    >>> get_song_page("download3-26867-pov-ariana-grande")
+    >>> ('getter-26867', 'PHPSESSID=a87rdmj2h87lf4qth51rqlc0e0; path=/')
 
     Note
     ----
     This function is cached
     """
-    response = request(f"https://freemidi.org/{artist_route}", header=FREEMIDI_HEADER)
-    return _extract_song_routes(BeautifulSoup(response.text, 'html.parser'))
+    return _fetch_song_page(song_route)
+
+def _get_download_route(song_route: str) -> str:
+    return _get_song_page(song_route)[0]
+
+def _get_cookie(song_route: str) -> str:
+    return _get_song_page(song_route)[1]
 
 
 @ttl_cache(ttl=REFRESH_TTL)
@@ -218,7 +171,7 @@ def get_artist_route(artist_name: str) -> str:
     Return
     ------
     artists_route : str
-        the artist route 
+        the artist route
 
     Example
     -------
@@ -227,18 +180,18 @@ def get_artist_route(artist_name: str) -> str:
 
     Note
     ----
-    This function is cached
+    This function is cached, the name is matched exactly, then normalized, then fuzzily
+    and a FreeMidiError is raised when no artist matches
     """
     try:
-        artists_names: list[str] = _get_names(artist_name[0])
-        artists_routes: list[str] = _get_routes(artist_name[0])
-        artists: list[tuple[str, str]] = list(zip(artists_names, artists_routes))
-        find_index: int = generic_search(artists, lambda element: element[0] == artist_name)
-        artists_name, artists_route = artists[find_index]
-        return artists_route
+        artists_route: str | None = _get_artist_index(artist_name[0]).find(artist_name, FREEMIDI_FUZZY_CUTOFF)
     except Exception as error:
         print(error)
         raise FreeMidiError()
+    if artists_route is None:
+        print(f"no artist named {artist_name}")
+        raise FreeMidiError()
+    return artists_route
 
 @ttl_cache(ttl=REFRESH_TTL)
 def get_song_route(artist_name: str, song_title: str) -> str:
@@ -251,7 +204,7 @@ def get_song_route(artist_name: str, song_title: str) -> str:
         the artist name
     song_title : str
         the song title
-    
+
     Return
     ------
     the song route
@@ -263,19 +216,22 @@ def get_song_route(artist_name: str, song_title: str) -> str:
 
     Note
     ----
-    This function is cached
+    This function is cached, the song is first looked up in the local catalog, then the title is
+    matched exactly, then normalized, then fuzzily and a FreeMidiError is raised when no song matches
     """
+    catalog_song: tuple[str, str | None] | None = FREEMIDI_CATALOG.find_song(artist_name, song_title)
+    if catalog_song is not None:
+        return catalog_song[0]
+    artist_route: str = get_artist_route(artist_name)
     try:
-        artist_route: str = get_artist_route(artist_name)
-        songs_titles: list[str] = _get_song_titles(artist_route)
-        songs_routes: list[str] = _get_song_routes(artist_route)
-        songs: list[tuple[str, str]] = list(zip(songs_titles, songs_routes))
-        find_index: int = generic_search(songs, lambda element: element[0] == song_title)
-        title, song_route = songs[find_index]
-        return song_route
+        song_route: str | None = _get_song_index(artist_route).find(song_title, FREEMIDI_FUZZY_CUTOFF)
     except Exception as error:
         print(error)
         raise FreeMidiError()
+    if song_route is None:
+        print(f"no song titled {song_title} by {artist_name}")
+        raise FreeMidiError()
+    return song_route
 
 @ttl_cache(ttl=REFRESH_TTL)
 def get_download_route(artist_name: str, song_title: str) -> str:
@@ -300,10 +256,13 @@ def get_download_route(artist_name: str, song_title: str) -> str:
 
     Note
     ----
-    This function is cached
+    This function is cached, the local catalog is read first
     """
+    catalog_song: tuple[str, str | None] | None = FREEMIDI_CATALOG.find_song(artist_name, song_title)
+    if catalog_song is not None and catalog_song[1] is not None:
+        return catalog_song[1]
+    song_route: str = get_song_route(artist_name, song_title)
     try:
-        song_route: str = get_song_route(artist_name, song_title)
         download_route: str = _get_download_route(song_route)
         return download_route
     except Exception as error:
@@ -330,14 +289,227 @@ def get_cookie(artist_name: str, song_title: str) -> str:
     -------
     >>> get_cookie("ariana grande", "pov")
     >>> PHPSESSID=gmcrphc99ms4jvhoplvst0pem6; path=/
-    
+
     Note
     ----
     This function is cached
     """
+    song_route: str = get_song_route(artist_name, song_title)
     try:
-        song_route: str = get_song_route(artist_name, song_title)
         return _get_cookie(song_route)
     except Exception as error:
         print(error)
-        raise FreeMidiError()
\ No newline at end of file
+        raise FreeMidiError()
+
+
+def get_download_source(artist_name: str, song_title: str) -> tuple[str, str]:
+    """
+    From the artist name and the song title get the download route with its cookie,
+    both come from a single fetch of the song page
+
+    Parameter
+    ---------
+    artist_name : str
+        the artist name
+    song_title : str
+        the song title
+
+    Return
+    ------
+    a pair of download route, cookie
+
+    Example
+    -------
+    >>> get_download_source("ariana grande", "pov")
+    >>> ('getter-26867', 'PHPSESSID=gmcrphc99ms4jvhoplvst0pem6; path=/')
+
+    Note
+    ----
+    This function is not cached so the cookie is always a fresh one
+    """
+    song_route: str = get_song_route(artist_name, song_title)
+    try:
+        return _fetch_song_page(song_route)
+    except Exception as error:
+        print(error)
+        raise FreeMidiError()
+
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def _get_artist_index_async(letter: str) -> NameIndex:
+    response = await request_async(f"https://freemidi.org/artists-{letter.lower()}", header=FREEMIDI_HEADER)
+    return await asyncio.to_thread(_parse_artist_index, response.text)
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def _get_song_index_async(artist_route: str) -> NameIndex:
+    response = await request_async(f"https://freemidi.org/{artist_route}", header=FREEMIDI_HEADER)
+    return await asyncio.to_thread(_parse_song_index, response.text)
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def _get_song_page_async(song_route: str) -> tuple[str, str]:
+    response = await request_async(f"https://freemidi.org/{song_route}", header=FREEMIDI_HEADER, cached=False)
+    soup: BeautifulSoup = await asyncio.to_thread(BeautifulSoup, response.text, 'lxml')
+    return _extract_download_route(soup), _extract_cookie(response)
+
+async def _get_download_route_async(song_route: str) -> str:
+    return (await _get_song_page_async(song_route))[0]
+
+async def _get_cookie_async(song_route: str) -> str:
+    return (await _get_song_page_async(song_route))[1]
+
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_artist_route_async(artist_name: str) -> str:
+    """
+    Async counterpart of get_artist_route(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    try:
+        artists_route: str | None = (await _get_artist_index_async(artist_name[0])).find(artist_name, FREEMIDI_FUZZY_CUTOFF)
+    except Exception as error:
+        print(error)
+        raise FreeMidiError()
+    if artists_route is None:
+        print(f"no artist named {artist_name}")
+        raise FreeMidiError()
+    return artists_route
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_song_route_async(artist_name: str, song_title: str) -> str:
+    """
+    Async counterpart of get_song_route(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    catalog_song: tuple[str, str | None] | None = await asyncio.to_thread(FREEMIDI_CATALOG.find_song, artist_name, song_title)
+    if catalog_song is not None:
+        return catalog_song[0]
+    artist_route: str = await get_artist_route_async(artist_name)
+    try:
+        song_route: str | None = (await _get_song_index_async(artist_route)).find(song_title, FREEMIDI_FUZZY_CUTOFF)
+    except Exception as error:
+        print(error)
+        raise FreeMidiError()
+    if song_route is None:
+        print(f"no song titled {song_title} by {artist_name}")
+        raise FreeMidiError()
+    return song_route
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_download_route_async(artist_name: str, song_title: str) -> str:
+    """
+    Async counterpart of get_download_route(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    catalog_song: tuple[str, str | None] | None = await asyncio.to_thread(FREEMIDI_CATALOG.find_song, artist_name, song_title)
+    if catalog_song is not None and catalog_song[1] is not None:
+        return catalog_song[1]
+    song_route: str = await get_song_route_async(artist_name, song_title)
+    try:
+        return await _get_download_route_async(song_route)
+    except Exception as error:
+        print(error)
+        raise FreeMidiError()
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_cookie_async(artist_name: str, song_title: str) -> str:
+    """
+    Async counterpart of get_cookie(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    song_route: str = await get_song_route_async(artist_name, song_title)
+    try:
+        return await _get_cookie_async(song_route)
+    except Exception as error:
+        print(error)
+        raise FreeMidiError()
+
+
+def _refresh_catalog_artist(artist_route: str) -> tuple[int, int]:
+    response = request(f"https://freemidi.org/{artist_route}", header=FREEMIDI_HEADER, cached=False)
+    added_routes, removed_routes = FREEMIDI_CATALOG.update_songs(artist_route, _parse_songs(response.text))
+    return len(added_routes), len(removed_routes)
+
+def refresh_catalog(letters: str = FREEMIDI_LETTERS, max_age: float = FREEMIDI_CATALOG_REFRESH_INTERVAL) -> dict[str, int]:
+    """
+    Crawl freemidi.org into the local catalog, only the changes of the listings are written,
+    the listings bypass the response cache so a refresh always sees the current site
+
+    Parameter
+    ---------
+    letters : str
+        the artists' begining letters to crawl
+    max_age : float
+        the age in seconds after which an artist songs listing is crawled again
+
+    Return
+    ------
+    the number of added and removed artists and songs
+
+    Example
+    -------
+    >>> refresh_catalog("a")
+    >>> {'ARTISTS_ADDED': 612, 'ARTISTS_REMOVED': 0, 'SONGS_ADDED': 3470, 'SONGS_REMOVED': 0, 'ERRORS': 0}
+    """
+    stats: dict[str, int] = {"ARTISTS_ADDED" : 0, "ARTISTS_REMOVED" : 0, "SONGS_ADDED" : 0, "SONGS_REMOVED" : 0, "ERRORS" : 0}
+    for letter in letters:
+        try:
+            response = request(f"https://freemidi.org/artists-{letter}", header=FREEMIDI_HEADER, cached=False)
+            added_routes, removed_routes = FREEMIDI_CATALOG.update_artists(letter, _parse_artists(response.text))
+            stats["ARTISTS_ADDED"] += len(added_routes)
+            stats["ARTISTS_REMOVED"] += len(removed_routes)
+        except Exception as error:
+            print(error)
+            stats["ERRORS"] += 1
+
+    with ThreadPoolExecutor(max_workers=get_max_inflight("freemidi.org")) as executor:
+        futures = [executor.submit(_refresh_catalog_artist, route) for route in FREEMIDI_CATALOG.get_stale_artists(max_age)]
+        for future in futures:
+            try:
+                songs_added, songs_removed = future.result()
+                stats["SONGS_ADDED"] += songs_added
+                stats["SONGS_REMOVED"] += songs_removed
+            except Exception as error:
+                print(error)
+                stats["ERRORS"] += 1
+    return stats
+
+def start_catalog_refresher(interval: float = FREEMIDI_CATALOG_REFRESH_INTERVAL) -> threading.Event:
+    """
+    Start a background thread refreshing the local catalog every <interval> seconds,
+    only one process sharing the catalog file refreshes it at a time
+
+    Parameter
+    ---------
+    interval : float
+        the seconds between two refreshes
+
+    Return
+    ------
+    the event to set to stop the refresher
+    """
+    stop_event = threading.Event()
+    owner: str = f"{os.getpid()}-{threading.get_ident()}-{time.time()}"
+
+    def refresh_loop():
+        while not stop_event.is_set():
+            if FREEMIDI_CATALOG.acquire_lease("refresh", owner, interval):
+                try:
+                    print(refresh_catalog(max_age=interval))
+                except Exception as error:
+                    print(error)
+            stop_event.wait(interval)
+
+    threading.Thread(target=refresh_loop, name="freemidi-catalog-refresher", daemon=True).start()
+    return stop_event
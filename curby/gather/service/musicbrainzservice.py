@@ -1,52 +1,80 @@
-from bs4 import BeautifulSoup, Tag
+import asyncio
+import threading
+
+from lxml import html
+from lxml.html import HtmlElement
+from cachetools import TTLCache
 from cachetools.func import ttl_cache
 
 from curby.core import (
-    request, 
+    request,
+    request_async,
+    async_ttl_cache,
+    ArtistPage,
     REFRESH_TTL,
+    ARTIST_PAGE_CACHE_BYTES,
     generic_search
 )
 from curby.error import (
     MusicBrainzError
 )
 
-def _extract_title(element: Tag):
-    return list(element.children)[1].text.lower()
-
-def _extract_song_route(element: Tag):
-    if element.find("a") is not None:
-        return element.find("a").get("href")
-    else:
-        return "None"
+_artist_pages: TTLCache = TTLCache(ARTIST_PAGE_CACHE_BYTES, REFRESH_TTL, getsizeof=ArtistPage.get_memory_size)
+_artist_pages_lock = threading.Lock()
 
-def _extract_route(soup: BeautifulSoup):
-    artists_lines = soup.find_all(attrs={"data-score": True})
+def _extract_route(document: HtmlElement):
+    artists_lines = document.xpath("//*[@data-score]")
     if len(artists_lines) > 0:
-        chossen_artist : Tag = artists_lines[0]
-        return chossen_artist.contents[0].contents[0].get("href")
-
-def _extract_artist_genres(soup: BeautifulSoup):
-    genre_root = soup.select(".genre-list")
-    genres_tag = list(list(genre_root[0].children)[0])[::2]
-    return [tag.text for tag in genres_tag if tag.text != '(none)']
-
-def _extract_titles(soup: BeautifulSoup):
-    titles: list[str] = map(lambda element : _extract_title(element), soup.select("tr"))
-    return list(filter(lambda element : element != "title", titles))
-
-def _extract_song_genres(soup: BeautifulSoup):
-    genre_root = soup.select(".genre-list")
-    genres_tag = list(list(genre_root[0].children)[0])[::2]
-    return [tag.text for tag in genres_tag if tag.text != '(none)']
-
-def _extract_songs_routes(soup: BeautifulSoup) -> list[str]:
-    return list(map(lambda element : _extract_song_route(element), soup.select("tr")))
+        chossen_artist : HtmlElement = artists_lines[0]
+        return chossen_artist.xpath(".//a/@href")[0]
+
+def _extract_genres(document: HtmlElement):
+    genre_root = document.find_class("genre-list")
+    if len(genre_root) == 0 or len(genre_root[0]) == 0:
+        return []
+    genres_tag = list(genre_root[0][0])
+    return [tag.text_content() for tag in genres_tag if tag.text_content() != '(none)']
+
+def _extract_release_group(element: HtmlElement):
+    cells = list(element)
+    routes = element.xpath(".//a/@href")
+    if len(cells) < 2 or len(routes) == 0:
+        return None
+    title: str = cells[1].text_content().strip().lower()
+    if title == "title":
+        return None
+    return (title, routes[0])
+
+def _extract_release_groups(document: HtmlElement):
+    release_groups = map(lambda element : _extract_release_group(element), document.iter("tr"))
+    return tuple(filter(lambda element : element is not None, release_groups))
+
+def _parse_route(text: str) -> str:
+    return _extract_route(html.fromstring(text))
+
+def _parse_artist_page(text: str) -> ArtistPage:
+    document: HtmlElement = html.fromstring(text)
+    return ArtistPage(tuple(_extract_genres(document)), _extract_release_groups(document))
+
+def _parse_song_genres(text: str) -> list[str]:
+    return _extract_genres(html.fromstring(text))
+
+def _get_cached_artist_page(artist_route: str) -> ArtistPage | None:
+    with _artist_pages_lock:
+        return _artist_pages.get(artist_route)
+
+def _set_cached_artist_page(artist_route: str, artist_page: ArtistPage):
+    with _artist_pages_lock:
+        try:
+            _artist_pages[artist_route] = artist_page
+        except ValueError:
+            pass
 
 @ttl_cache(ttl=REFRESH_TTL)
 def _get_artist_route(artist_name: str) -> str:
     """
     Scrap from the artist name get the artist route
-    
+
     Parameter
     ---------
     artist_name : str
@@ -66,12 +94,11 @@ def _get_artist_route(artist_name: str) -> str:
     This function is cached
     """
     response = request(f"https://musicbrainz.org/taglookup/index?tag-lookup.artist={artist_name}")
-    return _extract_route(BeautifulSoup(response.text, "html.parser"))
+    return _parse_route(response.text)
 
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_artist_genres(artist_route: str) -> list[str]:
+def _get_artist_page(artist_route: str) -> ArtistPage:
     """
-    Scrap from the artist route the artist genres
+    Scrap and parse once the artist page from the artist route
 
     Parameter
     ---------
@@ -80,98 +107,66 @@ def _get_artist_genres(artist_route: str) -> list[str]:
 
     Return
     ------
-    the artist route
+    the artist page record (genres and release groups title, route pairs)
 
     Example
     -------
-    >>> get_artist_genres("/artist/f4fdbb4c-e4b7-47a0-b83b-d91bbfcfa387")
-    >>> ['pop', 'r&b', 'trap soul', 'dance-pop', 'trap']
+    >>> get_artist_page("/artist/f4fdbb4c-e4b7-47a0-b83b-d91bbfcfa387")
+    >>> ArtistPage(genres=('pop', 'r&b', ... ), release_groups=(('my everything', '/release-group/1237b040-fb8f-4f23-8000-fb6909486c83'), ... ))
 
     Note
     ----
-    This function is cached
+    This function is cached, the cache is bounded by ARTIST_PAGE_CACHE_BYTES
     """
-    response = request(f"https://musicbrainz.org/{artist_route}")
-    return _extract_artist_genres(BeautifulSoup(response.text, "html.parser"))
+    artist_page: ArtistPage | None = _get_cached_artist_page(artist_route)
+    if artist_page is None:
+        response = request(f"https://musicbrainz.org/{artist_route}")
+        artist_page = _parse_artist_page(response.text)
+        _set_cached_artist_page(artist_route, artist_page)
+    return artist_page
 
 @ttl_cache(ttl=REFRESH_TTL)
-def _get_songs_titles(artist_route: str) -> list[str]:
+def _get_song_genres(song_route: str) -> list[str]:
     """
-    Scrap the artist songs titles from the artist route
+    Scrap the list of songs genres from the song route
 
     Parameter
     ---------
-    artist_route : str
-        the artist route (gotten from .get_artist_route(...))
-    
+    song_route : str
+        the song route (gotten from .get_songs_routes(...))
+
     Return
     ------
-    the list of songs titles
+    the list of songs genres
 
     Example
     -------
-    >>> get_songs_titles("/artist/f4fdbb4c-e4b7-47a0-b83b-d91bbfcfa387")
-    >>> ['yours truly', 'my everything', 'dangerous woman', 'sweetener', ... ]
+    >>> get_song_genres("/release-group/1237b040-fb8f-4f23-8000-fb6909486c83")
+    >>> ['pop', 'contemporary r&b', 'dance-pop', 'ballad', 'hip hop']
 
     Note
     ----
     This function is cached
     """
-    response = request(f"https://musicbrainz.org/{artist_route}")
-    return _extract_titles(BeautifulSoup(response.text, "html.parser"))
-
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_songs_routes(artist_route: str) -> list[str]:
-    """
-    Scrap from the artist route, the songs routes 
-
-    Paramter
-    --------
-    artist_route : str
-        the artist route (gotten from .get_artist_route(...))
-    
-    Return
-    ------
-    a list of all the songs routes
+    response = request(f"https://musicbrainz.org/{song_route}")
+    return _parse_song_genres(response.text)
 
-    Example
-    -------
-    >>> get_songs_routes("/artist/f4fdbb4c-e4b7-47a0-b83b-d91bbfcfa387")
-    >>> ['/release-group/1237b040-fb8f-4f23-8000-fb6909486c83', '/release-group/17fd3576-b584-4f32-8ff0-12206d4cb66c', ... ]
-    
-    Note
-    ----
-    This function is cached
-    """
-    response = request(f"https://musicbrainz.org/{artist_route}")
-    return _extract_songs_routes(BeautifulSoup(response.text, "html.parser"))
 
-@ttl_cache(ttl=REFRESH_TTL)
-def _get_song_genres(song_route: str) -> list[str]:
+def get_artist_pages_memory() -> dict[str, int]:
     """
-    Scrap the list of songs genres from the song route
+    Get the memory used by each cached artist page
 
-    Parameter
-    ---------
-    song_route : str
-        the song route (gotten from .get_songs_routes(...))
-    
     Return
     ------
-    the list of songs genres
+    a dict of artist route to size in bytes
 
     Example
     -------
-    >>> get_song_genres("/release-group/1237b040-fb8f-4f23-8000-fb6909486c83")
-    >>> ['pop', 'contemporary r&b', 'dance-pop', 'ballad', 'hip hop']
-
-    Note
-    ----
-    This function is cached
+    >>> .get_artist_pages_memory()
+    >>> {'/artist/f4fdbb4c-e4b7-47a0-b83b-d91bbfcfa387': 10456}
     """
-    response = request(f"https://musicbrainz.org/{song_route}")
-    return _extract_song_genres(BeautifulSoup(response.text, "html.parser"))
-
+    with _artist_pages_lock:
+        return {artist_route: _artist_pages.getsizeof(artist_page) for artist_route, artist_page in _artist_pages.items()}
 
 @ttl_cache(ttl=REFRESH_TTL)
 def get_all_songs(artist_name: str) -> list[tuple[str, str]]:
@@ -191,16 +186,14 @@ def get_all_songs(artist_name: str) -> list[tuple[str, str]]:
     -------
     >>> .get_all_songs("ariana grande")
     >>> [('my everything', '/release-group/1237b040-fb8f-4f23-8000-fb6909486c83'), ('dangerous woman', '/release-group/17fd3576-b584-4f32-8ff0-12206d4cb66c'), ... ]
-    
+
     Note
     ----
     This function is cached
     """
     try:
         artist_route: str = _get_artist_route(artist_name)
-        songs_titles: list[str] = _get_songs_titles(artist_route)
-        songs_routes: list[str] = _get_songs_routes(artist_route)
-        return list(zip(songs_titles, songs_routes))
+        return list(_get_artist_page(artist_route).release_groups)
     except Exception as error:
         print(error)
         raise MusicBrainzError()
@@ -230,8 +223,7 @@ def get_artist_genres(artist_name: str) -> list[str]:
     """
     try:
         artist_route: str = _get_artist_route(artist_name)
-        artist_genres: list[str] = _get_artist_genres(artist_route)
-        return artist_genres
+        return list(_get_artist_page(artist_route).genres)
     except Exception as error:
         print(error)
         raise MusicBrainzError()
@@ -247,7 +239,7 @@ def get_song_genres(artist_name: str, song_title: str) -> list[tuple[str, str]]:
         the artist name
     song_title : str
         the song title
-    
+
     Return
     ------
     the list of genres of the song
@@ -256,19 +248,86 @@ def get_song_genres(artist_name: str, song_title: str) -> list[tuple[str, str]]:
     -------
     >>> .get_song_genres("ariana grande", "my everything")
     >>> ['pop', 'contemporary r&b', 'dance-pop', 'ballad', 'hip hop']
-    
+
     Note
     ----
     This function is cached
     """
     try:
-        artist_route: str = _get_artist_route(artist_name)
-        songs_titles: list[str] = _get_songs_titles(artist_route)
-        songs_routes: list[str] = _get_songs_routes(artist_route)
-        songs: list[tuple[str, str]] = list(zip(songs_titles, songs_routes))
+        songs: list[tuple[str, str]] = get_all_songs(artist_name)
         search_index: int = generic_search(songs, lambda element: element[0] == song_title)
         title, route = songs[search_index]
         return  _get_song_genres(route)
     except Exception as error:
         print(error)
         raise MusicBrainzError()
+
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def _get_artist_route_async(artist_name: str) -> str:
+    response = await request_async(f"https://musicbrainz.org/taglookup/index?tag-lookup.artist={artist_name}")
+    return await asyncio.to_thread(_parse_route, response.text)
+
+async def _get_artist_page_async(artist_route: str) -> ArtistPage:
+    artist_page: ArtistPage | None = _get_cached_artist_page(artist_route)
+    if artist_page is None:
+        response = await request_async(f"https://musicbrainz.org/{artist_route}")
+        artist_page = await asyncio.to_thread(_parse_artist_page, response.text)
+        _set_cached_artist_page(artist_route, artist_page)
+    return artist_page
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def _get_song_genres_async(song_route: str) -> list[str]:
+    response = await request_async(f"https://musicbrainz.org/{song_route}")
+    return await asyncio.to_thread(_parse_song_genres, response.text)
+
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_all_songs_async(artist_name: str) -> list[tuple[str, str]]:
+    """
+    Async counterpart of get_all_songs(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    try:
+        artist_route: str = await _get_artist_route_async(artist_name)
+        return list((await _get_artist_page_async(artist_route)).release_groups)
+    except Exception as error:
+        print(error)
+        raise MusicBrainzError()
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_artist_genres_async(artist_name: str) -> list[str]:
+    """
+    Async counterpart of get_artist_genres(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    try:
+        artist_route: str = await _get_artist_route_async(artist_name)
+        return list((await _get_artist_page_async(artist_route)).genres)
+    except Exception as error:
+        print(error)
+        raise MusicBrainzError()
+
+@async_ttl_cache(ttl=REFRESH_TTL)
+async def get_song_genres_async(artist_name: str, song_title: str) -> list[str]:
+    """
+    Async counterpart of get_song_genres(...)
+
+    Note
+    ----
+    This function is cached
+    """
+    try:
+        songs: list[tuple[str, str]] = await get_all_songs_async(artist_name)
+        search_index: int = generic_search(songs, lambda element: element[0] == song_title)
+        title, route = songs[search_index]
+        return await _get_song_genres_async(route)
+    except Exception as error:
+        print(error)
+        raise MusicBrainzError()
@@ -0,0 +1,53 @@
+import json
+import time
+
+from curby.core import (
+    SqliteDatabase,
+    SPONSORBLOCK_CACHE_FILE,
+    SPONSORBLOCK_CACHE_TTL
+)
+
+SPONSORBLOCK_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    video_id TEXT PRIMARY KEY,
+    segments TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+class SponsorBlockCache:
+    """
+    Local store of the skip segments of each video, videos without segments are
+    stored too so they are not looked up again until <ttl> has passed
+
+    Parameter
+    ---------
+    filepath : str
+        the sqlite file of the cache
+    ttl : float
+        the seconds after which the segments of a video are looked up again
+    """
+    def __init__(self, filepath: str, ttl: float):
+        self.database = SqliteDatabase(filepath, SPONSORBLOCK_CACHE_SCHEMA)
+        self.ttl: float = ttl
+
+    def get(self, video_ids: list[str]) -> dict[str, list[tuple[float, float]]]:
+        if len(video_ids) == 0:
+            return {}
+        rows = self.database.execute(
+            f"SELECT video_id, segments FROM segments WHERE fetched_at >= ? AND video_id IN ({', '.join('?' * len(video_ids))})",
+            (time.time() - self.ttl, *video_ids)
+        )
+        return {video_id: [tuple(segment) for segment in json.loads(segments)] for video_id, segments in rows}
+
+    def put(self, video_id: str, segments: list[tuple[float, float]]):
+        self.database.execute(
+            "INSERT OR REPLACE INTO segments VALUES (?, ?, ?)",
+            (video_id, json.dumps([list(segment) for segment in segments]), time.time())
+        )
+
+    def get_stats(self) -> dict[str, int]:
+        entries, empty = self.database.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE segments = '[]') FROM segments").fetchone()
+        return {"ENTRIES" : entries, "WITHOUT_SEGMENTS" : empty}
+
+SPONSORBLOCK_CACHE = SponsorBlockCache(SPONSORBLOCK_CACHE_FILE, SPONSORBLOCK_CACHE_TTL)
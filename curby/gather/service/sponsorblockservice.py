@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from sponsorblock import Client
+from sponsorblock.errors import NotFoundException
+
+from curby.core import (
+    SPONSOR_CATEGORIES,
+    SPONSORBLOCK_TIMEOUT,
+    SPONSORBLOCK_MAX_WORKERS
+)
+from curby.gather.service.sponsorblockcache import (
+    SPONSORBLOCK_CACHE
+)
+
+class _TimeoutSession(requests.Session):
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", SPONSORBLOCK_TIMEOUT)
+        return super().request(*args, **kwargs)
+
+SPONSORBLOCK_CLIENT = Client(no_env=True, default_categories=SPONSOR_CATEGORIES, session=_TimeoutSession())
+
+def _fetch_skip_segments(video_id: str) -> list[tuple[float, float]]:
+    try:
+        segments = SPONSORBLOCK_CLIENT.get_skip_segments(video_id)
+    except NotFoundException:
+        segments = []
+    skip_segments: list[tuple[float, float]] = [(float(segment.start), float(segment.end)) for segment in segments]
+    SPONSORBLOCK_CACHE.put(video_id, skip_segments)
+    return skip_segments
+
+def get_skip_segments_batch(video_ids: list[str], timeout: float = SPONSORBLOCK_TIMEOUT) -> dict[str, list[tuple[float, float]]]:
+    """
+    From a list of video ids get the skip segments of each video, the cached videos are
+    read in a single query and the others are looked up in parallel
+
+    Parameter
+    ---------
+    video_ids : list[str]
+        the youtube video ids
+    timeout : float
+        the seconds to wait for the lookups of the videos that are not cached
+
+    Return
+    ------
+    the (start, end) skip segments of each video id
+
+    Example
+    -------
+    >>> get_skip_segments_batch(["kJQP7kiw5Fk"])
+    >>> {'kJQP7kiw5Fk': [(0.0, 21.808434), (249.6543, 281.521)]}
+
+    Note
+    ----
+    A lookup that fails or outlasts <timeout> gives no segments (no trimming) and is not
+    cached, a late answer is still cached for the next compilation
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    skip_segments: dict[str, list[tuple[float, float]]] = SPONSORBLOCK_CACHE.get(video_ids)
+    missing_video_ids: list[str] = [video_id for video_id in video_ids if video_id not in skip_segments]
+    if len(missing_video_ids) == 0:
+        return skip_segments
+
+    executor = ThreadPoolExecutor(max_workers=min(SPONSORBLOCK_MAX_WORKERS, len(missing_video_ids)))
+    futures = {video_id: executor.submit(_fetch_skip_segments, video_id) for video_id in missing_video_ids}
+    wait(futures.values(), timeout=timeout)
+    executor.shutdown(wait=False)
+    for video_id, future in futures.items():
+        if not future.done():
+            print(f"sponsorblock lookup of {video_id} timed out")
+            skip_segments[video_id] = []
+        elif future.exception() is not None:
+            print(future.exception())
+            skip_segments[video_id] = []
+        else:
+            skip_segments[video_id] = future.result()
+    return skip_segments
+
+def get_skip_segments(video_id: str, timeout: float = SPONSORBLOCK_TIMEOUT) -> list[tuple[float, float]]:
+    """
+    From a video id get its skip segments
+
+    Parameter
+    ---------
+    video_id : str
+        the youtube video id
+    timeout : float
+        the seconds to wait for the lookup if the video is not cached
+
+    Return
+    ------
+    the (start, end) skip segments
+
+    Example
+    -------
+    >>> get_skip_segments("kJQP7kiw5Fk")
+    >>> [(0.0, 21.808434), (249.6543, 281.521)]
+    """
+    return get_skip_segments_batch([video_id], timeout)[video_id]
@@ -0,0 +1,60 @@
+import time
+
+from curby.core import (
+    SqliteDatabase,
+    YOUTUBE_SEARCH_CACHE_FILE,
+    YOUTUBE_SEARCH_TTL,
+    YOUTUBE_SEARCH_NEGATIVE_TTL
+)
+
+YOUTUBE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    query TEXT PRIMARY KEY,
+    video_id TEXT,
+    resolved_at REAL NOT NULL
+);
+"""
+
+class YoutubeCache:
+    """
+    Local store of resolved youtube searches, the normalized search text is mapped to
+    the video id of its first result, searches without results are stored too
+
+    Parameter
+    ---------
+    filepath : str
+        the sqlite file of the cache
+    ttl : float
+        the seconds after which a resolved search is searched again
+    negative_ttl : float
+        the seconds after which a search without results is searched again
+    """
+    def __init__(self, filepath: str, ttl: float, negative_ttl: float):
+        self.database = SqliteDatabase(filepath, YOUTUBE_CACHE_SCHEMA)
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+
+    def get(self, queries: list[str]) -> dict[str, str | None]:
+        """
+        Get the cached resolutions of the normalized search texts <queries>, a search without
+        results maps to None and a search missing from the result is not cached (or expired)
+        """
+        queries = list(dict.fromkeys(queries))
+        if len(queries) == 0:
+            return {}
+        now: float = time.time()
+        rows = self.database.execute(
+            f"SELECT query, video_id FROM searches WHERE query IN ({', '.join('?' * len(queries))}) "
+            "AND resolved_at >= CASE WHEN video_id IS NULL THEN ? ELSE ? END",
+            (*queries, now - self.negative_ttl, now - self.ttl)
+        )
+        return {query: video_id for query, video_id in rows}
+
+    def put(self, query: str, video_id: str | None):
+        self.database.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?)", (query, video_id, time.time()))
+
+    def get_stats(self) -> dict[str, int]:
+        entries, unresolved = self.database.execute("SELECT COUNT(*), COUNT(*) - COUNT(video_id) FROM searches").fetchone()
+        return {"ENTRIES" : entries, "UNRESOLVED" : unresolved}
+
+YOUTUBE_CACHE = YoutubeCache(YOUTUBE_SEARCH_CACHE_FILE, YOUTUBE_SEARCH_TTL, YOUTUBE_SEARCH_NEGATIVE_TTL)
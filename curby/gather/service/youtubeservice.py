@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from youtubesearchpython import VideosSearch
+
+from curby.core import (
+    normalize_name,
+    YOUTUBE_SEARCH_MAX_WORKERS
+)
+from curby.error import (
+    YoutubeError
+)
+from curby.gather.service.youtubecache import (
+    YOUTUBE_CACHE
+)
+
+def _search_video(search_text: str) -> str | None:
+    results = VideosSearch(search_text, limit=1).result()
+    video_id: str | None = results['result'][0]['id'] if len(results['result']) > 0 else None
+    YOUTUBE_CACHE.put(normalize_name(search_text), video_id)
+    return video_id
+
+def _try_search_video(search_text: str) -> str | None | YoutubeError:
+    try:
+        return _search_video(search_text)
+    except Exception as error:
+        print(error)
+        return YoutubeError()
+
+def search_videos(search_texts: list[str], max_workers: int = YOUTUBE_SEARCH_MAX_WORKERS, progress: Callable[[float], None] | None = None) -> list[str | YoutubeError]:
+    """
+    From a list of search texts get the video id of the first result of each search, the
+    cached searches are read in a single query and the others are searched in parallel
+
+    Parameter
+    ---------
+    search_texts : list[str]
+        the search texts, searches differing only by case and punctuation are the same
+    max_workers : int
+        the maximum number of parallel searches
+    progress : Callable[[float], None] | None
+        called with the ratio of resolved searches, once for the cached ones then after each search
+
+    Return
+    ------
+    a list in the same order as <search_texts> holding either the video id or a YoutubeError
+    when the search failed or had no result
+
+    Example
+    -------
+    >>> search_videos(["pov by ariana grande", "Espresso by Sabrina Carpenter"])
+    >>> ['nQJEp-k-ogs', 'eVli-tstM5E']
+
+    Note
+    ----
+    Searches without results are cached for a shorter time than resolved ones, failed searches are not cached
+    """
+    queries: list[str] = [normalize_name(search_text) for search_text in search_texts]
+    resolutions: dict[str, str | None | YoutubeError] = YOUTUBE_CACHE.get(queries)
+    missing_queries: dict[str, str] = {}
+    for query, search_text in zip(queries, search_texts):
+        if query not in resolutions:
+            missing_queries.setdefault(query, search_text)
+    total: int = max(1, len(set(queries)))
+    if progress is not None:
+        progress(len(resolutions) / total)
+    if len(missing_queries) > 0:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing_queries))) as executor:
+            for query, resolution in zip(missing_queries, executor.map(_try_search_video, missing_queries.values())):
+                resolutions[query] = resolution
+                if progress is not None:
+                    progress(len(resolutions) / total)
+
+    video_ids: list[str | YoutubeError] = []
+    for query, search_text in zip(queries, search_texts):
+        video_id: str | None | YoutubeError = resolutions[query]
+        if video_id is None:
+            print(f"no video found for {search_text}")
+            video_id = YoutubeError()
+        video_ids.append(video_id)
+    return video_ids
+
+def search_video(search_text: str) -> str:
+    """
+    From a search text get the video id of its first result
+
+    Parameter
+    ---------
+    search_text : str
+        the search text
+
+    Return
+    ------
+    the video id
+
+    Example
+    -------
+    >>> search_video("pov by ariana grande")
+    >>> 'nQJEp-k-ogs'
+
+    Note
+    ----
+    The search is cached
+    """
+    video_id: str | YoutubeError = search_videos([search_text])[0]
+    if isinstance(video_id, YoutubeError):
+        raise video_id
+    return video_id
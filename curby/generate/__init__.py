@@ -1 +1 @@
-from .compilationsonggenerator import generate_compilation
\ No newline at end of file
+from .compilationsonggenerator import generate_compilation, get_compilation_fingerprint, remove_compilation, warm_up
\ No newline at end of file
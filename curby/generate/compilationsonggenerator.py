@@ -1,5 +1,13 @@
 import os
+import json
+import time
+import uuid
+import hashlib
+import threading
 import numpy as np
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
 from PIL import (
     Image, 
@@ -14,76 +22,131 @@ from moviepy.editor import (
     AudioFileClip, 
     ImageClip
 )
-from sponsorblock import Segment, Client
-from youtubesearchpython import VideosSearch
+from moviepy.audio.AudioClip import AudioArrayClip
+from proglog import ProgressBarLogger
+from sponsorblock import Segment
 from pytube import YouTube
 
 from curby.core import (
     Song,
     FrameMetadata,
-    Stack,
-    TEMP_FOLDER
+    EncodingProfile,
+    AssetStore,
+    to_intervals,
+    invert_intervals,
+    cut_array,
+    AUDIO_FOLDER,
+    AUDIO_STORE_MAX_BYTES,
+    ASSET_MAX_WORKERS,
+    RENDER_BACKEND,
+    OUTPUT_FOLDER
 )
+from curby.error import (
+    YoutubeError
+)
+from curby.gather.service import sponsorblockservice, youtubeservice
+from curby.generate.ffmpegrenderer import render_compilation, SEGMENT_STORE
+from curby.generate.framerenderer import FrameRenderer
 
-def remove_sponsors(clip: Clip, sponsors: list[Segment]):
-    segments = Stack()
-    first_segment = sponsors[0]
-    segments.push((first_segment.start, first_segment.end))
-    for index in range(1, len(sponsors)):
-        current_segment = sponsors[index]
-        last_segment = segments.peek()
-        if current_segment.start < last_segment[1]:
-            segments.pop()
-            segments.push((last_segment[0], current_segment.end))
-        else:
-            segments.push((current_segment.start, current_segment.end))
-    last_segment = segments.peek()
-    if (last_segment[1] < clip.duration):
-        segments.push((clip.duration, clip.duration))
-    parts = []
-    for index in range(len(segments.items) - 1):
-        current_segment = segments.items[index]
-        next_segment = segments.items[index + 1]
-        parts.append(clip.subclip(current_segment[1], next_segment[0]))
+AUDIO_STORE = AssetStore(AUDIO_FOLDER, AUDIO_STORE_MAX_BYTES)
+AUDIO_CHUNK_SIZE = 50000
+
+def remove_sponsors(clip: Clip, sponsors: list[Segment | tuple[float, float]]):
+    keep_ranges: np.ndarray = invert_intervals(to_intervals(sponsors), clip.duration)
     if (isinstance(clip, AudioFileClip)):
-        return concatenate_audioclips(parts)
+        samples: np.ndarray = np.vstack(list(clip.iter_chunks(fps=clip.fps, chunksize=AUDIO_CHUNK_SIZE)))
+        return AudioArrayClip(cut_array(samples, keep_ranges, clip.fps), fps=clip.fps)
     elif (isinstance(clip, VideoFileClip)):
-        return concatenate_videoclips(parts)
+        return concatenate_videoclips([clip.subclip(start, end) for start, end in keep_ranges])
     else:
         print("Type of clip unsupported")
 
-def search_video(search_text: str):
-    videos_search = VideosSearch(search_text, limit=1)
-    results = videos_search.result()
-    return results['result'][0]['id']
+def _download_audio(video_id: str, folder: str, progress: Callable[[int], None] | None = None) -> tuple[str, dict]:
+    on_progress = (lambda stream, chunk, bytes_remaining: progress(len(chunk))) if progress is not None else None
+    youtube = YouTube(f"https://www.youtube.com/watch?v={video_id}", on_progress_callback=on_progress)
+    audio_stream = youtube.streams.filter(only_audio=True).first()
+    audio_filepath: str = audio_stream.download(output_path=folder, filename=f"{video_id}.{audio_stream.subtype}")
+    return audio_filepath, {
+        "duration" : youtube.length,
+        "codec" : audio_stream.audio_codec,
+        "mime_type" : audio_stream.mime_type
+    }
 
-def download_audio(url: str, save_as: str):
-    temp_fullpath: str = os.path.join(".\\", TEMP_FOLDER)
-    if not os.path.exists(temp_fullpath):
-        os.makedirs(temp_fullpath)
+def download_audio(video_id: str, progress: Callable[[int], None] | None = None, holder: str | None = None) -> str:
+    """
+    Get the audio of <video_id> from the audio store, downloading it first if it is missing,
+    <progress> is called with the size of each downloaded chunk, the audio is pinned for
+    <holder> until AUDIO_STORE.release(<holder>)
+    """
+    asset = AUDIO_STORE.get_or_create(video_id, lambda folder: _download_audio(video_id, folder, progress), holder)
+    return asset.filepath
 
-    audio_filename: str = "{filename}.mp3".format(filename=save_as)
-    audio_filepath: str = os.path.join(TEMP_FOLDER, audio_filename)
-    if os.path.exists(audio_filepath):
-        print("Skiping audio download : file already exist")
-    else:
-        youtube = YouTube(url)
-        audio_stream = youtube.streams.filter(only_audio=True).first()
-        audio_stream.download(output_path=TEMP_FOLDER, filename=audio_filename)
-    return audio_filepath
+class DownloadProgress:
+    """
+    Counts the downloaded audio and bytes of a compilation, the downloads run in parallel
+
+    Example
+    -------
+    >>> download_progress = DownloadProgress(len(video_ids), progress, holder)
+    >>> audio_filepaths = list(executor.map(download_progress.download, video_ids))
+    """
+    def __init__(self, downloads: int, progress: Callable[..., None], holder: str | None = None):
+        self.downloads: int = downloads
+        self.progress: Callable[..., None] = progress
+        self.holder: str | None = holder
+        self.completed: int = 0
+        self.bytes_downloaded: int = 0
+        self._lock = threading.Lock()
+
+    def add_bytes(self, size: int):
+        with self._lock:
+            self.bytes_downloaded += size
+            self._report()
+
+    def download(self, video_id: str) -> str:
+        audio_filepath: str = download_audio(video_id, self.add_bytes, self.holder)
+        with self._lock:
+            self.completed += 1
+            self._report()
+        return audio_filepath
+
+    def _report(self):
+        self.progress("download", self.completed / max(1, self.downloads), bytes_downloaded=self.bytes_downloaded)
+
+class EncodeLogger(ProgressBarLogger):
+    """
+    Reports the progress of a moviepy encode from its frame progress bar, the audio is
+    written before the frames and is not counted in the frame rate
+    """
+    def __init__(self, progress: Callable[..., None]):
+        super().__init__()
+        self.progress: Callable[..., None] = progress
+        self._started_at: float = time.perf_counter()
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar != "t":
+            return
+        if attr == "total":
+            self._started_at = time.perf_counter()
+        if attr != "index":
+            return
+        total: int = self.bars[bar]["total"] or 0
+        elapsed: float = time.perf_counter() - self._started_at
+        self.progress(
+            "encode", value / total if total > 0 else 0.0,
+            encode_fps=value / elapsed if elapsed > 0 else 0.0
+        )
 
 def create_frame_section(frame_np: np.ndarray, audio_clip: AudioFileClip):
     image_clip = ImageClip(frame_np, duration=audio_clip.duration)
     return image_clip.set_audio(audio_clip)
 
-def generate_audio(search_text: str) -> AudioFileClip:
-    client = Client()
-    video_id: str = search_video(search_text)
-    audio_filepath: str = download_audio(f"https://www.youtube.com/watch?v={video_id}", search_text)
+def load_audio(video_id: str, audio_filepath: str, skip_segments: list[tuple[float, float]] | None = None) -> AudioFileClip:
     audio_clip = AudioFileClip(audio_filepath)
-    sponsors: list = [] #client.get_skip_segments(video_id,  SPONSOR_CATEGORIES)
-    if (sponsors is not None and len(sponsors) > 0):
-        audio_clip = remove_sponsors(audio_clip, sponsors)
+    if skip_segments is None:
+        skip_segments = sponsorblockservice.get_skip_segments(video_id)
+    if (len(skip_segments) > 0):
+        audio_clip = remove_sponsors(audio_clip, skip_segments)
     return audio_clip
 
 def generate_image(frame: FrameMetadata, songs: list[Song], selected_song: Song):
@@ -119,22 +182,146 @@ def generate_image(frame: FrameMetadata, songs: list[Song], selected_song: Song)
     
     return image
 
-def generate_compilation(metadata: FrameMetadata, songs: list[Song]):
-    frames = []
-    for song in songs:
-        search: str = song.get_display_name("{title} by {author}")
-        
-        frame_image: Image = generate_image(metadata, songs, song)
-        audio_clip: AudioFileClip = generate_audio(search)
-
-        frame_section = create_frame_section(np.array(frame_image), audio_clip)
-        frames.append(frame_section)
-
-    compilation_fullpath = "{filename}.mp4".format(filename="final")
-    compilation_clip = concatenate_videoclips(frames, method="compose")
-    compilation_clip.write_videofile(compilation_fullpath, codec = "libx264", threads = 1, fps = 24)
-    compilation_clip.close()
-    for frame in frames:
-        frame.close()
+def get_segment_key(metadata: FrameMetadata, songs: list[Song], selected_song: Song, video_id: str, skip_segments: list[tuple[float, float]], profile: EncodingProfile) -> str:
+    """
+    Hash everything the segment of <selected_song> depends on: the frame theme, the song
+    list, the selected song, its audio with the cut parts and the encoder settings (threads
+    and container do not change the segment)
+    """
+    segment: dict = {
+        "theme" : metadata.model_dump(mode="json", exclude={"encoding"}),
+        "songs" : [[song.title, song.author] for song in songs],
+        "selected_song" : [selected_song.title, selected_song.author],
+        "video_id" : video_id,
+        "skip_segments" : [list(skip_segment) for skip_segment in skip_segments],
+        "profile" : profile.model_dump(mode="json", exclude={"threads", "container"})
+    }
+    return hashlib.sha256(json.dumps(segment, sort_keys=True).encode()).hexdigest()
+
+def get_compilation_fingerprint(metadata: FrameMetadata, songs: list[Song]) -> str:
+    """
+    Hash everything a compilation depends on: the frame theme, the song list and the encoder
+    settings (threads do not change the compilation), identical requests have the same fingerprint
+    """
+    profile: EncodingProfile = metadata.encoding or EncodingProfile()
+    compilation: dict = {
+        "theme" : metadata.model_dump(mode="json", exclude={"encoding"}),
+        "songs" : [[song.title, song.author] for song in songs],
+        "profile" : profile.model_dump(mode="json", exclude={"threads"})
+    }
+    return hashlib.sha256(json.dumps(compilation, sort_keys=True).encode()).hexdigest()
+
+def warm_up():
+    """
+    Load what a compilation needs before the first one, used as the initializer of the
+    worker processes: importing this module imports moviepy, PIL and numpy, the image
+    plugins are registered here
+    """
+    Image.init()
+
+def remove_compilation(compilation_filepath: str):
+    """
+    Delete a rendered compilation, used as the cleanup of the scheduler so the output of
+    a task lives as long as the task
+    """
+    if os.path.exists(compilation_filepath):
+        os.remove(compilation_filepath)
+
+def _ignore_progress(stage: str, progress: float = 0.0, **details):
+    pass
+
+def generate_compilation(metadata: FrameMetadata, songs: list[Song], output_filepath: str | None = None, progress: Callable[..., None] | None = None) -> str:
+    """
+    Render the compilation of <songs>, a frame listing the songs for each song with its audio
+
+    Parameter
+    ---------
+    metadata : FrameMetadata
+        the theme of the frames and the encoder settings
+    songs : list[Song]
+        the songs of the compilation
+    output_filepath : str | None
+        the rendered compilation, a new file of OUTPUT_FOLDER by default
+    progress : Callable[..., None] | None
+        called with the current stage, the ratio of the stage done and the telemetry
+        details (songs_total, songs_completed, bytes_downloaded, encode_fps), each stage
+        is first reported at 0.0 so the telemetry times it
+
+    Return
+    ------
+    the rendered compilation filepath
+
+    Note
+    ----
+    When the compilation fails the partial output file is deleted. The audio of the songs
+    is pinned in the audio store until the compilation is done
+    """
+    progress = progress or _ignore_progress
+    profile: EncodingProfile = metadata.encoding or EncodingProfile()
+    compilation_fullpath: str = output_filepath or f"{OUTPUT_FOLDER}/{uuid.uuid4()}.{profile.container}"
+    os.makedirs(os.path.dirname(compilation_fullpath) or ".", exist_ok=True)
+    audio_holder: str = uuid.uuid4().hex
+
+    try:
+        searches: list[str] = [song.get_display_name("{title} by {author}") for song in songs]
+        with ThreadPoolExecutor(max_workers=ASSET_MAX_WORKERS) as asset_executor:
+            progress("search", 0.0, songs_total=len(songs))
+            resolutions: list[str | YoutubeError] = youtubeservice.search_videos(searches, progress=partial(progress, "search"))
+            for resolution in resolutions:
+                if isinstance(resolution, YoutubeError):
+                    raise resolution
+            video_ids: list[str] = resolutions
+            progress("download", 0.0)
+            sponsors_future = asset_executor.submit(sponsorblockservice.get_skip_segments_batch, video_ids)
+            download_progress = DownloadProgress(len(video_ids), progress, audio_holder)
+            audio_filepaths: list[str] = list(asset_executor.map(download_progress.download, video_ids))
+            progress("sponsors", 0.0)
+            sponsors: dict[str, list[tuple[float, float]]] = sponsors_future.result()
+        skip_segments: list[list[tuple[float, float]]] = [sponsors[video_id] for video_id in video_ids]
+
+        if RENDER_BACKEND == "ffmpeg":
+            segment_keys: list[str] = [
+                get_segment_key(metadata, songs, song, video_id, song_skip_segments, profile)
+                for song, video_id, song_skip_segments in zip(songs, video_ids, skip_segments)
+            ]
+
+            progress("frames", 0.0)
+            renderer = FrameRenderer(metadata, songs)
+
+            progress("encode", 0.0)
+            frames = [partial(renderer.render, index) for index in range(len(songs))]
+            render_compilation(segment_keys, frames, audio_filepaths, skip_segments, compilation_fullpath, profile, partial(progress, "encode"))
+        else:
+            progress("frames", 0.0)
+            renderer = FrameRenderer(metadata, songs)
+            frames_np: list[np.ndarray] = [renderer.render(index) for index in range(len(songs))]
+
+            progress("assembly", 0.0)
+            frames = [
+                create_frame_section(frame_np, load_audio(video_id, audio_filepath, song_skip_segments))
+                for frame_np, video_id, audio_filepath, song_skip_segments in zip(frames_np, video_ids, audio_filepaths, skip_segments)
+            ]
+
+            progress("encode", 0.0)
+            compilation_clip = concatenate_videoclips(frames, method="compose")
+            compilation_clip.write_videofile(
+                compilation_fullpath,
+                logger = EncodeLogger(progress),
+                codec = "libx264",
+                threads = profile.threads,
+                fps = profile.fps,
+                preset = profile.preset,
+                audio_bitrate = profile.audio_bitrate,
+                ffmpeg_params = ["-crf", str(profile.crf)] + (["-tune", profile.tune] if profile.tune is not None else [])
+            )
+            compilation_clip.close()
+            for frame in frames:
+                frame.close()
+    except Exception:
+        remove_compilation(compilation_fullpath)
+        raise
+    finally:
+        AUDIO_STORE.release(audio_holder)
+
     return compilation_fullpath
     
\ No newline at end of file
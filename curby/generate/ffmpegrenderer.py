@@ -0,0 +1,267 @@
+import os
+import uuid
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Callable
+
+import numpy as np
+import imageio_ffmpeg
+from PIL import Image
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from curby.core import (
+    EncodingProfile,
+    Asset,
+    AssetStore,
+    to_intervals,
+    invert_intervals,
+    get_intervals_duration,
+    get_aselect_filter,
+    RENDER_MAX_WORKERS,
+    SEGMENT_FOLDER,
+    SEGMENT_STORE_MAX_BYTES
+)
+from curby.error import (
+    RenderError
+)
+
+FFMPEG = imageio_ffmpeg.get_ffmpeg_exe()
+FASTSTART_CONTAINERS = ("mp4", "mov")
+
+SEGMENT_STORE = AssetStore(SEGMENT_FOLDER, SEGMENT_STORE_MAX_BYTES)
+
+def _run_ffmpeg(arguments: list[str], progress: Callable[[dict[str, str]], None] | None = None):
+    """
+    Run ffmpeg, raising a RenderError when it fails, <progress> is called with each block
+    of the -progress report (frame, fps, out_time_us, speed...)
+    """
+    if progress is None:
+        process = subprocess.run([FFMPEG, "-y", "-hide_banner", "-loglevel", "error", *arguments], capture_output=True)
+        if process.returncode != 0:
+            print(process.stderr.decode(errors="replace"))
+            raise RenderError()
+        return
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            [FFMPEG, "-y", "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1", *arguments],
+            stdout=subprocess.PIPE, stderr=stderr, text=True
+        )
+        report: dict[str, str] = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            report[key] = value
+            if key == "progress":
+                progress(report)
+                report = {}
+        if process.wait() != 0:
+            stderr.seek(0)
+            print(stderr.read().decode(errors="replace"))
+            raise RenderError()
+
+def _to_float(value: str | None) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+class EncodeProgress:
+    """
+    Aggregates the progress of segments encoded in parallel, reported as the ratio of the
+    encoded audio, the ready segments and the summed frame rate of the running encoders
+
+    Example
+    -------
+    >>> encode_progress = EncodeProgress(2, partial(progress, "encode"))
+    >>> encode_progress.update(0, 0.5, 240.0)
+    >>> encode_progress.complete(0)
+    """
+    def __init__(self, segments: int, progress: Callable[..., None]):
+        self.progress: Callable[..., None] = progress
+        self._ratios: list[float] = [0.0] * segments
+        self._fps: list[float] = [0.0] * segments
+        self._completed: int = 0
+        self._lock = threading.Lock()
+
+    def update(self, index: int, ratio: float, fps: float = 0.0):
+        with self._lock:
+            self._ratios[index], self._fps[index] = min(1.0, ratio), fps
+            self._report()
+
+    def complete(self, index: int):
+        with self._lock:
+            self._ratios[index], self._fps[index] = 1.0, 0.0
+            self._completed += 1
+            self._report()
+
+    def _report(self):
+        self.progress(
+            sum(self._ratios) / max(1, len(self._ratios)),
+            songs_completed=self._completed,
+            encode_fps=sum(self._fps)
+        )
+
+def encode_segment(frame_np: np.ndarray, audio_filepath: str, segment_filepath: str, profile: EncodingProfile, threads: int = 1, skip_segments: list[tuple[float, float]] = [], progress: Callable[[float, float], None] | None = None) -> float:
+    """
+    Encode a static frame over its audio into a video segment, the frame is encoded once
+    with the settings of <profile> instead of being piped through python
+
+    Parameter
+    ---------
+    frame_np : np.ndarray
+        the frame (height, width, 3) of the segment
+    audio_filepath : str
+        the audio of the segment, the segment lasts as long as it
+    segment_filepath : str
+        the encoded segment
+    profile : EncodingProfile
+        the encoder settings
+    threads : int
+        the encoder threads of this segment
+    skip_segments : list[tuple[float, float]]
+        the (start, end) parts of the audio to cut, with a single aselect filter
+    progress : Callable[[float, float], None] | None
+        called with the ratio of the segment encoded and the encoder frame rate
+
+    Return
+    ------
+    the duration of the segment audio
+
+    Note
+    ----
+    Both streams are cut at the audio duration, -shortest alone lets the looped image
+    overrun the audio and the overrun adds up once the segments are concatenated
+    """
+    audio_duration: float = ffmpeg_parse_infos(audio_filepath)["duration"]
+    keep_ranges: np.ndarray = invert_intervals(to_intervals(skip_segments), audio_duration)
+    audio_filter: list[str] = []
+    if len(skip_segments) > 0 and len(keep_ranges) > 0:
+        audio_filter = ["-af", get_aselect_filter(keep_ranges)]
+        audio_duration = get_intervals_duration(keep_ranges)
+    duration: str = str(audio_duration)
+    frame_filepath: str = os.path.splitext(segment_filepath)[0] + ".png"
+    Image.fromarray(frame_np).save(frame_filepath)
+    tune: list[str] = ["-tune", profile.tune] if profile.tune is not None else []
+    on_report: Callable[[dict[str, str]], None] | None = None
+    if progress is not None:
+        on_report = lambda report: progress(_to_float(report.get("out_time_us")) / 1e6 / max(audio_duration, 1e-6), _to_float(report.get("fps")))
+    _run_ffmpeg([
+        "-loop", "1", "-framerate", str(profile.fps), "-t", duration, "-i", frame_filepath,
+        "-i", audio_filepath,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-c:v", "libx264", *tune, "-preset", profile.preset, "-crf", str(profile.crf), "-pix_fmt", "yuv420p", "-r", str(profile.fps),
+        *audio_filter,
+        "-c:a", "aac", "-b:a", profile.audio_bitrate, "-ar", "44100", "-ac", "2",
+        "-threads", str(threads),
+        "-t", duration,
+        segment_filepath
+    ], on_report)
+    return audio_duration
+
+def concat_segments(segment_filepaths: list[str], output_filepath: str, durations: list[float | None] | None = None):
+    """
+    Concatenate encoded segments with the concat demuxer, without re-encoding them
+
+    Parameter
+    ---------
+    segment_filepaths : list[str]
+        the segments, encoded with the same settings
+    output_filepath : str
+        the concatenated video, its extension sets the container
+    durations : list[float | None] | None
+        the audio duration of each segment, each segment starts where the audio of the
+        previous one ends instead of where its last (whole) frame ends
+    """
+    faststart: list[str] = ["-movflags", "+faststart"] if output_filepath.endswith(FASTSTART_CONTAINERS) else []
+    list_filepath: str = output_filepath + ".txt"
+    with open(list_filepath, "w") as file:
+        for segment_filepath, duration in zip(segment_filepaths, durations or [None] * len(segment_filepaths)):
+            file.write("file '{path}'\n".format(path=os.path.abspath(segment_filepath).replace("'", "'\\''")))
+            if duration is not None:
+                file.write(f"duration {duration}\n")
+    try:
+        _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_filepath, "-c", "copy", *faststart, output_filepath])
+    finally:
+        os.remove(list_filepath)
+
+def get_segment(segment_key: str, frame: Callable[[], np.ndarray], audio_filepath: str, skip_segments: list[tuple[float, float]], profile: EncodingProfile, threads: int = 1, progress: Callable[[float, float], None] | None = None, holder: str | None = None) -> Asset:
+    """
+    Get the encoded segment of <segment_key> from the segment store, encoding it first if it is missing
+
+    Parameter
+    ---------
+    segment_key : str
+        identifies the frame, the audio and the encoder settings of the segment
+    frame : Callable[[], np.ndarray]
+        returns the frame of the segment, only called when the segment is encoded
+    audio_filepath : str
+        the audio of the segment
+    skip_segments : list[tuple[float, float]]
+        the (start, end) parts of the audio to cut
+    profile : EncodingProfile
+        the encoder settings
+    threads : int
+        the encoder threads of this segment
+    progress : Callable[[float, float], None] | None
+        called while the segment is encoded, see encode_segment
+    holder : str | None
+        pins the segment in the segment store until SEGMENT_STORE.release(<holder>)
+
+    Return
+    ------
+    the segment asset, its metadata holds its duration
+    """
+    def create(folder: str) -> tuple[str, dict]:
+        segment_filepath: str = os.path.join(folder, "segment.mp4")
+        duration: float = encode_segment(frame(), audio_filepath, segment_filepath, profile, threads, skip_segments, progress)
+        return segment_filepath, {"audio_filepath" : audio_filepath, "duration" : duration}
+    return SEGMENT_STORE.get_or_create(segment_key, create, holder)
+
+def render_compilation(segment_keys: list[str], frames: list[Callable[[], np.ndarray]], audio_filepaths: list[str], skip_segments: list[list[tuple[float, float]]], output_filepath: str, profile: EncodingProfile, progress: Callable[..., None] | None = None):
+    """
+    Render a compilation with ffmpeg, the segment of each song is taken from the segment
+    store or encoded (missing segments are encoded in parallel, sharing the threads of
+    <profile>) then the segments are concatenated, they are pinned in the store until then
+
+    Parameter
+    ---------
+    segment_keys : list[str]
+        the segment store key of each song
+    frames : list[Callable[[], np.ndarray]]
+        returns the frame of each song, only called for missing segments
+    audio_filepaths : list[str]
+        the audio of each song
+    skip_segments : list[list[tuple[float, float]]]
+        the (start, end) parts to cut from the audio of each song
+    output_filepath : str
+        the rendered compilation
+    profile : EncodingProfile
+        the encoder settings
+    progress : Callable[..., None] | None
+        called with the ratio of the audio encoded, the number of ready segments (songs_completed)
+        and the frame rate of the running encoders (encode_fps)
+    """
+    max_workers: int = max(1, min(RENDER_MAX_WORKERS, len(segment_keys), profile.threads))
+    threads: int = max(1, profile.threads // max_workers)
+    encode_progress: EncodeProgress | None = EncodeProgress(len(segment_keys), progress) if progress is not None else None
+    holder: str = uuid.uuid4().hex
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures: dict[Future, int] = {
+                executor.submit(
+                    get_segment, segment_key, frame, audio_filepath, song_skip_segments, profile, threads,
+                    partial(encode_progress.update, index) if encode_progress is not None else None, holder
+                ) : index
+                for index, (segment_key, frame, audio_filepath, song_skip_segments) in enumerate(zip(segment_keys, frames, audio_filepaths, skip_segments))
+            }
+            for future in as_completed(futures):
+                future.result()
+                if encode_progress is not None:
+                    encode_progress.complete(futures[future])
+            segments: list[Asset] = [future.result() for future in futures]
+        concat_segments([segment.filepath for segment in segments], output_filepath, [segment.metadata.get("duration") for segment in segments])
+    finally:
+        SEGMENT_STORE.release(holder)
@@ -0,0 +1,134 @@
+import math
+import threading
+from functools import lru_cache
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import (
+    Image,
+    ImageDraw,
+    ImageFont
+)
+
+from curby.core import (
+    Song,
+    FrameMetadata
+)
+
+@lru_cache(maxsize=32)
+def load_font(font_name: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(font_name, size=size)
+
+@dataclass
+class TextLayer:
+    position: tuple[float, float]
+    text: str
+    font: ImageFont.FreeTypeFont
+    color: tuple
+    top: int
+    bottom: int
+
+def _create_layer(position: tuple[float, float], text: str, font: ImageFont.FreeTypeFont, color: tuple) -> TextLayer:
+    left, top, right, bottom = font.getbbox(text)
+    return TextLayer(
+        position, text, font, color,
+        min(math.floor(position[1]), math.floor(position[1] + top)) - 1,
+        math.ceil(position[1] + bottom) + 1
+    )
+
+class FrameRenderer:
+    """
+    Renders the frames of a compilation, one per song, each frame highlighting its song
+
+    The fonts are loaded and the layout measured once, the background, the title and the
+    unselected song list are drawn once in a base buffer. A frame is a copy of the base
+    buffer where only the rows of the highlighted line are drawn again, so rendering all
+    the frames is linear in the number of songs.
+
+    Parameter
+    ---------
+    frame : FrameMetadata
+        the theme of the frames
+    songs : list[Song]
+        the listed songs
+
+    Example
+    -------
+    >>> renderer = FrameRenderer(theme, songs)
+    >>> renderer.render(0).shape
+    >>> (1080, 1920, 3)
+    """
+    def __init__(self, frame: FrameMetadata, songs: list[Song]):
+        self.frame: FrameMetadata = frame
+        self._lock = threading.Lock()
+
+        image = Image.new('RGB', (frame.width, frame.height), color=frame.background_color)
+        canvas = ImageDraw.Draw(image)
+
+        song_height = frame.height * 0.02
+        song_font = load_font(frame.font_name, int(song_height))
+        title_height = frame.height * 0.1
+        title_font = load_font(frame.font_name, int(title_height))
+
+        max_width = max(canvas.textlength(song.get_display_name(frame.higligth_key + frame.format_model), song_font) for song in songs)
+        delta = canvas.textlength(frame.higligth_key, song_font)
+        pos_x = frame.width - max_width - (frame.width * 0.025)
+        pos_y = frame.height * 0.1
+
+        self.layers: list[TextLayer] = [_create_layer((pos_x, pos_y), "Songs", title_font, frame.song_title_color)]
+        self.highlighted_layers: list[TextLayer] = []
+        pos_y += frame.height * 0.12
+        for song in songs:
+            self.layers.append(_create_layer((pos_x, pos_y), song.get_display_name(frame.format_model), song_font, frame.song_color))
+            self.highlighted_layers.append(_create_layer(
+                (pos_x - delta, pos_y), song.get_display_name(frame.higligth_key + frame.format_model), song_font, frame.song_higligth_color
+            ))
+            pos_y += song_height + (song_height // 2)
+
+        for layer in self.layers:
+            canvas.text(layer.position, layer.text, font=layer.font, fill=layer.color)
+        self.base_np: np.ndarray = np.array(image)
+        self.base_np.flags.writeable = False
+
+    def _get_strip(self, index: int) -> tuple[int, int, list[int]]:
+        top: int = min(self.layers[index + 1].top, self.highlighted_layers[index].top)
+        bottom: int = max(self.layers[index + 1].bottom, self.highlighted_layers[index].bottom)
+        while True:
+            layer_indexes: list[int] = [layer_index for layer_index, layer in enumerate(self.layers) if layer.top < bottom and layer.bottom > top]
+            layers: list[TextLayer] = [self.layers[layer_index] for layer_index in layer_indexes] + [self.highlighted_layers[index]]
+            strip_top: int = min([top] + [layer.top for layer in layers])
+            strip_bottom: int = max([bottom] + [layer.bottom for layer in layers])
+            if (strip_top, strip_bottom) == (top, bottom):
+                return max(0, top), min(self.frame.height, bottom), layer_indexes
+            top, bottom = strip_top, strip_bottom
+
+    def render(self, index: int) -> np.ndarray:
+        """
+        Render the frame highlighting the song at <index>
+
+        Parameter
+        ---------
+        index : int
+            the index of the highlighted song
+
+        Return
+        ------
+        the frame (height, width, 3)
+
+        Note
+        ----
+        The rows of the highlighted line (and of any line overlapping them) are drawn again in
+        the original order, so the frame is identical to drawing the whole list from scratch
+        """
+        top, bottom, layer_indexes = self._get_strip(index)
+        if bottom <= top:
+            return self.base_np.copy()
+        strip = Image.new('RGB', (self.frame.width, bottom - top), color=self.frame.background_color)
+        canvas = ImageDraw.Draw(strip)
+        with self._lock:
+            for layer_index in layer_indexes:
+                layer: TextLayer = self.highlighted_layers[index] if layer_index == index + 1 else self.layers[layer_index]
+                canvas.text((layer.position[0], layer.position[1] - top), layer.text, font=layer.font, fill=layer.color)
+        frame_np: np.ndarray = self.base_np.copy()
+        frame_np[top:bottom] = np.asarray(strip)
+        return frame_np
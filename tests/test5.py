@@ -1,40 +1,51 @@
 import time
 import random
 
-from curby.generate.compilationsonggenerator import optimizied_sponsors, get_extract_zone
-
-a_list = [1, 2, 3, 4, 5]
-del a_list[-1]
-print(a_list)
-
-"""
-segments = [(1, 5), (2, 6), (10, 12), (16, 19), (17, 20)]
-print(segments)
-"""
-
-segments = []
-last_number = 0
-for i in range(10):
-    first = random.randint(0, i)
-    segments.append((first, first + random.randint(5, 5 + i)))
-
-print(segments)
-
-start_time = time.perf_counter()
-sponsors = optimizied_sponsors(segments, lambda element : element[0], lambda element : element[1])
-end_time = time.perf_counter()
-print(end_time - start_time)
-print(sponsors)
-
-start_time = time.perf_counter()
-sponsors = []
-for zone in get_extract_zone(segments, lambda element : element[0], lambda element : element[1]):
-    sponsors.append(zone)
-end_time = time.perf_counter()
-print(end_time - start_time)
-print(sponsors)
-
-start_time = time.perf_counter()
-end_time = time.perf_counter()
-print(end_time - start_time)
-print(sponsors)
\ No newline at end of file
+import numpy as np
+from moviepy.editor import concatenate_audioclips
+from moviepy.audio.AudioClip import AudioArrayClip
+
+from curby.core import Stack, invert_intervals, cut_array
+
+def stack_remove_sponsors(clip: AudioArrayClip, segments: list[tuple[float, float]]) -> np.ndarray:
+    stack = Stack()
+    stack.push(segments[0])
+    for start, end in segments[1:]:
+        last_segment = stack.peek()
+        if start < last_segment[1]:
+            stack.pop()
+            stack.push((last_segment[0], end))
+        else:
+            stack.push((start, end))
+    if stack.peek()[1] < clip.duration:
+        stack.push((clip.duration, clip.duration))
+    parts = [clip.subclip(stack.items[index][1], stack.items[index + 1][0]) for index in range(stack.size() - 1)]
+    parts = [part for part in parts if part.duration > 0]
+    return np.vstack(list(concatenate_audioclips(parts).iter_chunks(fps=clip.fps, chunksize=50000)))
+
+def numpy_remove_sponsors(samples: np.ndarray, segments: np.ndarray, rate: int) -> np.ndarray:
+    return cut_array(samples, invert_intervals(segments, len(samples) / rate), rate)
+
+def benchmark(function, *args, repeat: int = 3) -> float:
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function(*args)
+        durations.append(time.perf_counter() - start_time)
+    return min(durations)
+
+rate = 44100
+duration = 180.0
+samples = np.random.uniform(-1, 1, (int(duration * rate), 2))
+clip = AudioArrayClip(samples, fps=rate)
+
+for count in [1, 5, 20]:
+    segments = []
+    for index in range(count):
+        start = random.uniform(0, duration)
+        segments.append((start, min(duration, start + random.uniform(0, duration / (4 * count)))))
+    segments.sort()
+
+    print(f"{count} segments")
+    print("  stack + subclips ", benchmark(stack_remove_sponsors, clip, segments))
+    print("  numpy            ", benchmark(numpy_remove_sponsors, samples, np.array(segments), rate))
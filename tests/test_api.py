@@ -0,0 +1,130 @@
+import json
+import time
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import curby.api as api
+from curby.api.fileresponse import parse_range
+from curby.app import app
+from curby.core import TaskScheduler, TaskStatus, MemoryTaskStore, FrameMetadata, Song
+from curby.gather.service import billboardservice
+from curby.generate import get_compilation_fingerprint
+from curby.error import RangeNotSatisfiableError
+
+def test_status_stream(monkeypatch):
+    monkeypatch.setattr(api, "STATUS_STREAM_INTERVAL", 0.01)
+    monkeypatch.setattr(api, "scheduler", TaskScheduler(max_workers=1, store=MemoryTaskStore()))
+    release = threading.Event()
+
+    def encode(progress=None):
+        progress("encode", 0.5, songs_total=2, songs_completed=1)
+        release.wait(5)
+        return "compilation.mp4"
+
+    client = TestClient(app)
+    api.scheduler.start()
+    try:
+        api.scheduler.submit("streamed", encode, progress=True)
+        assert(client.get("/status/songcompilation/unknown").status_code == 400)
+
+        with client.websocket_connect("/ws/songcompilation/streamed") as websocket:
+            status = websocket.receive_json()
+            while status["stage"] != "encode":
+                status = websocket.receive_json()
+            assert(status["task_status"] == 2)
+            assert(status["songs_completed"] == 1)
+            release.set()
+            while status["task_status"] == 2:
+                status = websocket.receive_json()
+            assert(status["task_status"] == 3)
+
+        with client.stream("GET", "/events/songcompilation/streamed") as response:
+            assert(response.headers["content-type"].startswith("text/event-stream"))
+            events = [json.loads(line[len("data: "):]) for line in response.iter_lines() if line.startswith("data: ")]
+        assert(events[-1]["task_status"] == 3)
+        assert(events[-1]["progress"] == 1.0)
+        assert(client.get("/status/songcompilation/streamed").json()["stage_durations"]["encode"] >= 0)
+        global_status = client.get("/status/global/songcompilation/").json()
+        assert(global_status["statuses"] == { "3" : 1 })
+        assert(global_status["throughput"]["finished"] == 1)
+    finally:
+        release.set()
+        api.scheduler.shutdown()
+
+def test_result_download(monkeypatch, tmp_path):
+    output_filepath = tmp_path / "compilation.mp4"
+    output_filepath.write_bytes(bytes(range(256)) * 4)
+    scheduler = TaskScheduler(max_workers=1, store=MemoryTaskStore())
+    monkeypatch.setattr(api, "scheduler", scheduler)
+    client = TestClient(app)
+    scheduler.submit("rendered", str, (output_filepath, ))
+    assert(client.get("/result/songcompilation/rendered").status_code == 409)
+    scheduler.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and scheduler.get_task("rendered").status != TaskStatus.FINISHED:
+        time.sleep(0.01)
+    scheduler.shutdown()
+
+    response = client.get("/result/songcompilation/rendered")
+    assert(response.status_code == 200 and response.content == output_filepath.read_bytes())
+    assert(response.headers["content-type"] == "video/mp4" and response.headers["accept-ranges"] == "bytes")
+    etag = response.headers["etag"]
+    assert(client.get("/result/songcompilation/rendered", headers={ "If-None-Match" : etag }).status_code == 304)
+
+    partial = client.get("/result/songcompilation/rendered", headers={ "Range" : "bytes=1000-", "If-Range" : etag })
+    assert(partial.status_code == 206 and partial.content == bytes(range(232, 256)))
+    assert(partial.headers["content-range"] == "bytes 1000-1023/1024")
+    assert(client.get("/result/songcompilation/rendered", headers={ "Range" : "bytes=0-1", "If-Range" : '"changed"' }).status_code == 200)
+    unsatisfiable = client.get("/result/songcompilation/rendered", headers={ "Range" : "bytes=2048-" })
+    assert(unsatisfiable.status_code == 416 and unsatisfiable.headers["content-range"] == "bytes */1024")
+
+def test_parse_range():
+    assert(parse_range("bytes=0-99", 1000) == (0, 99))
+    assert(parse_range("bytes=900-", 1000) == (900, 999))
+    assert(parse_range("bytes=-100", 1000) == (900, 999))
+    assert(parse_range("bytes=990-2000", 1000) == (990, 999))
+    assert(parse_range("bytes=0-1,5-9", 1000) is None)
+    assert(parse_range("items=0-1", 1000) is None)
+    assert(parse_range("bytes=a-b", 1000) is None)
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range("bytes=1000-", 1000)
+
+def test_create_deduplicated(monkeypatch, tmp_path):
+    theme = {
+        "width" : 64,
+        "height" : 48,
+        "font_name" : "font.ttf",
+        "background_color" : [0, 0, 128],
+        "song_title_color" : [173, 216, 230],
+        "song_higligth_color" : [152, 255, 152],
+        "song_color" : [173, 216, 230],
+        "format_model" : "{title} - {author}",
+        "higligth_key" : "> "
+    }
+    songs = [Song("pov", "ariana grande")]
+
+    async def get_popular_async():
+        return [("ariana grande", "pov")]
+
+    async def get_songs_async(popular_songs):
+        return songs
+
+    monkeypatch.setattr(billboardservice, "get_popular_async", get_popular_async)
+    monkeypatch.setattr(api, "get_songs_async", get_songs_async)
+    scheduler = TaskScheduler(max_workers=1, store=MemoryTaskStore())
+    monkeypatch.setattr(api, "scheduler", scheduler)
+    output_filepath = tmp_path / "compilation.mp4"
+    output_filepath.write_bytes(b"compilation")
+    fingerprint = get_compilation_fingerprint(FrameMetadata.model_validate(theme), songs)
+    scheduler.submit("rendered", str, (output_filepath, ), fingerprint=fingerprint)
+    scheduler.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and scheduler.get_task("rendered").status != TaskStatus.FINISHED:
+        time.sleep(0.01)
+    scheduler.shutdown()
+
+    created = TestClient(app).post("/create/songcompilation/", json=theme).json()
+    assert(created["task_id"] == "rendered" and created["deduplicated"])
+    assert(created["task_status"] == 3 and created["result"] == "/result/songcompilation/rendered")
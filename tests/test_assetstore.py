@@ -0,0 +1,38 @@
+import os
+
+from curby.core import AssetStore
+
+def _create(content: bytes):
+    def create(folder: str):
+        filepath = os.path.join(folder, "audio.webm")
+        with open(filepath, "wb") as file:
+            file.write(content)
+        return filepath, {"duration": 180, "codec": "opus"}
+    return create
+
+def test_assetstore_get_or_create(tmp_path):
+    store = AssetStore(str(tmp_path), 10)
+    asset = store.get_or_create("dQw4w9WgXcQ", _create(b"123456"))
+    assert(asset.filepath == os.path.join(str(tmp_path), "dQw4w9WgXcQ.webm"))
+    assert(store.get_or_create("dQw4w9WgXcQ", _create(b"other")).metadata == {"duration": 180, "codec": "opus"})
+
+    store.get_or_create("kJQP7kiw5Fk", _create(b"123456"))
+    assert(store.get("dQw4w9WgXcQ") is None)
+    assert(not os.path.exists(asset.filepath))
+
+    with open(store.get("kJQP7kiw5Fk").filepath, "ab") as file:
+        file.write(b"truncated or corrupted")
+    assert(store.get("kJQP7kiw5Fk") is None)
+def test_assetstore_pin(tmp_path):
+    store = AssetStore(str(tmp_path), 10)
+    held = store.get_or_create("dQw4w9WgXcQ", _create(b"123456"), holder="compilation-1")
+    assert(store.get("dQw4w9WgXcQ", holder="compilation-2") is not None)
+    store.get_or_create("kJQP7kiw5Fk", _create(b"123456"))
+    assert(os.path.exists(held.filepath))
+
+    store.release("compilation-1")
+    assert(os.path.exists(held.filepath) and store.get("kJQP7kiw5Fk") is None)
+    store.release("compilation-2")
+    assert(store.get("dQw4w9WgXcQ") is not None)
+    store.get_or_create("kJQP7kiw5Fk", _create(b"123456"))
+    assert(store.get("dQw4w9WgXcQ") is None and not os.path.exists(held.filepath))
@@ -0,0 +1,18 @@
+from curby.core import ChartEntry
+from curby.gather.service import billboardservice
+
+def _row(title: str, author: str, weeks: int):
+    return (
+        '<ul class="o-chart-results-list-row">'
+        f'<li><span>1</span></li><li><h3 id="title-of-a-story">{title}</h3><span>{author}</span></li>'
+        f'<li><span>-</span></li><li><span>1</span></li><li><span>{weeks}</span></li>'
+        '</ul>'
+    )
+
+def test_billboardservice_parse_chart():
+    rows = [_row(f"Title {index}", f"Author's {index}", index) for index in range(12)]
+    chart = billboardservice._parse_chart(f"<html><body>{''.join(rows)}</body></html>")
+    assert(chart == [
+        ChartEntry(1, "title 6", "author s 6", 6),
+        ChartEntry(2, "title 10", "author s 10", 10),
+    ])
\ No newline at end of file
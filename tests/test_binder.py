@@ -0,0 +1,16 @@
+import asyncio
+
+from curby.core import Song
+from curby.error import SongBinderError
+from curby.gather.binder import songbinder
+
+def test_get_songs_async(monkeypatch):
+    async def get_song_async(artist_name: str, song_title: str):
+        if artist_name == "unknown":
+            raise SongBinderError()
+        return Song(song_title, artist_name)
+
+    monkeypatch.setattr(songbinder, "get_song_async", get_song_async)
+    songs = asyncio.run(songbinder.get_songs_async([("shaboozey", "a bar song tipsy"), ("unknown", "unknown")], 1))
+    assert(songs[0] == Song("a bar song tipsy", "shaboozey"))
+    assert(isinstance(songs[1], SongBinderError))
\ No newline at end of file
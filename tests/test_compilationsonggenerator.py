@@ -0,0 +1,57 @@
+import os
+import pytest
+from PIL import ImageFont
+
+from curby.core import FrameMetadata, EncodingProfile, Song, AssetStore
+from curby.gather.service import sponsorblockservice, youtubeservice
+from curby.generate import compilationsonggenerator
+from curby.generate.compilationsonggenerator import get_segment_key, get_compilation_fingerprint, generate_compilation
+
+theme = FrameMetadata.model_validate({
+    "width" : 1920,
+    "height" : 1080,
+    "font_name" : "fonts/Lato-Regular.ttf",
+    "background_color" : (0, 0, 128),
+    "song_title_color" : (173, 216, 230),
+    "song_higligth_color" : (152, 255, 152),
+    "song_color" : (173, 216, 230),
+    "format_model" : "{title} - {author}",
+    "higligth_key" : "> "
+})
+songs = [Song("pov", "ariana grande"), Song("espresso", "sabrina carpenter")]
+
+def test_compilationsonggenerator_segment_key():
+    key = get_segment_key(theme, songs, songs[0], "video", [], EncodingProfile(threads=1))
+    assert(key == get_segment_key(theme, songs, songs[0], "video", [], EncodingProfile(threads=8, container="mkv")))
+    assert(key != get_segment_key(theme, songs, songs[1], "video", [], EncodingProfile(threads=1)))
+    assert(key != get_segment_key(theme, songs[:1], songs[0], "video", [], EncodingProfile(threads=1)))
+    assert(key != get_segment_key(theme, songs, songs[0], "other", [], EncodingProfile(threads=1)))
+    assert(key != get_segment_key(theme, songs, songs[0], "video", [(0.0, 1.5)], EncodingProfile(threads=1)))
+    assert(key != get_segment_key(theme, songs, songs[0], "video", [], EncodingProfile(threads=1, crf=18)))
+
+def test_compilationsonggenerator_fingerprint():
+    fingerprint = get_compilation_fingerprint(theme, songs)
+    threaded = theme.model_copy(update={ "encoding" : EncodingProfile(threads=8) })
+    assert(fingerprint == get_compilation_fingerprint(threaded, [Song("pov", "ariana grande"), Song("espresso", "sabrina carpenter")]))
+    assert(fingerprint != get_compilation_fingerprint(theme, songs[::-1]))
+    assert(fingerprint != get_compilation_fingerprint(theme.model_copy(update={ "encoding" : EncodingProfile(container="mkv") }), songs))
+    assert(fingerprint != get_compilation_fingerprint(theme.model_copy(update={ "width" : 1280 }), songs))
+
+def test_compilationsonggenerator_failed_output(monkeypatch, tmp_path):
+    def render_compilation(segment_keys, frames, audio_filepaths, skip_segments, output, profile, progress):
+        with open(output, "wb") as file:
+            file.write(b"partial")
+        raise RuntimeError("encoder crashed")
+
+    monkeypatch.setattr(youtubeservice, "search_videos", lambda searches, progress=None: [f"video-{index}" for index in range(len(searches))])
+    monkeypatch.setattr(sponsorblockservice, "get_skip_segments_batch", lambda video_ids: { video_id : [] for video_id in video_ids })
+    monkeypatch.setattr(compilationsonggenerator, "download_audio", lambda video_id, progress=None, holder=None: f"{video_id}.m4a")
+    monkeypatch.setattr(compilationsonggenerator, "AUDIO_STORE", AssetStore(str(tmp_path / "audio"), 1024))
+    monkeypatch.setattr(compilationsonggenerator, "RENDER_BACKEND", "ffmpeg")
+    monkeypatch.setattr(compilationsonggenerator, "render_compilation", render_compilation)
+    font_filepath = tmp_path / "font.ttf"
+    font_filepath.write_bytes(ImageFont.load_default(size=12).font_bytes)
+    output = str(tmp_path / "compilation.mp4")
+    with pytest.raises(RuntimeError):
+        generate_compilation(theme.model_copy(update={ "font_name" : str(font_filepath) }), songs, output)
+    assert(not os.path.exists(output))
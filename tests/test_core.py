@@ -1,4 +1,50 @@
-from curby.core import TEMP_FOLDER
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from curby.core import TEMP_FOLDER, EncodingProfile, TaskTelemetry, async_ttl_cache
 
 def test_core():
-    assert(TEMP_FOLDER == "temp")
\ No newline at end of file
+    assert(TEMP_FOLDER == "temp")
+
+def test_async_ttl_cache():
+    calls = []
+
+    @async_ttl_cache(ttl=60)
+    async def fetch(value: int):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(fetch(1), fetch(1), fetch(2))
+
+    assert(asyncio.run(run()) == [2, 2, 4])
+    assert(asyncio.run(run()) == [2, 2, 4])
+    assert(calls == [1, 2])
+
+def test_encoding_profile():
+    profile = EncodingProfile()
+    assert(profile.threads >= 1)
+    assert(profile.tune == "stillimage")
+    assert(profile.container == "mp4")
+    assert(EncodingProfile.model_validate({ "crf" : 18, "container" : "mkv" }).crf == 18)
+    with pytest.raises(ValidationError):
+        EncodingProfile(crf=60)
+    with pytest.raises(ValidationError):
+        EncodingProfile(audio_bitrate="loud")
+
+def test_task_telemetry():
+    telemetry = TaskTelemetry()
+    telemetry.update("search", 0.0, { "songs_total" : 4 }, now=10)
+    telemetry.update("encode", 0.0, {}, now=12)
+    telemetry.update("encode", 0.25, { "songs_completed" : 1, "encode_fps" : 30.0, "unknown" : 1 }, now=13)
+    assert(telemetry.stage_durations == { "search" : 2 })
+    assert(telemetry.eta == 3)
+    assert(telemetry.songs_total == 4 and telemetry.songs_completed == 1)
+    telemetry.finish(now=16)
+    status = telemetry.to_dict()
+    assert(status["stage_durations"] == { "search" : 2, "encode" : 4 })
+    assert(status["progress"] == 1.0 and status["eta"] == 0.0)
+    assert("unknown" not in status and "_stage_started_at" not in status)
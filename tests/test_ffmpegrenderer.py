@@ -0,0 +1,39 @@
+import re
+import subprocess
+import numpy as np
+
+from curby.core import AssetStore, EncodingProfile
+from curby.generate import ffmpegrenderer
+from curby.generate.ffmpegrenderer import FFMPEG, render_compilation
+
+def generate_tone(filepath: str, frequency: int, duration: float):
+    subprocess.run(
+        [FFMPEG, "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={duration}", "-c:a", "aac", filepath],
+        check=True
+    )
+
+def probe(filepath: str) -> tuple[float, list[str]]:
+    output = subprocess.run([FFMPEG, "-hide_banner", "-i", filepath], capture_output=True, text=True).stderr
+    hours, minutes, seconds = re.search(r"Duration: (\d+):(\d+):([\d.]+)", output).groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds), re.findall(r"Stream #\S+.*?: (?:Video|Audio): (\w+)", output)
+
+def test_ffmpegrenderer(monkeypatch, tmp_path):
+    monkeypatch.setattr(ffmpegrenderer, "SEGMENT_STORE", AssetStore(str(tmp_path / "segments"), 1024 * 1024 * 1024))
+    audio_filepaths = [str(tmp_path / "first.m4a"), str(tmp_path / "second.m4a")]
+    generate_tone(audio_filepaths[0], 440, 2)
+    generate_tone(audio_filepaths[1], 660, 3)
+    frames = [
+        lambda: np.full((48, 64, 3), 32, dtype=np.uint8),
+        lambda: np.full((48, 64, 3), 224, dtype=np.uint8)
+    ]
+    reports = []
+    output_filepath = str(tmp_path / "compilation.mp4")
+    render_compilation(
+        ["first", "second"], frames, audio_filepaths, [[], [(1.0, 2.0)]], output_filepath,
+        EncodingProfile(threads=2), lambda progress, **details: reports.append((progress, details))
+    )
+
+    duration, codecs = probe(output_filepath)
+    assert(abs(duration - 4.0) < 0.25)
+    assert(codecs == ["h264", "aac"])
+    assert(reports[-1][0] == 1.0 and reports[-1][1]["songs_completed"] == 2)
@@ -0,0 +1,27 @@
+import numpy as np
+from PIL import ImageFont
+
+from curby.core import FrameMetadata, Song
+from curby.generate.compilationsonggenerator import generate_image
+from curby.generate.framerenderer import FrameRenderer
+
+def test_framerenderer(tmp_path):
+    font_filepath = tmp_path / "font.ttf"
+    font_filepath.write_bytes(ImageFont.load_default(size=12).font_bytes)
+    theme = FrameMetadata.model_validate({
+        "width" : 640,
+        "height" : 360,
+        "font_name" : str(font_filepath),
+        "background_color" : (0, 0, 128),
+        "song_title_color" : (173, 216, 230),
+        "song_higligth_color" : (152, 255, 152),
+        "song_color" : (173, 216, 230),
+        "format_model" : "{title} - {author}",
+        "higligth_key" : "> "
+    })
+    songs = [Song(f"title {index}", f"author {index}") for index in range(10)]
+    renderer = FrameRenderer(theme, songs)
+    for index, song in enumerate(songs):
+        frame_np = renderer.render(index)
+        assert(frame_np.shape == (360, 640, 3))
+        assert((frame_np == np.array(generate_image(theme, songs, song))).all())
@@ -0,0 +1,16 @@
+from curby.gather.service.freemidicatalog import FreeMidiCatalog
+
+def test_freemidicatalog_diff(tmp_path):
+    catalog = FreeMidiCatalog(str(tmp_path / "freemidi.sqlite"))
+    added, removed = catalog.update_artists("a", [("ariana grande", "artist-1751-ariana-grande"), ("a dub", "artist-1191-a-dub")])
+    assert((len(added), len(removed)) == (2, 0))
+    added, removed = catalog.update_artists("a", [("ariana grande", "artist-1751-ariana-grande")])
+    assert((added, removed) == ([], ["artist-1191-a-dub"]))
+
+    assert(catalog.get_stale_artists(3600) == ["artist-1751-ariana-grande"])
+    catalog.update_songs("artist-1751-ariana-grande", [("pov", "download3-26867-pov-ariana-grande")])
+    assert(catalog.get_stale_artists(3600) == [])
+
+    assert(catalog.find_song("Ariana Grande", "POV") == ("download3-26867-pov-ariana-grande", "getter-26867"))
+    assert(catalog.find_song("ariana grande", "7 rings") is None)
+    assert(catalog.acquire_lease("refresh", "first", 60) and not catalog.acquire_lease("refresh", "second", 60))
\ No newline at end of file
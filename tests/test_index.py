@@ -0,0 +1,9 @@
+from curby.core import NameIndex
+
+def test_index_find():
+    index = NameIndex([("a flock of seagulls", "artist-1886"), ("a dub", "artist-1191"), ("a dub", "artist-0")])
+    assert(index.find("a dub") == "artist-1191")
+    assert(index.find("A Flock Of Seagulls!") == "artist-1886")
+    assert(index.find("a flock of seagull") is None)
+    assert(index.find("a flock of seagull", fuzzy_cutoff=0.9) == "artist-1886")
+    assert(index.find("ariana grande", fuzzy_cutoff=0.9) is None)
\ No newline at end of file
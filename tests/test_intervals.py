@@ -0,0 +1,20 @@
+import numpy as np
+
+from curby.core import to_intervals, merge_intervals, invert_intervals, cut_array, get_aselect_filter
+
+def test_intervals_merge():
+    intervals = np.array([[17, 20], [1, 5], [10, 12], [2, 6], [16, 19], [3, 4]])
+    assert((merge_intervals(intervals) == np.array([[1, 6], [10, 12], [16, 20]])).all())
+    assert(merge_intervals(np.empty((0, 2))).shape == (0, 2))
+
+def test_intervals_invert():
+    intervals = to_intervals([(2, 6), (1, 5), (10, 12), (18, 25)])
+    assert((invert_intervals(intervals, 20) == np.array([[0, 1], [6, 10], [12, 18]])).all())
+    assert((invert_intervals(np.empty((0, 2)), 20) == np.array([[0, 20]])).all())
+    assert(invert_intervals(np.array([[0, 20]]), 20).shape == (0, 2))
+
+def test_intervals_cut():
+    samples = np.arange(40).reshape(20, 2)
+    keep_ranges = invert_intervals(np.array([[2, 6], [1, 5], [10, 12]]), 20)
+    assert((cut_array(samples, keep_ranges, 1)[:, 0] == np.array([0, 12, 14, 16, 18, 24, 26, 28, 30, 32, 34, 36, 38])).all())
+    assert(get_aselect_filter(np.array([[0, 1.5]])) == "aselect='between(t,0.000000,1.500000)',asetpts=N/SR/TB")
@@ -0,0 +1,28 @@
+import threading
+
+from curby.downloader import mididownloader
+from curby.downloader.mididownloader import MidiStore
+
+def test_mididownloader_dedupe(tmp_path, monkeypatch):
+    store = MidiStore(str(tmp_path))
+    calls = []
+    started = threading.Event()
+
+    def download_midi(artist_name: str, song_title: str):
+        calls.append(song_title)
+        started.wait(1)
+        return store.add(artist_name, song_title, [b"MThd", b"\x00\x00\x00\x06"])
+
+    monkeypatch.setattr(mididownloader, "MIDI_STORE", store)
+    monkeypatch.setattr(mididownloader, "_download_midi", download_midi)
+    threads = [threading.Thread(target=mididownloader.download_midi, args=("ariana grande", "pov")) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+
+    filepath = mididownloader.download_midi("Ariana Grande", "POV")
+    assert(calls == ["pov"])
+    assert(filepath == store.find("ariana grande", "pov"))
+    assert(open(filepath, "rb").read() == b"MThd\x00\x00\x00\x06")
\ No newline at end of file
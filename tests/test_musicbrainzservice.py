@@ -0,0 +1,21 @@
+from curby.core import ArtistPage
+from curby.gather.service import musicbrainzservice
+
+ARTIST_PAGE = (
+    '<html><body>'
+    '<div class="genre-list"><p><a>pop</a>, <a>r&amp;b</a></p></div>'
+    '<table>'
+    '<tr><th>Year</th><th>Title</th></tr>'
+    '<tr><td>2014</td><td><a href="/release-group/1237b040"><bdi>My Everything</bdi></a></td></tr>'
+    '<tr><td>2016</td><td><a href="/release-group/17fd3576"><bdi>Dangerous Woman</bdi></a></td></tr>'
+    '</table>'
+    '</body></html>'
+)
+
+def test_musicbrainzservice_parse_artist_page():
+    artist_page = musicbrainzservice._parse_artist_page(ARTIST_PAGE)
+    assert(artist_page == ArtistPage(
+        ("pop", "r&b"),
+        (("my everything", "/release-group/1237b040"), ("dangerous woman", "/release-group/17fd3576"))
+    ))
+    assert(artist_page.get_memory_size() > 0)
\ No newline at end of file
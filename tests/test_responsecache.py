@@ -0,0 +1,72 @@
+import gzip
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from curby.core import ResponseCache, requester
+
+def test_responsecache_revalidation(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), 1024, {"musicbrainz.org": 0}, 3600)
+    key = cache.get_key("https://musicbrainz.org/artist", {"b": 1, "a": 2})
+    assert(key == cache.get_key("https://musicbrainz.org/artist", {"a": 2, "b": 1}))
+
+    cache.put(key, "https://musicbrainz.org/artist", 200, {"ETag": '"abc"'}, b"<html></html>")
+    cached = cache.get(key)
+    assert(cached.content == b"<html></html>")
+    assert(not cache.is_fresh(cached))
+    assert(cached.get_validators() == {"If-None-Match": '"abc"'})
+
+def test_responsecache_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), 10, {}, 3600)
+    cache.put("first", "https://freemidi.org/a", 200, {}, b"123456")
+    cache.put("second", "https://freemidi.org/b", 200, {}, b"123456")
+    assert(cache.get("first") is None)
+    assert(cache.is_fresh(cache.get("second")))
+
+    cache.count("HIT")
+    cache.count("HIT")
+    stats = cache.get_stats()
+    assert(stats["HIT"] == 2 and stats["MISS"] == 0 and stats["ENTRIES"] == 1)
+def test_responsecache_flush(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), 12, {}, 3600, flush_interval=3600)
+    cache.put("first", "https://freemidi.org/a", 200, {}, b"123456")
+    cache.put("second", "https://freemidi.org/b", 200, {}, b"123456")
+    assert(cache.get("first") is not None)
+    cache.count("HIT")
+    assert(cache.database.execute("SELECT COUNT(*) FROM counters").fetchone()[0] == 0)
+
+    cache.put("third", "https://freemidi.org/c", 200, {}, b"123456")
+    assert(cache.get("second") is None and cache.get("first") is not None)
+    assert(cache.get_stats()["HIT"] == 1)
+
+def test_responsecache_gzip(monkeypatch, tmp_path):
+    class GzipHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get("If-None-Match") == '"chart"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = gzip.compress(b"<html>chart</html>")
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", '"chart"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), GzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), 1024 * 1024, {}, 3600)
+    monkeypatch.setattr(requester, "RESPONSE_CACHE", cache)
+    url = f"http://127.0.0.1:{server.server_address[1]}/chart"
+    try:
+        for ttl in (3600, 3600, 0, 0):
+            cache.default_ttl = ttl
+            assert(asyncio.run(requester.request_async(url)).text == "<html>chart</html>")
+            assert(requester.request(url).text == "<html>chart</html>")
+        assert(cache.get_stats()["REVALIDATED"] == 4)
+    finally:
+        server.shutdown()
@@ -0,0 +1,113 @@
+import os
+import time
+import threading
+
+import pytest
+
+from curby.core import TaskScheduler, TaskStatus, MemoryTaskStore
+from curby.error import TaskQueueFullError
+
+def wait_for(scheduler: TaskScheduler, task_ids: list[str], timeout: float = 5):
+    deadline = time.time() + timeout
+    while time.time() < deadline and any(scheduler.get_task(task_id).status in (TaskStatus.QUEUED, TaskStatus.PROCESSING) for task_id in task_ids):
+        time.sleep(0.01)
+
+def test_scheduler():
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    def fail():
+        raise ValueError()
+
+    scheduler = TaskScheduler(max_workers=1, max_queued=3, store=MemoryTaskStore())
+    scheduler.start()
+    scheduler.submit("blocking", block)
+    assert(started.wait(5))
+    assert(scheduler.get_task("blocking").status == TaskStatus.PROCESSING)
+
+    scheduler.submit("low", order.append, ("low",), priority=0)
+    scheduler.submit("high", order.append, ("high",), priority=5)
+    scheduler.submit("failing", fail, priority=1)
+    with pytest.raises(TaskQueueFullError):
+        scheduler.submit("overflow", order.append, ("overflow",))
+    assert(scheduler.get_task("low").status == TaskStatus.QUEUED)
+
+    assert(scheduler.cancel("low"))
+    assert(not scheduler.cancel("blocking"))
+    scheduler.submit("last", order.append, ("last",), priority=-1)
+
+    release.set()
+    wait_for(scheduler, ["blocking", "high", "failing", "last"])
+    scheduler.shutdown()
+    assert(order == ["high", "last"])
+    assert(scheduler.get_task("low").status == TaskStatus.CANCELLED)
+    assert(scheduler.get_task("failing").status == TaskStatus.FAILED)
+    assert(scheduler.get_task("last").status == TaskStatus.FINISHED)
+
+def report_progress(value: int, progress=None) -> tuple[int, int]:
+    progress("encode", 0.5)
+    return os.getpid(), value * 2
+
+def test_scheduler_progress():
+    reported = threading.Event()
+    release = threading.Event()
+
+    def encode(progress=None):
+        progress("encode", 0.5, songs_completed=2)
+        reported.set()
+        release.wait(5)
+
+    scheduler = TaskScheduler(max_workers=1, store=MemoryTaskStore())
+    scheduler.start()
+    scheduler.submit("encoding", encode, progress=True)
+    assert(reported.wait(5))
+    deadline = time.time() + 5
+    while time.time() < deadline and scheduler.get_task("encoding").telemetry.stage is None:
+        time.sleep(0.01)
+    status = scheduler.get_status("encoding")
+    assert(status["task_status"] == TaskStatus.PROCESSING)
+    assert(status["stage"] == "encode")
+    assert(status["progress"] == 0.5)
+    assert(status["songs_completed"] == 2)
+
+    release.set()
+    wait_for(scheduler, ["encoding"])
+    scheduler.shutdown()
+    assert(scheduler.get_task("encoding").status == TaskStatus.FINISHED)
+    assert(scheduler.get_task("encoding").telemetry.progress == 1.0)
+    assert("encode" in scheduler.get_task("encoding").telemetry.stage_durations)
+
+def test_scheduler_process():
+    scheduler = TaskScheduler(max_workers=1, mode="process", store=MemoryTaskStore())
+    scheduler.start()
+    scheduler.submit("remote", report_progress, (21, ), progress=True)
+    wait_for(scheduler, ["remote"], timeout=30)
+    scheduler.shutdown()
+    pid, value = scheduler.get_task("remote").result
+    assert(scheduler.get_task("remote").status == TaskStatus.FINISHED)
+    assert(pid != os.getpid())
+    assert(value == 42)
+
+def crash():
+    os._exit(1)
+
+def square(value: int) -> int:
+    return value * value
+
+def test_scheduler_process_crash():
+    scheduler = TaskScheduler(max_workers=1, mode="process", store=MemoryTaskStore())
+    scheduler.start()
+    scheduler.submit("crashing", crash, priority=1)
+    scheduler.submit("after", square, (3, ))
+    wait_for(scheduler, ["crashing", "after"], timeout=60)
+    scheduler.submit("later", square, (4, ))
+    wait_for(scheduler, ["later"], timeout=30)
+    scheduler.shutdown()
+    assert(scheduler.get_task("crashing").status == TaskStatus.FAILED)
+    assert(scheduler.get_task("after").result == 9)
+    assert(scheduler.get_task("later").result == 16)
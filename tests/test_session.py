@@ -0,0 +1,32 @@
+import time
+import threading
+
+from curby.core import session
+from curby.core.session import host_slot
+
+def test_host_slot(monkeypatch):
+    monkeypatch.setitem(session.HOST_MAX_INFLIGHT, "slots.test", 2)
+    monkeypatch.setitem(session.HOST_MIN_INTERVAL, "slots.test", 0.05)
+    lock = threading.Lock()
+    starts = []
+    inflight = [0, 0]
+
+    def call():
+        with host_slot("https://slots.test/page"):
+            with lock:
+                starts.append(time.monotonic())
+                inflight[0] += 1
+                inflight[1] = max(inflight[1], inflight[0])
+            time.sleep(0.1)
+            with lock:
+                inflight[0] -= 1
+
+    threads = [threading.Thread(target=call) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    starts.sort()
+    assert(inflight[1] == 2)
+    assert(all(second - first >= 0.05 - 0.005 for first, second in zip(starts, starts[1:])))
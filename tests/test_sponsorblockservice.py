@@ -0,0 +1,35 @@
+import time
+
+from requests import Response
+from sponsorblock import Segment
+from sponsorblock.errors import NotFoundException
+
+from curby.gather.service import sponsorblockservice
+from curby.gather.service.sponsorblockcache import SponsorBlockCache
+
+def test_sponsorblockservice(tmp_path, monkeypatch):
+    calls = []
+
+    def get_skip_segments(video_id: str):
+        calls.append(video_id)
+        if video_id == "slow":
+            time.sleep(0.5)
+        if video_id == "missing":
+            response = Response()
+            response.status_code, response.reason = 404, "Not Found"
+            raise NotFoundException("Not Found", response)
+        return [Segment("sponsor", 10, 20), Segment("outro", 200.5, 210)]
+
+    cache = SponsorBlockCache(str(tmp_path / "sponsorblock.sqlite"), 3600)
+    monkeypatch.setattr(sponsorblockservice, "SPONSORBLOCK_CACHE", cache)
+    monkeypatch.setattr(sponsorblockservice.SPONSORBLOCK_CLIENT, "get_skip_segments", get_skip_segments)
+
+    skip_segments = sponsorblockservice.get_skip_segments_batch(["video", "missing", "slow", "video"], timeout=0.1)
+    assert(skip_segments == {"video" : [(10.0, 20.0), (200.5, 210.0)], "missing" : [], "slow" : []})
+    assert(sorted(calls) == ["missing", "slow", "video"])
+
+    time.sleep(0.6)
+    skip_segments = sponsorblockservice.get_skip_segments_batch(["video", "missing", "slow"], timeout=0.1)
+    assert(skip_segments["slow"] == [(10.0, 20.0), (200.5, 210.0)])
+    assert(len(calls) == 3)
+    assert(cache.get_stats() == {"ENTRIES" : 3, "WITHOUT_SEGMENTS" : 1})
@@ -0,0 +1,147 @@
+import time
+
+from curby.core import (
+    MemoryTaskStore,
+    SqliteTaskStore,
+    SongCompilationTask,
+    TaskScheduler,
+    TaskStatus,
+    TaskTelemetry
+)
+
+def double(value: int) -> int:
+    return value * 2
+
+def test_sqlite_task_store(tmp_path):
+    store = SqliteTaskStore(str(tmp_path / "tasks.sqlite"))
+    store.add(SongCompilationTask("low", TaskStatus.QUEUED, 0), (double, (1, ), False), now=1)
+    store.add(SongCompilationTask("high", TaskStatus.QUEUED, 5), (double, (2, ), False), now=2)
+    store.add(SongCompilationTask("cancelled", TaskStatus.QUEUED, 9), (double, (3, ), False), now=3)
+    assert(store.cancel("cancelled", now=4))
+    assert(store.get_queue_size() == 2)
+
+    task, (function, args, progress) = store.claim("worker-1", lease_until=100)
+    assert(task.task_id == "high" and function(*args) == 4)
+    assert(not store.cancel("high", now=5))
+    store.finish("high", TaskStatus.FINISHED, "high.mp4", TaskTelemetry(progress=1.0), now=6)
+
+    task, job = store.claim("worker-2", lease_until=10)
+    assert(task.task_id == "low")
+    assert(store.claim("worker-2", lease_until=10) is None)
+
+    restarted = SqliteTaskStore(str(tmp_path / "tasks.sqlite"))
+    restarted.renew("worker-1", lease_until=200)
+    assert(restarted.recover(now=20, max_attempts=3) == 1)
+    assert(restarted.get("low").status == TaskStatus.QUEUED)
+    assert(restarted.get("high").result == "high.mp4")
+    assert(restarted.get_status_counts() == { TaskStatus.QUEUED : 1, TaskStatus.FINISHED : 1, TaskStatus.CANCELLED : 1 })
+
+    for attempt in range(2):
+        restarted.claim("worker-3", lease_until=30)
+        restarted.recover(now=40, max_attempts=3)
+    assert(restarted.get("low").status == TaskStatus.FAILED)
+    assert(restarted.purge(before=5) == [None])
+    assert(restarted.get("cancelled") is None)
+    assert(restarted.get_status_counts() == { TaskStatus.FINISHED : 1, TaskStatus.FAILED : 1 })
+
+def test_sqlite_scheduler(tmp_path):
+    scheduler = TaskScheduler(max_workers=1, store=SqliteTaskStore(str(tmp_path / "tasks.sqlite")))
+    scheduler.submit("doubled", double, (21, ))
+    scheduler.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and scheduler.get_task("doubled").status != TaskStatus.FINISHED:
+        time.sleep(0.01)
+    scheduler.shutdown()
+    assert(scheduler.get_task("doubled").result == 42)
+    assert(scheduler.get_status("doubled")["progress"] == 1.0)
+
+def test_task_store_throughput(tmp_path):
+    for store in (MemoryTaskStore(), SqliteTaskStore(str(tmp_path / "tasks.sqlite"))):
+        for index, duration in enumerate([10.0, 20.0, 30.0, 40.0]):
+            store.add(SongCompilationTask(f"task-{index}", TaskStatus.QUEUED), (double, (index, ), False), now=index)
+            store.claim("worker", lease_until=1000)
+            status = TaskStatus.FAILED if index == 0 else TaskStatus.FINISHED
+            store.finish(f"task-{index}", status, None, TaskTelemetry(), now=100 + index * 100, duration=duration)
+        throughput = store.get_throughput(now=400, window=240)
+        assert(throughput["finished"] == 3 and throughput["failed"] == 0)
+        assert(throughput["finished_per_minute"] == 0.75)
+        assert(throughput["mean_duration"] == 30.0 and throughput["p95_duration"] == 40.0)
+        assert(store.get_status_counts() == { TaskStatus.FINISHED : 3, TaskStatus.FAILED : 1 })
+        assert(len(store.purge(before=250)) == 2)
+        assert(store.get_status_counts() == { TaskStatus.FINISHED : 2 })
+        assert(store.get_throughput(now=400, window=1000)["finished"] == 2)
+
+def test_task_store_fingerprint(tmp_path):
+    for store in (MemoryTaskStore(), SqliteTaskStore(str(tmp_path / "tasks.sqlite"))):
+        first = store.add(SongCompilationTask("first", TaskStatus.QUEUED), (double, (1, ), False), now=0, fingerprint="same", reuse_since=0)
+        assert(store.add(SongCompilationTask("second", TaskStatus.QUEUED), (double, (1, ), False), now=1, fingerprint="same", reuse_since=0).task_id == "first")
+        assert(store.get("second") is None and store.get_queue_size() == 1)
+
+        store.claim("worker", lease_until=100)
+        store.finish("first", TaskStatus.FINISHED, "first.mp4", TaskTelemetry(progress=1.0), now=10)
+        store.update_telemetry("first", TaskTelemetry(progress=0.5))
+        assert(store.get("first").telemetry.progress == 1.0)
+        assert(store.find("same", reuse_since=5).result == "first.mp4")
+        assert(store.find("same", reuse_since=20) is None)
+        assert(store.add(SongCompilationTask("third", TaskStatus.QUEUED), (double, (1, ), False), now=30, fingerprint="same", reuse_since=20).task_id == "third")
+        assert(store.find("same").task_id == "third")
+        store.cancel("third", now=31)
+        assert(store.find("same") is None)
+
+def test_scheduler_cleanup(tmp_path):
+    for store in (MemoryTaskStore(), SqliteTaskStore(str(tmp_path / "tasks.sqlite"))):
+        removed = []
+        scheduler = TaskScheduler(max_workers=1, store=store, retention=0, cleanup=removed.append)
+        store.add(SongCompilationTask("done", TaskStatus.QUEUED), (double, (1, ), False), now=0)
+        store.claim("worker", lease_until=1000)
+        store.finish("done", TaskStatus.FINISHED, "done.mp4", TaskTelemetry(), now=1)
+        store.add(SongCompilationTask("cancelled", TaskStatus.QUEUED), (double, (2, ), False), now=2)
+        store.cancel("cancelled", now=3)
+        scheduler.maintain()
+        assert(removed == ["done.mp4"])
+        assert(store.get("done") is None and store.get("cancelled") is None)
+
+def fail_loading():
+    raise ValueError("cannot load the job")
+
+class Unloadable:
+    def __reduce__(self):
+        return fail_loading, ()
+
+def test_scheduler_store_errors(tmp_path):
+    scheduler = TaskScheduler(max_workers=1, store=SqliteTaskStore(str(tmp_path / "tasks.sqlite")))
+    scheduler.submit("unloadable", double, (Unloadable(), ), priority=2)
+    scheduler.submit("unstorable", object, priority=1)
+    scheduler.submit("doubled", double, (21, ))
+    scheduler.start()
+    deadline = time.time() + 5
+    while time.time() < deadline and scheduler.get_task("doubled").status != TaskStatus.FINISHED:
+        time.sleep(0.01)
+    scheduler.shutdown()
+    assert(scheduler.get_task("unloadable").status == TaskStatus.FAILED)
+    assert(scheduler.get_task("unstorable").status == TaskStatus.FAILED)
+    assert(scheduler.get_task("doubled").result == 42)
+
+class UnavailableTaskStore(MemoryTaskStore):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def finish(self, *args, **kwargs):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        super().finish(*args, **kwargs)
+
+def test_scheduler_unfinished():
+    store = UnavailableTaskStore(failures=2)
+    scheduler = TaskScheduler(max_workers=1, store=store)
+    scheduler.start()
+    scheduler.submit("doubled", double, (21, ))
+    deadline = time.time() + 5
+    while time.time() < deadline and store.failures > 0:
+        time.sleep(0.01)
+    scheduler.shutdown()
+    assert(scheduler.get_task("doubled").status == TaskStatus.PROCESSING)
+    scheduler.maintain()
+    assert(scheduler.get_task("doubled").status == TaskStatus.FAILED)
@@ -0,0 +1,34 @@
+from curby.error import YoutubeError
+from curby.gather.service import youtubeservice
+from curby.gather.service.youtubecache import YoutubeCache
+
+def test_youtubeservice(tmp_path, monkeypatch):
+    calls = []
+
+    class VideosSearch:
+        def __init__(self, search_text: str, limit: int):
+            calls.append(search_text)
+            self.search_text = search_text
+
+        def result(self):
+            if self.search_text == "broken":
+                raise ConnectionError()
+            if self.search_text == "unknown":
+                return { "result" : [] }
+            return { "result" : [{ "id" : self.search_text.replace(" ", "-") }] }
+
+    cache = YoutubeCache(str(tmp_path / "youtube.sqlite"), 3600, 60)
+    monkeypatch.setattr(youtubeservice, "YOUTUBE_CACHE", cache)
+    monkeypatch.setattr(youtubeservice, "VideosSearch", VideosSearch)
+
+    video_ids = youtubeservice.search_videos(["pov by ariana grande", "unknown", "broken", "POV by Ariana Grande!"])
+    assert(video_ids[0] == "pov-by-ariana-grande")
+    assert(isinstance(video_ids[1], YoutubeError))
+    assert(isinstance(video_ids[2], YoutubeError))
+    assert(video_ids[3] == "pov-by-ariana-grande")
+
+    video_ids = youtubeservice.search_videos(["POV by Ariana Grande!", "unknown", "broken"])
+    assert(video_ids[0] == "pov-by-ariana-grande")
+    assert(isinstance(video_ids[1], YoutubeError))
+    assert(calls == ["pov by ariana grande", "unknown", "broken", "broken"])
+    assert(cache.get_stats() == { "ENTRIES" : 2, "UNRESOLVED" : 1 })